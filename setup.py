@@ -82,8 +82,17 @@ setup(
         [console_scripts]
         batchupgrade = snovault.batchupgrade:main
         create-mapping = snovault.elasticsearch.create_mapping:main
+        current-properties-benchmark = snovault.commands.current_properties_benchmark:main
         dev-servers = snovault.dev_servers:main
         es-index-listener = snovault.elasticsearch.es_index_listener:main
+        embed-copy-benchmark = snovault.commands.embed_copy_benchmark:main
+        indexer-benchmark = snovault.commands.indexer_benchmark:main
+        invalidation-benchmark = snovault.commands.invalidation_benchmark:main
+        migrate-blob-storage = snovault.commands.migrate_blob_storage:main
+        migrate-current-properties = snovault.commands.migrate_current_properties:main
+        migrate-links-index = snovault.commands.migrate_links_index:main
+        migrate-transaction-uuids = snovault.commands.migrate_transaction_uuids:main
+        search-stream-benchmark = snovault.commands.search_stream_benchmark:main
 
         add-date-created = snowflakes.commands.add_date_created:main
         check-rendering = snowflakes.commands.check_rendering:main
@@ -11,8 +11,13 @@ from pyramid.session import SignedCookieSessionFactory
 from sqlalchemy import engine_from_config
 from webob.cookies import JSONSerializer
 from .json_renderer import json_renderer
+from .stats import (
+    InstrumentedQueuePool,
+    instrument_pool,
+)
 from pyramid.settings import (
     asbool,
+    aslist,
 )
 
 STATIC_MAX_AGE = 0
@@ -64,9 +69,14 @@ def configure_engine(settings):
         engine_opts = dict(
             isolation_level='REPEATABLE READ',
             json_serializer=json_renderer.dumps,
-            connect_args={'application_name': application_name}
+            connect_args={'application_name': application_name},
+            poolclass=InstrumentedQueuePool,
         )
+    if 'sqlalchemy.pool_pre_ping' in settings:
+        # Not coerced by engine_from_config
+        engine_opts['pool_pre_ping'] = asbool(settings['sqlalchemy.pool_pre_ping'])
     engine = engine_from_config(settings, 'sqlalchemy.', **engine_opts)
+    instrument_pool(engine)
     if engine.url.drivername == 'postgresql':
         timeout = settings.get('postgresql.statement_timeout')
         if timeout:
@@ -114,7 +124,26 @@ def configure_dbsession(config):
         import zope.sqlalchemy
         from sqlalchemy import orm
 
-        DBSession = orm.scoped_session(orm.sessionmaker(bind=engine))
+        replica_urls = aslist(settings.get('replica.urls', ''))
+        if replica_urls:
+            from snovault.replicas import (
+                CHECK_INTERVAL,
+                MAX_LAG,
+                ReplicaPool,
+                RoutingSession,
+            )
+            replicas = ReplicaPool(
+                engine,
+                [configure_engine(dict(settings, **{'sqlalchemy.url': url})) for url in replica_urls],
+                max_lag=int(settings.get('replica.max_lag', MAX_LAG)),
+                check_interval=float(settings.get('replica.check_interval', CHECK_INTERVAL)),
+            )
+            DBSession = orm.scoped_session(orm.sessionmaker(
+                bind=engine, class_=RoutingSession, replicas=replicas,
+            ))
+            config.include('snovault.replicas')
+        else:
+            DBSession = orm.scoped_session(orm.sessionmaker(bind=engine))
         zope.sqlalchemy.register(DBSession)
         snovault.storage.register(DBSession)
 
@@ -20,6 +20,7 @@ from snovault import (
     Item,
 )
 from .validation import ValidationFailure
+from .storage import BlobIter
 import magic
 import mimetypes
 
@@ -268,9 +269,18 @@ def download(context, request):
         blob_url = blob_storage.get_blob_url(download_meta)
         raise HTTPTemporaryRedirect(str(blob_url))
 
-    # Otherwise serve the blob data ourselves
-    blob = request.registry[BLOBS].get_blob(download_meta)
+    # Otherwise stream the blob data ourselves, a chunk at a time
+    size = blob_storage.get_blob_size(download_meta)
+    if size is None:
+        raise HTTPNotFound(filename)
     headers = {
         'Content-Type': mimetype,
     }
-    return Response(body=blob, headers=headers)
+    response = Response(
+        app_iter=BlobIter(blob_storage, download_meta, size),
+        headers=headers,
+        conditional_response=True,
+    )
+    response.content_length = size
+    response.accept_ranges = 'bytes'
+    return response
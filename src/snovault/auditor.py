@@ -15,6 +15,7 @@ from .interfaces import (
     TYPES,
 )
 from .resources import Item
+from .stats import stage_timer
 
 logger = logging.getLogger("__name__")
 logger.setLevel(logging.ERROR)
@@ -119,7 +120,8 @@ class Auditor(object):
                     continue
             try:
                 try:
-                    result = checker(value, system)
+                    with stage_timer('audit', checker.__name__):
+                        result = checker(value, system)
                 except AuditFailure as e:
                     e = e.__json__(request)
                     if e['path'] is None:
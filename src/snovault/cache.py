@@ -1,5 +1,6 @@
 from pyramid.threadlocal import manager
 from sqlalchemy.util import LRUCache
+import threading
 import transaction.interfaces
 from zope.interface import implementer
 
@@ -59,3 +60,43 @@ class ManagerLRUCache(object):
 
     def newTransaction(self, transaction):
         pass
+
+
+class TidLRUCache(object):
+    """ Process wide LRU cache validated by item tids.
+
+    Each value is stored with the tid of every uuid it was rendered from and
+    is only returned while all of those tids are unchanged.  get_tids looks
+    up the current tids of a list of uuids in one batch.
+    """
+    def __init__(self, capacity, threshold=.5):
+        self.capacity = capacity
+        self._cache = LRUCache(capacity, threshold)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, get_tids, default=None):
+        entry = self._cache.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return default
+        value, tids = entry
+        if tids and get_tids(list(tids)) != tids:
+            with self._lock:
+                self.invalidations += 1
+                if self._cache.get(key) is entry:
+                    del self._cache[key]
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, tids):
+        with self._lock:
+            self._cache[key] = (value, tids)
+
+    def __len__(self):
+        return len(self._cache)
@@ -7,6 +7,7 @@ from .interfaces import (
     CALCULATED_PROPERTIES,
     CONNECTION,
 )
+from .stats import stage_timer
 
 
 def includeme(config):
@@ -130,14 +131,15 @@ class CalculatedProperty(object):
         self.schema = schema
 
     def __call__(self, namespace):
-        if self.condition is not None:
-            if not namespace(self.condition):
-                return None
-        if self.attr:
-            fn = getattr(namespace.context, self.attr)
-        else:
-            fn = self.fn
-        return namespace(fn)
+        with stage_timer('calculated', self.name):
+            if self.condition is not None:
+                if not namespace(self.condition):
+                    return None
+            if self.attr:
+                fn = getattr(namespace.context, self.attr)
+            else:
+                fn = self.fn
+            return namespace(fn)
 
 
 # Imperative configuration
@@ -0,0 +1,111 @@
+"""\
+Compare get_by_uuid latency reading propsheets or current_properties
+
+Loads the same uuids through the propsheets join and through the
+current_properties table, which must have been filled with
+migrate-current-properties.  --history adds that many old revisions of each
+sampled propsheet first, inside a transaction that is rolled back:
+
+    %(prog)s development.ini --app-name app --uuids 500 --history 100
+
+"""
+import itertools
+import logging
+import time
+
+import transaction
+from pyramid.paster import get_app
+from sqlalchemy import text
+
+from snovault import DBSESSION
+from snovault.elasticsearch.indexer_state import all_uuids
+from snovault.storage import RDBStorage
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+_insert_history = text("""
+    INSERT INTO propsheets (rid, name, properties, tid)
+    SELECT propsheets.rid, propsheets.name, propsheets.properties, propsheets.tid
+    FROM current_propsheets
+    JOIN propsheets ON propsheets.sid = current_propsheets.sid
+    CROSS JOIN generate_series(1, :history)
+    WHERE current_propsheets.rid = ANY(CAST(:rids AS uuid[]));
+""")
+
+
+def add_history(session, uuids, history):
+    '''Add history old revisions to each current propsheet of uuids'''
+    session.connection().execute(_insert_history, rids=list(uuids), history=history)
+
+
+def time_lookups(session, storage, uuids, number):
+    '''Returns seconds per get_by_uuid, without identity map hits'''
+    run_time = 0.0
+    for _ in range(number):
+        for uuid in uuids:
+            session.expunge_all()
+            start_time = time.time()
+            storage.get_by_uuid(uuid)
+            run_time += time.time() - start_time
+    return run_time / (number * len(uuids))
+
+
+def run(app, uuid_count, history, number, item_types=None):
+    # pylint: disable=too-many-arguments
+    registry = app.registry
+    DBSession = registry[DBSESSION]
+    uuids = list(itertools.islice(all_uuids(registry, item_types), uuid_count))
+    results = []
+    transaction.begin()
+    try:
+        session = DBSession()
+        if history:
+            add_history(session, uuids, history)
+        propsheets = session.connection().execute('SELECT count(*) FROM propsheets').scalar()
+        for read_current_properties in (False, True):
+            storage = RDBStorage(DBSession, read_current_properties=read_current_properties)
+            result = {
+                'table': 'current_properties' if read_current_properties else 'propsheets',
+                'uuids': len(uuids),
+                'propsheets': propsheets,
+                'latency': time_lookups(session, storage, uuids, number),
+            }
+            print(
+                '{table:>18}: {uuids} uuids, {propsheets} propsheets, '
+                '{latency_ms:.3f}ms per get_by_uuid'.format(
+                    latency_ms=result['latency'] * 1000, **result
+                )
+            )
+            results.append(result)
+    finally:
+        transaction.abort()
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark get_by_uuid with and without current_properties", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--item-type', action='append', help="Item type")
+    parser.add_argument('--uuids', type=int, default=500, help="Number of uuids to load")
+    parser.add_argument(
+        '--history', type=int, default=0,
+        help="Old revisions to add to each propsheet before timing",
+    )
+    parser.add_argument('--number', type=int, default=5, help="Runs over the uuids")
+    parser.add_argument('config_uri', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    app = get_app(args.config_uri, args.app_name)
+    return run(app, args.uuids, args.history, args.number, args.item_type)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""\
+Compare lazy_copy with quick_deepcopy for embed cache hits
+
+Times the copy a cache hit in request.embed makes, alone and followed by a
+full json encoding of the copy, on rendered @@embedded frames of an app:
+
+    %(prog)s development.ini --app-name app --uuids 200
+
+or on fixture documents loaded from json files or directories:
+
+    %(prog)s --documents src/snowflakes/tests/data/inserts
+
+"""
+import itertools
+import json
+import logging
+import os
+import timeit
+
+from pyramid.paster import get_app
+
+from snovault.elasticsearch.indexer_state import all_uuids
+from snovault.util import (
+    lazy_copy,
+    quick_deepcopy,
+)
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+
+def load_documents(paths):
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = sorted(
+                os.path.join(path, filename)
+                for filename in os.listdir(path)
+                if filename.endswith('.json')
+            )
+        else:
+            filenames = [path]
+        for filename in filenames:
+            with open(filename) as json_file:
+                data = json.load(json_file)
+            documents.extend(data if isinstance(data, list) else [data])
+    return documents
+
+
+def render_documents(app, uuid_count, frame='embedded', item_types=None):
+    registry = app.registry
+    request = app.request_factory.blank('/_embed_copy_benchmark')
+    request.registry = registry
+    documents = []
+    for uuid in itertools.islice(all_uuids(registry, item_types), uuid_count):
+        result = request.embed('/%s/@@%s' % (uuid, frame), as_user=True)
+        documents.append(quick_deepcopy(result))
+    return documents
+
+
+def _touch(obj):
+    '''Read one level of obj the way expand_path does'''
+    for value in obj.values():
+        if isinstance(value, list):
+            for member in value:
+                pass
+    return obj
+
+
+def run(documents, number):
+    benchmarks = [
+        ('copy', lambda copier: [copier(doc) for doc in documents]),
+        ('copy+touch', lambda copier: [_touch(copier(doc)) for doc in documents]),
+        ('copy+json', lambda copier: [json.dumps(copier(doc)) for doc in documents]),
+    ]
+    results = []
+    for name, benchmark in benchmarks:
+        result = {'benchmark': name, 'documents': len(documents)}
+        for copier in (quick_deepcopy, lazy_copy):
+            run_time = timeit.timeit(lambda: benchmark(copier), number=number)
+            result[copier.__name__] = run_time / number
+        result['speedup'] = (
+            result['quick_deepcopy'] / result['lazy_copy']
+            if result['lazy_copy'] else 0.0
+        )
+        print(
+            '{benchmark:>10}: {documents} documents, '
+            'quick_deepcopy {quick_deepcopy:.6f}s, lazy_copy {lazy_copy:.6f}s, '
+            '{speedup:.1f}x'.format(**result)
+        )
+        results.append(result)
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark embed cache hit copies", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--item-type', action='append', help="Item type")
+    parser.add_argument('--uuids', type=int, default=200, help="Number of uuids to render")
+    parser.add_argument('--frame', default='embedded', help="Frame to render")
+    parser.add_argument(
+        '--documents', action='append',
+        help="Json file or directory of json files to use instead of an app",
+    )
+    parser.add_argument('--number', type=int, default=20, help="Runs of each benchmark")
+    parser.add_argument('config_uri', nargs='?', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    if args.documents:
+        documents = load_documents(args.documents)
+    elif args.config_uri:
+        app = get_app(args.config_uri, args.app_name)
+        documents = render_documents(app, args.uuids, args.frame, args.item_type)
+    else:
+        parser.error('config_uri or --documents is required')
+    return run(documents, args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""\
+Compare MPIndexer worker lifecycles in uuids/sec
+
+Renders and indexes the same uuids once per lifecycle, in batches like the
+indexer queue worker would, and prints the throughput of each run.
+
+    %(prog)s development.ini --app-name app --uuids 5000 --lifecycle task --lifecycle persistent
+
+"""
+import itertools
+import logging
+import time
+
+import transaction
+from pyramid.paster import get_app
+
+from snovault import DBSESSION
+from snovault.elasticsearch.indexer_state import all_uuids
+from snovault.elasticsearch.interfaces import INDEXER
+from snovault.elasticsearch.mpindexer import WORKER_LIFECYCLES
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+
+def get_xmin(registry):
+    session = registry[DBSESSION]()
+    connection = session.connection()
+    xmin = connection.execute(
+        "SELECT txid_snapshot_xmin(txid_current_snapshot());"
+    ).scalar()
+    transaction.abort()
+    return xmin
+
+
+def run_lifecycle(indexer, request, uuids, xmin, batch_size, lifecycle):
+    # pylint: disable=too-many-arguments
+    indexer.shutdown()
+    indexer.worker_lifecycle = lifecycle
+    indexer.maxtasks = 1 if lifecycle == 'task' else None
+    errors = []
+    reused = 0
+    start_time = time.time()
+    for beg in range(0, len(uuids), batch_size):
+        update_infos, batch_errors = indexer.update_objects(
+            request,
+            uuids[beg:beg + batch_size],
+            xmin,
+        )
+        errors.extend(batch_errors)
+        reused += sum(
+            1 for update_info in update_infos
+            if update_info['map_info'].get('snapshot_reused')
+        )
+    indexer.end_cycle()
+    run_time = time.time() - start_time
+    indexer.shutdown()
+    return {
+        'lifecycle': lifecycle,
+        'uuids': len(uuids),
+        'run_time': run_time,
+        'uuids_per_sec': len(uuids) / run_time if run_time else 0.0,
+        'snapshots_reused': reused,
+        'errors': len(errors),
+    }
+
+
+def run(app, uuid_count, batch_size, lifecycles, item_types=None):
+    registry = app.registry
+    indexer = registry[INDEXER]
+    uuids = list(itertools.islice(all_uuids(registry, item_types), uuid_count))
+    xmin = get_xmin(registry)
+    request = app.request_factory.blank('/_indexer_benchmark')
+    request.registry = registry
+    results = []
+    for lifecycle in lifecycles:
+        result = run_lifecycle(indexer, request, uuids, xmin, batch_size, lifecycle)
+        print(
+            '{lifecycle:>10}: {uuids} uuids in {run_time:.2f}s, '
+            '{uuids_per_sec:.1f} uuids/sec, {snapshots_reused} snapshots reused, '
+            '{errors} errors'.format(**result)
+        )
+        results.append(result)
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark MPIndexer worker lifecycles", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--item-type', action='append', help="Item type")
+    parser.add_argument('--uuids', type=int, default=2000, help="Number of uuids to index")
+    parser.add_argument('--batch-size', type=int, default=500, help="Uuids per update_objects call")
+    parser.add_argument('--processes', default='4', help="Indexer worker processes")
+    parser.add_argument(
+        '--lifecycle', action='append', choices=WORKER_LIFECYCLES,
+        help="Worker lifecycle to run, defaults to task and persistent",
+    )
+    parser.add_argument('config_uri', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    options = {
+        'embed_cache.capacity': '5000',
+        'indexer': 'true',
+        'queue_server': 'true',
+        'queue_worker': 'true',
+        'queue_worker_processes': args.processes,
+    }
+    app = get_app(args.config_uri, args.app_name, options)
+    lifecycles = args.lifecycle or ['task', 'persistent']
+    return run(app, args.uuids, args.batch_size, lifecycles, args.item_type)
+
+
+if __name__ == '__main__':
+    main()
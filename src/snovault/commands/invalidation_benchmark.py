@@ -0,0 +1,105 @@
+"""\
+Compare CachedModel.invalidated against building sets of document uuids
+
+Times the invalidation check an editor's request makes for each item read
+from elasticsearch, on generated documents with large embedded_uuids lists
+and a full session of edits that miss them:
+
+    %(prog)s --documents 200 --uuids 5000 --edits 10
+
+The sets baseline rebuilds python sets of both uuid lists per document, as
+the check did before session edits were combined once per request.
+"""
+import logging
+import timeit
+import uuid
+
+from snovault.elasticsearch.esstorage import SessionEdits
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+
+def make_documents(document_count, uuid_count):
+    '''Sorted uuid lists, as item_index_data writes them'''
+    documents = []
+    for _ in range(document_count):
+        embedded_uuids = sorted(str(uuid.uuid4()) for _ in range(uuid_count))
+        documents.append({
+            'embedded_uuids': embedded_uuids,
+            'linked_uuids': embedded_uuids[:uuid_count // 10],
+        })
+    return documents
+
+
+def make_edits(edit_count, uuids_per_edit):
+    return [
+        [xid, [str(uuid.uuid4()) for _ in range(uuids_per_edit)], []]
+        for xid in range(1, edit_count + 1)
+    ]
+
+
+def invalidated_sets(edits, version, source):
+    '''The check as it was, building sets per document'''
+    linked_uuids = set(source['linked_uuids'])
+    embedded_uuids = set(source['embedded_uuids'])
+    for xid, updated, linked in edits:
+        if xid < version:
+            continue
+        if updated is None:
+            return True
+        if not embedded_uuids.isdisjoint(updated):
+            return True
+        if not linked_uuids.isdisjoint(linked):
+            return True
+    return False
+
+
+def run(document_count, uuid_count, edit_count, uuids_per_edit, number):
+    # pylint: disable=too-many-arguments
+    documents = make_documents(document_count, uuid_count)
+    edits = make_edits(edit_count, uuids_per_edit)
+    # Hashed once per request
+    session_edits = SessionEdits(edits)
+    benchmarks = [
+        ('sets', lambda: [invalidated_sets(edits, 0, source) for source in documents]),
+        ('session', lambda: [session_edits.invalidates(0, source) for source in documents]),
+    ]
+    results = []
+    for name, benchmark in benchmarks:
+        run_time = min(timeit.repeat(benchmark, number=1, repeat=number))
+        result = {
+            'benchmark': name,
+            'documents': document_count,
+            'uuids': uuid_count,
+            'latency': run_time / document_count,
+        }
+        print(
+            '{benchmark:>7}: {documents} documents of {uuids} uuids, '
+            '{latency_us:.1f}us per check'.format(latency_us=result['latency'] * 1e6, **result)
+        )
+        results.append(result)
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark the CachedModel invalidation check", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--documents', type=int, default=200, help="Documents to check")
+    parser.add_argument('--uuids', type=int, default=5000, help="embedded_uuids per document")
+    parser.add_argument('--edits', type=int, default=10, help="Edits in the session")
+    parser.add_argument('--uuids-per-edit', type=int, default=10, help="Updated uuids per edit")
+    parser.add_argument('--number', type=int, default=5, help="Runs, the fastest is reported")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    return run(args.documents, args.uuids, args.edits, args.uuids_per_edit, args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""\
+Store database blobs uncompressed for ranged downloads
+
+Sets the blobs data column to STORAGE EXTERNAL, as new databases create it,
+then rewrites blobs compressed before, so chunked @@download reads only
+detoast their own slices:
+
+    %(prog)s development.ini --app-name app
+
+Uncompressed blobs are skipped, so the migration can be rerun.  Until it has
+run, compressed blobs are downloaded with a single read.
+"""
+import logging
+
+from pyramid.paster import get_app
+from sqlalchemy import text
+
+from snovault import DBSESSION
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+_set_storage_external = text("""
+    ALTER TABLE blobs ALTER COLUMN data SET STORAGE EXTERNAL;
+""")
+
+_select_blob_ids = text("""
+    SELECT blob_id FROM blobs
+    WHERE blob_id > CAST(:after AS uuid)
+    ORDER BY blob_id LIMIT :limit;
+""")
+
+# Concatenating detoasts the value, so it is stored again under EXTERNAL
+_rewrite_compressed = text("""
+    UPDATE blobs SET data = data || ''::bytea
+    WHERE blob_id = ANY(CAST(:blob_ids AS uuid[]))
+    AND pg_column_size(data) < octet_length(data);
+""")
+
+
+def migrate(engine, batch_size=100):
+    '''Set the column storage, then rewrite compressed blobs one transaction per batch'''
+    with engine.begin() as connection:
+        connection.execute(_set_storage_external)
+    after = '00000000-0000-0000-0000-000000000000'
+    blobs = 0
+    rewritten = 0
+    while True:
+        with engine.begin() as connection:
+            blob_ids = [
+                str(blob_id) for blob_id, in connection.execute(
+                    _select_blob_ids, after=after, limit=batch_size,
+                )
+            ]
+            if not blob_ids:
+                break
+            result = connection.execute(_rewrite_compressed, blob_ids=blob_ids)
+        after = blob_ids[-1]
+        blobs += len(blob_ids)
+        rewritten += result.rowcount
+        log.info('Checked %d blobs, %d rewritten uncompressed', blobs, rewritten)
+    return blobs, rewritten
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Store database blobs uncompressed", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--batch-size', type=int, default=100, help="Blobs per transaction")
+    parser.add_argument('config_uri', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    log.setLevel(logging.INFO)
+    app = get_app(args.config_uri, args.app_name)
+    engine = app.registry[DBSESSION].bind
+    blobs, rewritten = migrate(engine, args.batch_size)
+    print('{} blobs, {} rewritten uncompressed'.format(blobs, rewritten))
+
+
+if __name__ == '__main__':
+    main()
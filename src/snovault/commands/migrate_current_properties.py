@@ -0,0 +1,83 @@
+"""\
+Create and fill the current_properties table
+
+Deploy with storage.current_properties = write so new edits are copied to the
+table, run the migration, then switch to storage.current_properties = read:
+
+    %(prog)s development.ini --app-name app
+
+Rows already written by the app are kept, so the migration can be rerun.
+"""
+import logging
+
+from pyramid.paster import get_app
+from sqlalchemy import text
+
+from snovault import DBSESSION
+from snovault.storage import CurrentProperties
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+_select_rids = text("""
+    SELECT rid FROM resources
+    WHERE rid > CAST(:after AS uuid)
+    ORDER BY rid LIMIT :limit;
+""")
+
+_insert_current_properties = text("""
+    INSERT INTO current_properties (rid, name, properties, tid)
+    SELECT current_propsheets.rid, current_propsheets.name, propsheets.properties, propsheets.tid
+    FROM current_propsheets
+    JOIN propsheets ON propsheets.sid = current_propsheets.sid
+    WHERE current_propsheets.rid = ANY(CAST(:rids AS uuid[]))
+    ON CONFLICT (rid, name) DO NOTHING;
+""")
+
+
+def migrate(engine, batch_size=1000):
+    '''Copy current propsheets of every resource, one transaction per batch'''
+    CurrentProperties.__table__.create(engine, checkfirst=True)
+    after = '00000000-0000-0000-0000-000000000000'
+    resources = 0
+    inserted = 0
+    while True:
+        with engine.begin() as connection:
+            rids = [
+                str(rid) for rid, in connection.execute(
+                    _select_rids, after=after, limit=batch_size,
+                )
+            ]
+            if not rids:
+                break
+            result = connection.execute(_insert_current_properties, rids=rids)
+        after = rids[-1]
+        resources += len(rids)
+        inserted += result.rowcount
+        log.info('Migrated %d resources, %d rows inserted', resources, inserted)
+    return resources, inserted
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Fill the current_properties table", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Resources per transaction")
+    parser.add_argument('config_uri', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    log.setLevel(logging.INFO)
+    app = get_app(args.config_uri, args.app_name)
+    engine = app.registry[DBSESSION].bind
+    resources, inserted = migrate(engine, args.batch_size)
+    print('{} resources, {} current_properties rows inserted'.format(resources, inserted))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""\
+Replace the links target index with ix_links_target_rel
+
+Builds the (target, rel) index rev link queries filter on, as new databases
+create it, then drops the single column target index it replaces.  Both run
+concurrently so writes are not blocked:
+
+    %(prog)s development.ini --app-name app
+
+An index left invalid by an interrupted build is rebuilt, so the migration
+can be rerun.
+"""
+import logging
+
+from pyramid.paster import get_app
+from sqlalchemy import text
+
+from snovault import DBSESSION
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+_select_index_valid = text("""
+    SELECT indisvalid FROM pg_index
+    WHERE indexrelid = to_regclass('ix_links_target_rel');
+""")
+
+_drop_invalid_index = text("""
+    DROP INDEX CONCURRENTLY IF EXISTS ix_links_target_rel;
+""")
+
+_create_index = text("""
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_links_target_rel ON links (target, rel);
+""")
+
+_drop_target_index = text("""
+    DROP INDEX CONCURRENTLY IF EXISTS ix_links_target;
+""")
+
+
+def migrate(engine):
+    '''Create the index and drop the old one outside of a transaction'''
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+        if connection.execute(_select_index_valid).scalar() is False:
+            log.info('Rebuilding invalid ix_links_target_rel')
+            connection.execute(_drop_invalid_index)
+        connection.execute(_create_index)
+        log.info('Created ix_links_target_rel')
+        connection.execute(_drop_target_index)
+        log.info('Dropped ix_links_target')
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Index links by target and rel", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('config_uri', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    log.setLevel(logging.INFO)
+    app = get_app(args.config_uri, args.app_name)
+    engine = app.registry[DBSESSION].bind
+    migrate(engine)
+    print('links indexed by target and rel')
+
+
+if __name__ == '__main__':
+    main()
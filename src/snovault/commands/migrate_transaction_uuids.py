@@ -0,0 +1,90 @@
+"""\
+Add the uuid[] columns for storage.transaction_uuids = array
+
+Adds the transactions updated and renamed columns, then moves the uuid lists
+of existing records out of their jsonb data so the indexer reads them from
+the columns:
+
+    %(prog)s development.ini --app-name app
+
+Records written in json mode are still read, so --skip-existing only adds
+the columns.
+"""
+import logging
+
+from pyramid.paster import get_app
+from sqlalchemy import text
+
+from snovault import DBSESSION
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+_add_columns = text("""
+    ALTER TABLE transactions
+    ADD COLUMN IF NOT EXISTS updated uuid[],
+    ADD COLUMN IF NOT EXISTS renamed uuid[];
+""")
+
+_move_uuids = text("""
+    UPDATE transactions SET
+        updated = ARRAY(SELECT CAST(jsonb_array_elements_text(data -> 'updated') AS uuid)),
+        renamed = ARRAY(SELECT CAST(jsonb_array_elements_text(data -> 'renamed') AS uuid)),
+        data = data - 'updated' - 'renamed'
+    WHERE "order" IN (
+        SELECT "order" FROM transactions
+        WHERE "order" > :after AND (data ? 'updated' OR data ? 'renamed')
+        ORDER BY "order" LIMIT :limit
+    )
+    RETURNING "order";
+""")
+
+
+def migrate(engine, batch_size=1000, skip_existing=False):
+    '''Add the columns, then move existing uuid lists one transaction per batch'''
+    with engine.begin() as connection:
+        connection.execute(_add_columns)
+    if skip_existing:
+        return 0
+    after = 0
+    moved = 0
+    while True:
+        with engine.begin() as connection:
+            orders = [
+                order for order, in connection.execute(_move_uuids, after=after, limit=batch_size)
+            ]
+        if not orders:
+            break
+        after = max(orders)
+        moved += len(orders)
+        log.info('Moved uuids of %d transactions', moved)
+    return moved
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Store transaction uuids in uuid[] columns", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Transactions per batch")
+    parser.add_argument(
+        '--skip-existing', action='store_true',
+        help="Only add the columns, leave existing records in json",
+    )
+    parser.add_argument('config_uri', help="path to configfile")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    log.setLevel(logging.INFO)
+    app = get_app(args.config_uri, args.app_name)
+    engine = app.registry[DBSESSION].bind
+    moved = migrate(engine, args.batch_size, args.skip_existing)
+    print('{} transactions moved to uuid[] columns'.format(moved))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""\
+Compare streaming limit=all search results from raw hits with dsl Hits
+
+Times StreamedResponse writing an @graph of search hits, built from fixture
+documents loaded from json files or directories and repeated to --rows:
+
+    %(prog)s --documents src/snowflakes/tests/data/inserts --rows 50000
+
+The hits baseline wraps every hit in an elasticsearch_dsl Hit, unlayers it
+into an OrderedDict and writes each json token separately, as streaming did
+before hits were read from their _source.  The sources benchmark runs the
+current HitsToGraphMixin and StreamedResponse, which use orjson when it is
+installed.
+"""
+import itertools
+import json
+import logging
+import timeit
+
+from collections import OrderedDict
+from elasticsearch_dsl.response import Hit
+
+from snovault.commands.embed_copy_benchmark import load_documents
+from snovault.elasticsearch.searches.defaults import KEEP_LAYERED_FIELDS
+from snovault.elasticsearch.searches.mixins import HitsToGraphMixin
+from snovault.elasticsearch.searches.responses import FieldedResponse
+from snovault.elasticsearch.searches.responses import StreamedResponse
+
+
+EPILOG = __doc__
+
+log = logging.getLogger(__name__)
+
+
+def make_hits(documents, row_count):
+    '''Raw hits as elasticsearch returns them, embedded and audit frames'''
+    return [
+        {
+            '_index': 'snovault',
+            '_type': 'item',
+            '_id': str(i),
+            '_score': 1.0,
+            '_source': {'embedded': document, 'audit': {}},
+        }
+        for i, document in zip(range(row_count), itertools.cycle(documents))
+    ]
+
+
+def unlayer_ordered(hit_dict, keep_layered=KEEP_LAYERED_FIELDS):
+    '''_unlayer as it was, rebuilding an OrderedDict per hit'''
+    r = {}
+    for k, v in hit_dict.items():
+        if k in keep_layered:
+            r.update({k: v})
+        else:
+            r.update(v)
+    return OrderedDict(sorted(r.items()))
+
+
+class TokenStreamedResponse(StreamedResponse):
+    '''Writes every token separately, encoded with json.dumps'''
+
+    def _to_json(self, value):
+        return json.dumps(value)
+
+    def __iter__(self):
+        for s in self._iter():
+            yield s.encode('utf-8')
+
+
+def stream_hits(hits):
+    fielded_response = FieldedResponse()
+    fielded_response.response = {
+        '@graph': (unlayer_ordered(Hit(hit).to_dict()) for hit in hits),
+    }
+    return sum(len(chunk) for chunk in TokenStreamedResponse(fielded_response))
+
+
+def stream_sources(hits):
+    mixin = HitsToGraphMixin()
+    fielded_response = FieldedResponse()
+    fielded_response.response = {
+        '@graph': (mixin._unlayer(hit['_source']) for hit in hits),
+    }
+    return sum(len(chunk) for chunk in StreamedResponse(fielded_response))
+
+
+def run(documents, row_count, number):
+    hits = make_hits(documents, row_count)
+    benchmarks = [
+        ('hits', stream_hits),
+        ('sources', stream_sources),
+    ]
+    results = []
+    for name, benchmark in benchmarks:
+        size = benchmark(hits)
+        run_time = min(timeit.repeat(lambda: benchmark(hits), number=1, repeat=number))
+        result = {
+            'benchmark': name,
+            'rows': row_count,
+            'bytes': size,
+            'rows_per_second': row_count / run_time,
+        }
+        print(
+            '{benchmark:>7}: {rows} rows, {megabytes:.1f}MB, '
+            '{rows_per_second:.0f} rows/sec'.format(megabytes=size / 1e6, **result)
+        )
+        results.append(result)
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark streaming search results", epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        '--documents', nargs='+', default=['src/snowflakes/tests/data/inserts'],
+        help="Json files or directories of documents to stream as hits",
+    )
+    parser.add_argument('--rows', type=int, default=50000, help="Hits to stream")
+    parser.add_argument('--number', type=int, default=3, help="Runs, the fastest is reported")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    documents = load_documents(args.documents)
+    return run(documents, args.rows, args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,10 @@
 from past.builtins import basestring
 from pyramid.decorator import reify
 from uuid import UUID
-from .cache import ManagerLRUCache
+from .cache import (
+    ManagerLRUCache,
+    TidLRUCache,
+)
 from .interfaces import (
     CONNECTION,
     STORAGE,
@@ -26,6 +29,12 @@ class Connection(object):
         self.unique_key_cache = ManagerLRUCache('snovault.connection.key_cache', 1000)
         embed_cache_capacity = int(registry.settings.get('embed_cache.capacity', 5000))
         self.embed_cache = ManagerLRUCache('snovault.connection.embed_cache', embed_cache_capacity)
+        # Optional renders shared across requests, 0 disables
+        process_capacity = int(registry.settings.get('embed_cache.process_capacity', 0))
+        self.process_embed_cache = None
+        if process_capacity:
+            self.process_embed_cache = TidLRUCache(process_capacity)
+
     @reify
     def storage(self):
         return self.registry[STORAGE]
@@ -34,7 +43,7 @@ class Connection(object):
     def types(self):
         return self.registry[TYPES]
 
-    def get_by_uuid(self, uuid, default=None):
+    def get_by_uuid(self, uuid, default=None, index=None):
         if isinstance(uuid, basestring):
             try:
                 uuid = UUID(uuid)
@@ -48,10 +57,45 @@ class Connection(object):
         if cached is not None:
             return cached
 
-        model = self.storage.get_by_uuid(uuid)
+        model = self.storage.get_by_uuid(uuid, index=index)
         if model is None:
             return default
-
+        return self._cache_item(uuid, model)
+
+    def get_many(self, uuids, default=None):
+        ''' Returns items in the order of uuids, loading uncached ones in one batch
+        '''
+        keys = []
+        for uuid in uuids:
+            if isinstance(uuid, basestring):
+                try:
+                    uuid = UUID(uuid)
+                except ValueError:
+                    keys.append(None)
+                    continue
+            elif not isinstance(uuid, UUID):
+                raise TypeError(uuid)
+            keys.append(str(uuid))
+
+        items = {}
+        missing = []
+        for uuid in keys:
+            if uuid is None or uuid in items:
+                continue
+            cached = self.item_cache.get(uuid)
+            if cached is not None:
+                items[uuid] = cached
+            else:
+                missing.append(uuid)
+        if missing:
+            models = self.storage.get_many(missing)
+            for uuid in missing:
+                model = models.get(uuid)
+                if model is not None:
+                    items[uuid] = self._cache_item(uuid, model)
+        return [items.get(uuid, default) for uuid in keys]
+
+    def _cache_item(self, uuid, model):
         try:
             Item = self.types.by_item_type[model.item_type].factory
         except KeyError:
@@ -62,6 +106,20 @@ class Connection(object):
         self.item_cache[uuid] = item
         return item
 
+    def get_tid(self, uuid):
+        item = self.get_by_uuid(uuid)
+        if item is None:
+            return None
+        return item.tid
+
+    def get_tids(self, uuids):
+        ''' Returns dict of uuid to tid, None for missing items, loaded with get_many
+        '''
+        return {
+            uuid: None if item is None else item.tid
+            for uuid, item in zip(uuids, self.get_many(uuids))
+        }
+
     def get_by_unique_key(self, unique_key, name, default=None, index=None):
         pkey = (unique_key, name)
 
@@ -78,21 +136,16 @@ class Connection(object):
         cached = self.item_cache.get(uuid)
         if cached is not None:
             return cached
-
-        try:
-            Item = self.types.by_item_type[model.item_type].factory
-        except KeyError:
-            raise UnknownItemTypeError(model.item_type)
-
-        item = Item(self.registry, model)
-        model.used_for(item)
-        self.item_cache[uuid] = item
-        return item
+        return self._cache_item(uuid, model)
 
     def get_rev_links(self, model, rel, *types):
         item_types = [self.types[t].item_type for t in types]
         return self.storage.get_rev_links(model, rel, *item_types)
 
+    def get_rev_links_many(self, models, rel, *types):
+        item_types = [self.types[t].item_type for t in types]
+        return self.storage.get_rev_links_many(models, rel, *item_types)
+
     def __iter__(self, *types):
         if not types:
             item_types = self.types.by_item_type.keys()
@@ -101,6 +154,13 @@ class Connection(object):
         for uuid in self.storage.__iter__(*item_types):
             yield uuid
 
+    def iter_uuid_bytes(self, *types):
+        if not types:
+            item_types = self.types.by_item_type.keys()
+        else:
+            item_types = [self.types[t].item_type for t in types]
+        return self.storage.iter_uuid_bytes(*item_types)
+
     def __len__(self, *types):
         if not types:
             item_types = self.types.by_item_type.keys()
@@ -120,3 +180,10 @@ class Connection(object):
 
     def update(self, model, properties, sheets=None, unique_keys=None, links=None):
         self.storage.update(model, properties, sheets, unique_keys, links)
+
+    def bulk_create(self, rows):
+        '''Insert new items from (type, uuid, properties, unique_keys, links) rows'''
+        self.storage.bulk_create(
+            (self.types[type_].item_type, uuid, properties, unique_keys, links)
+            for type_, uuid, properties, unique_keys, links in rows
+        )
@@ -20,11 +20,13 @@ from .resources import (
     Collection,
     Item,
 )
+from .util import simple_path_ids
 from .validation import ValidationFailure
 from .validators import (
     no_validate_item_content_patch,
     no_validate_item_content_post,
     no_validate_item_content_put,
+    validate_item_content_bulk_post,
     validate_item_content_patch,
     validate_item_content_post,
     validate_item_content_put,
@@ -179,6 +181,62 @@ def collection_add(context, request, render=None):
     return result
 
 
+def bulk_supported(type_info):
+    '''Items of the type are fully written by properties, unique keys and links'''
+    return type_info.factory._update is Item._update and not type_info.schema_rev_links
+
+
+@view_config(context=Collection, permission='add', request_method='POST',
+             name='bulk', validators=[validate_item_content_bulk_post])
+def collection_bulk_add(context, request):
+    '''
+    Create a batch of items in one transaction
+
+    Items of types supporting it are written with COPY.  Created events are
+    not sent, the batch uuids and those the new items rev_link are recorded as
+    updated for the indexer instead.  Other types are created one by one.
+    '''
+    type_info = context.type_info
+    items = request.validated['@graph']
+    if not bulk_supported(type_info):
+        uuids = [str(create_item(type_info, request, properties).uuid) for properties in items]
+    else:
+        uuids = bulk_create_items(context, request, items)
+    request.response.status = 201
+    return {
+        'status': 'success',
+        '@type': ['result'],
+        '@graph': uuids,
+    }
+
+
+def bulk_create_items(collection, request, items):
+    registry = request.registry
+    conn = registry[CONNECTION]
+    type_info = collection.type_info
+    updated = request._updated_uuid_paths
+    rows = []
+    for index, properties in enumerate(items):
+        properties = properties.copy()
+        if 'uuid' in properties:
+            uuid = UUID(properties.pop('uuid'))
+        else:
+            uuid = uuid4()
+        item = type_info.factory(registry, conn.create(type_info.name, uuid))
+        try:
+            unique_keys, links = item.unique_keys_and_links(properties)
+        except ValidationFailure as e:
+            e.detail['name'] = ['@graph', index] + e.detail['name']
+            raise
+        rows.append((type_info.name, uuid, properties, unique_keys, links))
+        updated[str(uuid)].add(request.resource_path(collection, str(uuid)))
+        for path in type_info.merged_back_rev:
+            for target in simple_path_ids(properties, path):
+                updated[target]
+    conn.bulk_create(rows)
+    return [str(row[1]) for row in rows]
+
+
 @view_config(context=Item, permission='edit', request_method='PUT',
              validators=[validate_item_content_put], decorator=if_match_tid)
 @view_config(context=Item, permission='edit', request_method='PATCH',
@@ -39,6 +39,7 @@ def includeme(config):
 
     config.include('.cached_views')
     config.include('.esstorage')
+    config.include('.searches.caches')
 
     config.include('.indexer')
     config.include('.indexer_state')
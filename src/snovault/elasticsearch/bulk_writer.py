@@ -0,0 +1,223 @@
+'''
+Bulk api writer for the indexer
+- Collects rendered @@index-data documents and writes them to elasticsearch
+with the _bulk endpoint instead of one index call per uuid.
+- Keeps the per uuid es_info/update_info shape of Indexer.update_object so
+the indexer state and logging do not care which write path was used.
+'''
+import logging
+import time
+
+from elasticsearch.exceptions import (
+    ConnectionError,
+    TransportError,
+)
+from sqlalchemy.exc import StatementError
+from urllib3.exceptions import ReadTimeoutError
+
+
+log = logging.getLogger('snovault.elasticsearch.es_index_listener')
+BULK_BACKOFFS = [0, 10, 20, 40, 80]
+BULK_CONFLICT_STATUS = 409
+BULK_RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def _new_backoff_info():
+    return {
+        'start_time': time.time(),
+        'end_time': None,
+        'run_time': None,
+        'error': None,
+    }
+
+
+def _close_backoff_info(backoff_info):
+    end_time = time.time()
+    backoff_info['end_time'] = end_time
+    backoff_info['run_time'] = end_time - backoff_info['start_time']
+
+
+class BulkIndexWriter(object):
+    '''
+    Batch rendered documents and flush them through the es bulk api
+
+    Each document keeps external_gte versioning on xmin.  Failures are
+    retried per item, only the items that failed with a retryable status
+    are sent again on the next backoff.  With a retry_scheduler they are
+    scheduled for retry instead of sleeping, and left out of the flushed
+    pairs, the scheduler's finish returns them.
+    '''
+    def __init__(self, encoded_es, xmin, bulk_size, request_timeout=30, retry_scheduler=None):
+        # pylint: disable=too-many-arguments
+        self.encoded_es = encoded_es
+        self.xmin = xmin
+        self.bulk_size = bulk_size
+        self.request_timeout = request_timeout
+        self.retry_scheduler = retry_scheduler
+        self._pending = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, uuid, doc, update_info):
+        '''
+        Add a rendered document
+
+        Returns the flushed (update_info, last_exc) pairs when the batch is full
+        '''
+        es_info = update_info['es_info']
+        es_info['item_type'] = doc['item_type']
+        self._pending.append((str(uuid), doc, update_info))
+        if len(self._pending) >= self.bulk_size:
+            return self.flush()
+        return []
+
+    def _get_action(self, uuid, doc):
+        action = {
+            '_index': doc['item_type'],
+            '_type': doc['item_type'],
+            '_id': uuid,
+        }
+        if self.xmin is not None:
+            action['_version'] = self.xmin
+            action['_version_type'] = 'external_gte'
+        return {'index': action}
+
+    def _get_body(self, items):
+        body = []
+        for uuid, doc, _ in items:
+            body.append(self._get_action(uuid, doc))
+            body.append(doc)
+        return body
+
+    def _handle_item_result(self, uuid, result, backoff_info):
+        '''
+        Check one item of a bulk response
+
+        Returns (retry, last_exc)
+        '''
+        status = result.get('status', 500)
+        if status < 300:
+            return False, None
+        error = result.get('error')
+        if status == BULK_CONFLICT_STATUS:
+            msg = 'Conflict indexing %s at version %d' % (uuid, self.xmin)
+            log.warning(msg)
+            backoff_info['error'] = {
+                'msg': msg,
+                'last_exc': None,
+            }
+            return False, None
+        last_exc = repr(error)
+        if status in BULK_RETRY_STATUSES:
+            msg = 'Retryable error indexing %s: %r' % (uuid, error)
+            log.warning(msg)
+            backoff_info['error'] = {
+                'msg': msg,
+                'last_exc': last_exc,
+            }
+            return True, last_exc
+        msg = 'Error indexing %s' % (uuid)
+        log.error('%s: %r', msg, error)
+        backoff_info['error'] = {
+            'msg': msg,
+            'last_exc': None,
+        }
+        return False, last_exc
+
+    def _send(self, items, backoff):
+        '''
+        Send one bulk request for items
+
+        Returns list of (item, last_exc) to retry and dict of uuid to last_exc
+        for items that failed for good.
+        '''
+        retries = []
+        failed = {}
+        backoff_infos = {}
+        for uuid, _, update_info in items:
+            backoff_info = _new_backoff_info()
+            update_info['es_info']['backoffs'][str(backoff)] = backoff_info
+            backoff_infos[uuid] = backoff_info
+        try:
+            res = self.encoded_es.bulk(
+                body=self._get_body(items),
+                request_timeout=self.request_timeout,
+            )
+        except StatementError:
+            # Can't reconnect until invalid transaction is rolled back
+            raise
+        except (ConnectionError, ReadTimeoutError, TransportError) as ecp:
+            last_exc = repr(ecp)
+            for item in items:
+                uuid = item[0]
+                msg = 'Retryable error indexing %s: %r' % (uuid, ecp)
+                log.warning(msg)
+                backoff_infos[uuid]['error'] = {
+                    'msg': msg,
+                    'last_exc': last_exc,
+                }
+                retries.append((item, last_exc))
+        except Exception as ecp:  # pylint: disable=broad-except
+            last_exc = repr(ecp)
+            for uuid, _, _ in items:
+                msg = 'Error indexing %s' % (uuid)
+                log.error(msg, exc_info=True)
+                backoff_infos[uuid]['error'] = {
+                    'msg': msg,
+                    'last_exc': None,
+                }
+                failed[uuid] = last_exc
+        else:
+            for item, result in zip(items, res['items']):
+                uuid = item[0]
+                retry, last_exc = self._handle_item_result(
+                    uuid,
+                    result['index'],
+                    backoff_infos[uuid],
+                )
+                if retry:
+                    retries.append((item, last_exc))
+                elif last_exc:
+                    failed[uuid] = last_exc
+        for backoff_info in backoff_infos.values():
+            _close_backoff_info(backoff_info)
+        return retries, failed
+
+    def flush(self):
+        '''Write all pending documents, returns (update_info, last_exc) pairs'''
+        batch = self._pending
+        self._pending = []
+        if not batch:
+            return []
+        start_time = time.time()
+        for _, _, update_info in batch:
+            update_info['es_info']['start_time'] = start_time
+        failed = {}
+        items = batch
+        retries = []
+        backoffs = BULK_BACKOFFS if self.retry_scheduler is None else BULK_BACKOFFS[:1]
+        for backoff in backoffs:
+            time.sleep(backoff)
+            retries, batch_failed = self._send(items, backoff)
+            failed.update(batch_failed)
+            if not retries:
+                break
+            items = [item for item, _ in retries]
+        scheduled = set()
+        for item, last_exc in retries:
+            if self.retry_scheduler is None:
+                failed[item[0]] = last_exc
+            else:
+                self.retry_scheduler.schedule(*item, last_exc)
+                scheduled.add(item[0])
+        end_time = time.time()
+        update_infos = []
+        for uuid, _, update_info in batch:
+            if uuid in scheduled:
+                continue
+            es_info = update_info['es_info']
+            es_info['end_time'] = end_time
+            es_info['run_time'] = end_time - es_info['start_time']
+            update_infos.append((update_info, failed.get(uuid)))
+        return update_infos
@@ -1,6 +1,9 @@
 from snovault.util import get_root_request
+from bisect import bisect_left
 from elasticsearch.helpers import scan
 from pyramid.threadlocal import get_current_request
+from sqlalchemy.util import LRUCache
+from uuid import UUID
 from zope.interface import alsoProvides
 from .interfaces import (
     ELASTIC_SEARCH,
@@ -10,6 +13,9 @@ from .interfaces import (
 
 
 SEARCH_MAX = (2 ** 31) - 1
+ROUTING_CACHE_CAPACITY = 100000
+# Binary search document uuid lists this many times longer than the edited uuids
+BISECT_RATIO = 20
 
 
 def includeme(config):
@@ -18,7 +24,10 @@ def includeme(config):
     es = registry[ELASTIC_SEARCH]
     es_index = RESOURCES_INDEX
     wrapped_storage = registry[STORAGE]
-    registry[STORAGE] = PickStorage(ElasticSearchStorage(es, es_index), wrapped_storage)
+    routing_capacity = int(registry.settings.get(
+        'esstorage.routing_cache.capacity', ROUTING_CACHE_CAPACITY))
+    registry[STORAGE] = PickStorage(
+        ElasticSearchStorage(es, es_index, routing_capacity), wrapped_storage)
 
 
 def force_database_for_request():
@@ -27,6 +36,80 @@ def force_database_for_request():
         request.datastore = 'database'
 
 
+def _contains_any(uuids, edited):
+    '''Any of the sorted edited uuids in a document's sorted list of uuids
+
+    Long lists are binary searched rather than scanned or made into sets.
+    '''
+    if not edited:
+        return False
+    size = len(uuids)
+    if size <= BISECT_RATIO * len(edited):
+        return not edited.isdisjoint(uuids)
+    for uuid in edited.sorted:
+        index = bisect_left(uuids, uuid)
+        if index < size and uuids[index] == uuid:
+            return True
+    return False
+
+
+class EditedUuids(frozenset):
+    '''Uuids changed by session edits, also kept sorted for binary search'''
+    def __new__(cls, uuids):
+        self = super(EditedUuids, cls).__new__(cls, uuids)
+        self.sorted = sorted(self)
+        return self
+
+
+class SessionEdits(object):
+    '''The session's recent edits, combined once per request
+
+    For each edit the uuids changed by it and all later edits are
+    precomputed, so a document indexed at version only needs the first edit
+    at or after that version.
+    '''
+    def __init__(self, edits):
+        edits = sorted(edits, key=lambda edit: edit[0])
+        self.xids = [xid for xid, updated, renamed in edits]
+        self.changes = []
+        stale = False
+        updated = set()
+        renamed = set()
+        for xid, edit_updated, edit_renamed in reversed(edits):
+            if edit_updated is None:
+                stale = True
+            else:
+                updated.update(edit_updated)
+                renamed.update(edit_renamed)
+            self.changes.append(None if stale else (EditedUuids(updated), EditedUuids(renamed)))
+        self.changes.reverse()
+
+    @classmethod
+    def for_request(cls, request):
+        edits = dict.get(request.session, 'edits', None)
+        if not edits:
+            return None
+        session_edits = getattr(request, '_session_edits', None)
+        # Rebuilt if an edit is recorded during the request
+        if session_edits is None or session_edits.xids != [edit[0] for edit in edits]:
+            session_edits = request._session_edits = cls(edits)
+        return session_edits
+
+    def invalidates(self, version, source):
+        '''Whether edits made since version was indexed change the document'''
+        index = bisect_left(self.xids, version)
+        if index == len(self.xids):
+            return False
+        changes = self.changes[index]
+        if changes is None:
+            return True
+        updated, renamed = changes
+        return (
+            _contains_any(source['embedded_uuids'], updated) or
+            _contains_any(source['linked_uuids'], renamed)
+        )
+
+
 class CachedModel(object):
     def __init__(self, hit):
         self.hit = hit
@@ -56,21 +139,10 @@ class CachedModel(object):
         request = get_root_request()
         if request is None:
             return False
-        edits = dict.get(request.session, 'edits', None)
+        edits = SessionEdits.for_request(request)
         if edits is None:
             return False
-        version = self.hit['_version']
-        source = self.source
-        linked_uuids = set(source['linked_uuids'])
-        embedded_uuids = set(source['embedded_uuids'])
-        for xid, updated, linked in edits:
-            if xid < version:
-                continue
-            if not embedded_uuids.isdisjoint(updated):
-                return True
-            if not linked_uuids.isdisjoint(linked):
-                return True
-        return False
+        return edits.invalidates(self.hit['_version'], self.source)
 
     def used_for(self, item):
         alsoProvides(item, ICachedItem)
@@ -87,15 +159,28 @@ class PickStorage(object):
             return self.read
         return self.write
 
-    def get_by_uuid(self, uuid):
+    def get_by_uuid(self, uuid, index=None):
         storage = self.storage()
-        model = storage.get_by_uuid(uuid)
+        model = storage.get_by_uuid(uuid, index=index)
         if storage is self.read:
             if model is None or model.invalidated():
                 force_database_for_request()
-                return self.write.get_by_uuid(uuid)
+                return self.write.get_by_uuid(uuid, index=index)
         return model
 
+    def get_many(self, uuids):
+        storage = self.storage()
+        models = storage.get_many(uuids)
+        if storage is self.read:
+            missing = [
+                uuid for uuid in uuids
+                if models.get(str(uuid)) is None or models[str(uuid)].invalidated()
+            ]
+            if missing:
+                force_database_for_request()
+                models.update(self.write.get_many(missing))
+        return models
+
     def get_by_unique_key(self, unique_key, name, index=None):
         storage = self.storage()
         model = storage.get_by_unique_key(unique_key, name, index=index)
@@ -111,9 +196,16 @@ class PickStorage(object):
             model = storage.get_by_uuid(str(model.uuid))
         return storage.get_rev_links(model, rel, *item_types)
 
+    def get_rev_links_many(self, models, rel, *item_types):
+        return self.storage().get_rev_links_many(models, rel, *item_types)
+
     def __iter__(self, *item_types):
         return self.storage().__iter__(*item_types)
 
+    def iter_uuid_bytes(self, *item_types):
+        '''Always streamed from the database'''
+        return self.write.iter_uuid_bytes(*item_types)
+
     def __len__(self, *item_types):
         return self.storage().__len__(*item_types)
 
@@ -123,13 +215,19 @@ class PickStorage(object):
     def update(self, model, properties=None, sheets=None, unique_keys=None, links=None):
         return self.write.update(model, properties, sheets, unique_keys, links)
 
+    def bulk_create(self, rows):
+        return self.write.bulk_create(rows)
+
 
 class ElasticSearchStorage(object):
     writeable = False
+    batchsize = 1000
 
-    def __init__(self, es, index):
+    def __init__(self, es, index, routing_capacity=ROUTING_CACHE_CAPACITY):
         self.es = es
         self.index = index
+        # Item types never change, so uuid to index entries never go stale
+        self.routing = LRUCache(routing_capacity)
 
     def _one(self, query, index=None):
         if index is None:
@@ -141,20 +239,64 @@ class ElasticSearchStorage(object):
         model = CachedModel(hits[0])
         return model
 
-    def get_by_uuid(self, uuid):
+    def _route(self, hit):
+        self.routing[hit['_id']] = hit['_index']
+        return CachedModel(hit)
+
+    def _search_uuids(self, uuids):
         query = {
             'query': {
-                'term': {
-                    'uuid': str(uuid)
+                'terms': {
+                    'uuid': uuids
                 }
             },
             'version': True
         }
-        result = self.es.search(index=self.index, body=query, _source=True, size=1)
-        if result['hits']['total'] == 0:
+        result = self.es.search(index=self.index, body=query, _source=True, size=len(uuids))
+        return [self._route(hit) for hit in result['hits']['hits']]
+
+    def get_by_uuid(self, uuid, index=None):
+        '''Realtime get from the owning index, else search the resources alias
+
+        The index is the item_type when the caller knows it, or was learnt
+        from an earlier lookup of the uuid.
+        '''
+        uuid = str(uuid)
+        if index is None:
+            index = self.routing.get(uuid)
+        if index is not None:
+            hit = self.es.get(index=index, doc_type=index, id=uuid, _source=True, ignore=404)
+            if hit.get('found'):
+                return self._route(hit)
+        models = self._search_uuids([uuid])
+        if not models:
             return None
-        hit = result['hits']['hits'][0]
-        return CachedModel(hit)
+        return models[0]
+
+    def get_many(self, uuids):
+        '''Returns dict of uuid to model
+
+        The resources alias spans an index per item type, so uuids with a
+        known index are fetched by mget and the rest by a terms search, one
+        request per batch.
+        '''
+        uuids = sorted({str(uuid) for uuid in uuids})
+        models = {}
+        docs = [
+            {'_index': index, '_type': index, '_id': uuid}
+            for uuid, index in ((uuid, self.routing.get(uuid)) for uuid in uuids)
+            if index is not None
+        ]
+        for beg in range(0, len(docs), self.batchsize):
+            result = self.es.mget(body={'docs': docs[beg:beg + self.batchsize]}, _source=True)
+            for hit in result['docs']:
+                if hit.get('found'):
+                    models[hit['_id']] = self._route(hit)
+        missing = [uuid for uuid in uuids if uuid not in models]
+        for beg in range(0, len(missing), self.batchsize):
+            for model in self._search_uuids(missing[beg:beg + self.batchsize]):
+                models[str(model.uuid)] = model
+        return models
 
     def get_by_unique_key(self, unique_key, name, index=None):
         term = 'unique_keys.' + unique_key
@@ -186,6 +328,29 @@ class ElasticSearchStorage(object):
             hit['_id'] for hit in scan(self.es, query=query)
         ]
 
+    def get_rev_links_many(self, models, rel, *item_types):
+        '''Returns dict of target UUID to source UUIDs, as RDBStorage does'''
+        targets = {str(model.uuid) for model in models}
+        if not targets:
+            return {}
+        filter_ = [{'terms': {'links.' + rel: sorted(targets)}}]
+        if item_types:
+            filter_.append({'terms': {'item_type': item_types}})
+        query = {
+            '_source': ['links.' + rel],
+            'query': {
+                'bool': {
+                    'filter': filter_,
+                }
+            }
+        }
+        rev_links = {}
+        for hit in scan(self.es, query=query):
+            for target in hit['_source'].get('links', {}).get(rel, ()):
+                if target in targets:
+                    rev_links.setdefault(UUID(target), []).append(UUID(hit['_id']))
+        return rev_links
+
     def __iter__(self, *item_types):
         query = {
             'stored_fields': [],
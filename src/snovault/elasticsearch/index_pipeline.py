@@ -0,0 +1,95 @@
+'''
+Pipelined es writes for the indexer
+- Rendering stays in the calling thread, it needs the request, snapshot
+transaction and threadlocals.  Rendered documents go onto a bounded queue
+that writer threads drain to elasticsearch, so rendering continues while
+documents are written.
+- put blocks while the queue is full so a slow cluster slows rendering down
+instead of piling documents up in memory.
+'''
+import logging
+import queue
+import threading
+
+from .bulk_writer import BulkIndexWriter
+
+
+log = logging.getLogger('snovault.elasticsearch.es_index_listener')
+
+
+class PipelinedIndexWriter(object):
+    '''
+    Write rendered documents from writer threads
+
+    write_object(uuid, doc, update_info) writes one document and returns
+    last_exc.  With bulk_size each writer thread batches its documents in a
+    BulkIndexWriter instead.  finish returns (update_info, last_exc) pairs.
+    '''
+    def __init__(
+            self,
+            write_object,
+            queue_size,
+            writers=1,
+            encoded_es=None,
+            xmin=None,
+            bulk_size=0,
+        ):
+        # pylint: disable=too-many-arguments
+        self.write_object = write_object
+        self.encoded_es = encoded_es
+        self.xmin = xmin
+        self.bulk_size = bulk_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._results = []
+        self._results_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                name='index-writer-%d' % num,
+                daemon=True,
+            )
+            for num in range(writers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, uuid, doc, update_info):
+        '''Queue a rendered document, blocks while the queue is full'''
+        self._queue.put((uuid, doc, update_info))
+
+    def finish(self):
+        '''Wait for all queued documents to be written'''
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        results = self._results
+        self._results = []
+        return results
+
+    def _add_results(self, results):
+        with self._results_lock:
+            self._results.extend(results)
+
+    def _write(self, bulk_writer, uuid, doc, update_info):
+        if bulk_writer is not None:
+            return bulk_writer.add(uuid, doc, update_info)
+        return [(update_info, self.write_object(uuid, doc, update_info))]
+
+    def _run(self):
+        bulk_writer = None
+        if self.bulk_size:
+            bulk_writer = BulkIndexWriter(self.encoded_es, self.xmin, self.bulk_size)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            uuid, doc, update_info = item
+            try:
+                self._add_results(self._write(bulk_writer, uuid, doc, update_info))
+            except Exception as ecp:  # pylint: disable=broad-except
+                # Keep draining, a dead writer would block put forever
+                log.error('Error writing %s', uuid, exc_info=True)
+                self._add_results([(update_info, repr(ecp))])
+        if bulk_writer is not None:
+            self._add_results(bulk_writer.flush())
@@ -6,6 +6,7 @@ from elasticsearch.exceptions import (
     NotFoundError,
     TransportError,
 )
+from elasticsearch.helpers import scan
 from pyramid.view import view_config
 from pyramid.settings import asbool
 from sqlalchemy.exc import StatementError
@@ -14,9 +15,11 @@ from snovault import (
     DBSESSION,
     STORAGE
 )
-from snovault.storage import (
-    TransactionRecord,
+from snovault.stats import (
+    StageTimings,
+    merge_stage_timings,
 )
+from snovault.util import get_root_request
 from urllib3.exceptions import ReadTimeoutError
 from .interfaces import (
     ELASTIC_SEARCH,
@@ -24,12 +27,18 @@ from .interfaces import (
     RESOURCES_INDEX,
 )
 from .indexer_state import (
+    CHECKPOINT_SIZE,
     IndexerState,
+    all_uuid_array,
     all_uuids,
     all_types,
     SEARCH_MAX
 )
+from .bulk_writer import BulkIndexWriter
+from .index_pipeline import PipelinedIndexWriter
+from .retry_scheduler import RetryScheduler
 from .simple_queue import SimpleUuidServer
+from .searches.caches import bump_index_generation
 
 import datetime
 import logging
@@ -43,7 +52,14 @@ es_logger = logging.getLogger("elasticsearch")
 es_logger.setLevel(logging.ERROR)
 log = logging.getLogger('snovault.elasticsearch.es_index_listener')
 MAX_CLAUSES_FOR_ES = 8192
+RELATED_UUIDS_BATCH = MAX_CLAUSES_FOR_ES  # terms per related uuids query
+RELATED_UUIDS_PAGE = 10000  # hits per scroll page
 DEFAULT_QUEUE = 'Simple'
+# indexer.embed_dependencies setting
+# record: write the postgres reverse dependency table per indexed chunk
+# lookup: also use it instead of elasticsearch to find invalidated documents,
+#   once a cycle indexing all uuids has recorded every document
+EMBED_DEPENDENCIES_MODES = ('record', 'lookup')
 
 
 def _update_for_uuid_queues(registry):
@@ -76,72 +92,62 @@ def includeme(config):
         if not processes:
             registry[INDEXER] = Indexer(registry)
 
-def get_related_uuids(request, es, updated, renamed):
-    '''Returns (set of uuids, False) or (list of all uuids, True) if full reindex triggered'''
+def _scan_related_ids(es, field, uuids):
+    '''Yield _ids of documents with any of uuids in field, one terms query per batch'''
+    for beg in range(0, len(uuids), RELATED_UUIDS_BATCH):
+        query = {
+            'query': {
+                'terms': {
+                    field: uuids[beg:beg + RELATED_UUIDS_BATCH],
+                    '_cache': False,
+                },
+            },
+            '_source': False,
+        }
+        # Scroll in _doc order rather than sizing one search at SEARCH_MAX
+        for hit in scan(
+                es,
+                query=query,
+                index=RESOURCES_INDEX,
+                size=RELATED_UUIDS_PAGE,
+                request_timeout=60,
+            ):
+            yield hit['_id']
 
-    updated_count = len(updated)
-    renamed_count = len(renamed)
-    if (updated_count + renamed_count) > MAX_CLAUSES_FOR_ES:
-        return (list(all_uuids(request.registry)), True)  # guaranteed unique
-    elif (updated_count + renamed_count) == 0:
-        return (set(), False)
 
-    es.indices.refresh(RESOURCES_INDEX)
+def get_related_uuids(request, es, updated, renamed):
+    '''
+    Returns set of uuids of documents embedding updated or linking renamed
 
-    # TODO: batching may allow us to drive a partial reindexing much greater than 99999
-    #BATCH_COUNT = 100  # NOTE: 100 random uuids returned > 99999 results!
-    #beg = 0
-    #end = BATCH_COUNT
-    #related_set = set()
-    #updated_list = list(updated)  # Must be lists
-    #renamed_list = list(renamed)
-    #while updated_count > beg or renamed_count > beg:
-    #    if updated_count > end or beg > 0:
-    #        log.error('Indexer looking for related uuids by BATCH[%d,%d]' % (beg, end))
-    #
-    #    updated = []
-    #    if updated_count > beg:
-    #        updated = updated_list[beg:end]
-    #    renamed = []
-    #    if renamed_count > beg:
-    #        renamed = renamed_list[beg:end]
-    #
-    #     search ...
-    #     accumulate...
-    #
-    #    beg += BATCH_COUNT
-    #    end += BATCH_COUNT
-
-    query = {
-        'query': {
-            'bool': {
-                'should': [
-                    {
-                        'terms': {
-                            'embedded_uuids': updated,
-                            '_cache': False,
-                        },
-                    },
-                    {
-                        'terms': {
-                            'linked_uuids': renamed,
-                            '_cache': False,
-                        },
-                    },
-                ],
-            },
-        },
-        '_source': False,
-    }
-    res = es.search(index=RESOURCES_INDEX, size=SEARCH_MAX, request_timeout=60, body=query)
+    The terms queries are batched and paged with scroll so large transactions
+    cause a targeted reindex instead of a full one.
+    '''
+    if (len(updated) + len(renamed)) == 0:
+        return set()
 
-    if res['hits']['total'] > SEARCH_MAX:
-        return (list(all_uuids(request.registry)), True)  # guaranteed unique
+    es.indices.refresh(RESOURCES_INDEX)
 
-    related_set = {hit['_id'] for hit in res['hits']['hits']}
+    related_set = set()
+    batches = 0
+    for field, uuids in (('embedded_uuids', updated), ('linked_uuids', renamed)):
+        uuids = list(uuids)  # Must be lists
+        batches += (len(uuids) + RELATED_UUIDS_BATCH - 1) // RELATED_UUIDS_BATCH
+        related_set.update(_scan_related_ids(es, field, uuids))
+    if batches > 2:
+        log.warning(
+            'Indexer found %d related uuids in %d batches',
+            len(related_set),
+            batches,
+        )
+    return related_set
 
-    return (related_set, False)
 
+def get_dependent_uuids(request, updated, renamed):
+    '''Returns set of uuids from the postgres embed dependency table'''
+    if (len(updated) + len(renamed)) == 0:
+        return set()
+    storage = request.registry[STORAGE].write
+    return set(storage.get_embed_dependents(updated, renamed))
 
 
 @view_config(route_name='index', request_method='POST', permission="index")
@@ -168,17 +174,23 @@ def index(request):
     stage_for_followup = list(request.registry.settings.get("stage_for_followup", '').replace(' ','').split(','))
 
     # May have undone uuids from prior cycle
-    state = IndexerState(es, INDEX, followups=stage_for_followup)
+    state = IndexerState(
+        es,
+        INDEX,
+        followups=stage_for_followup,
+        checkpoint_size=int(request.registry.settings.get('indexer.checkpoint_size', CHECKPOINT_SIZE)),
+    )
 
     (xmin, invalidated, restart) = state.priority_cycle(request)
     state.log_reindex_init_state()
-    # OPTIONAL: restart support
-    if restart:  # Currently not bothering with restart!!!
-        xmin = -1
-        invalidated = []
-    # OPTIONAL: restart support
 
     result = state.get_initial_state()  # get after checking priority!
+    if restart:
+        # Resume the remainder of an interrupted cycle under its original xmin
+        result.update(
+            xmin=xmin,
+            resumed=len(invalidated),
+        )
 
     if xmin == -1 or len(invalidated) == 0:
         xmin = get_current_xmin(request)
@@ -201,34 +213,30 @@ def index(request):
             last_xmin=last_xmin,
         )
 
-    if len(invalidated) > SEARCH_MAX:  # Priority cycle already set up
+    backfill = False
+    if restart or len(invalidated) > SEARCH_MAX:  # Priority cycle already set up
         flush = True
     else:
 
         flush = False
         if last_xmin is None:
             result['types'] = types = request.json.get('types', None)
-            invalidated = list(all_uuids(request.registry, types))
+            invalidated = all_uuid_array(request.registry, types)
+            backfill = types is None
             flush = True
         else:
-            txns = session.query(TransactionRecord).filter(
-                TransactionRecord.xid >= last_xmin,
-            )
+            storage = request.registry[STORAGE].write
+            txn_count, max_xid, first_txn = storage.get_transaction_summary(last_xmin)
 
             invalidated = set(invalidated)  # not empty if API index request occurred
             updated = set()
             renamed = set()
-            max_xid = 0
-            txn_count = 0
-            for txn in txns.all():
-                txn_count += 1
-                max_xid = max(max_xid, txn.xid)
-                if first_txn is None:
-                    first_txn = txn.timestamp
-                else:
-                    first_txn = min(first_txn, txn.timestamp)
-                renamed.update(txn.data.get('renamed', ()))
-                updated.update(txn.data.get('updated', ()))
+            # Distinct uuids are aggregated in SQL and streamed
+            for uuid, is_updated, is_renamed in storage.iter_transaction_uuids(last_xmin):
+                if is_updated:
+                    updated.add(uuid)
+                if is_renamed:
+                    renamed.add(uuid)
 
             if invalidated:        # reindex requested, treat like updated
                 updated |= invalidated
@@ -239,25 +247,25 @@ def index(request):
                 return result
 
             if is_testing and is_testing_full:
-                full_reindex = False
                 related_set = set(all_uuids(request.registry))
+            elif (
+                    request.registry.settings.get('indexer.embed_dependencies') == 'lookup'
+                    and state.is_embed_dependencies_backfilled()
+                ):
+                related_set = get_dependent_uuids(request, updated, renamed)
             else:
-                (related_set, full_reindex) = get_related_uuids(request, es, updated, renamed)
-            if full_reindex:
-                invalidated = related_set
-                flush = True
-            else:
-                invalidated = related_set | updated
-                result.update(
-                    max_xid=max_xid,
-                    renamed=renamed,
-                    updated=updated,
-                    referencing=len(related_set),
-                    invalidated=len(invalidated),
-                    txn_count=txn_count
-                )
-                if first_txn is not None:
-                    result['first_txn_timestamp'] = first_txn.isoformat()
+                related_set = get_related_uuids(request, es, updated, renamed)
+            invalidated = related_set | updated
+            result.update(
+                max_xid=max_xid,
+                renamed=renamed,
+                updated=updated,
+                referencing=len(related_set),
+                invalidated=len(invalidated),
+                txn_count=txn_count
+            )
+            if first_txn is not None:
+                result['first_txn_timestamp'] = first_txn.isoformat()
 
             if invalidated and not dry_run:
                 # Exporting a snapshot mints a new xid, so only do so when required.
@@ -273,6 +281,11 @@ def index(request):
             state.prep_for_followup(xmin, invalidated)
 
         result = state.start_cycle(invalidated, result)
+        if not indexer.embed_dependencies:
+            # Unrecorded documents leave the table stale until a full cycle
+            state.reset_embed_dependencies_backfill()
+        elif backfill:
+            state.start_embed_dependencies_backfill(xmin)
 
         # Do the work...
 
@@ -282,10 +295,14 @@ def index(request):
             xmin,
             snapshot_id=snapshot_id,
             restart=restart,
+            checkpoint=state.checkpoint,
         )
         if err_msg:
             log.warning('Could not start indexing: %s', err_msg)
         result = state.finish_cycle(result,errors)
+        if indexer.embed_dependencies and not errors:
+            # Failed renders recorded no rows, the backfill stays pending
+            state.finish_embed_dependencies_backfill(xmin)
 
         if errors:
             result['errors'] = errors
@@ -305,6 +322,11 @@ def index(request):
 
 
         es.indices.refresh(RESOURCES_INDEX)
+        try:
+            bump_index_generation(es, INDEX)
+        except Exception:
+            # Search caches keep the last generation until the next cycle
+            log.warning('Could not bump index generation', exc_info=True)
         if flush:
             try:
                 es.indices.flush_synced(index=RESOURCES_INDEX)  # Faster recovery on ES restart
@@ -356,6 +378,22 @@ class Indexer(object):
         self.chunk_size = None
         self.batch_size = None
         self.worker_runs = []
+        # Documents per es bulk request, 0 writes one document per index call
+        self.bulk_size = int(registry.settings.get('indexer_bulk_size', 0))
+        # Queued documents per worker for es writer threads, 0 writes inline
+        self.pipeline_size = int(registry.settings.get('indexer_pipeline_size', 0))
+        self.pipeline_writers = int(registry.settings.get('indexer_pipeline_writers', 1))
+        # Retry failed writes from a delay queue instead of sleeping in the worker
+        self.retry_scheduler = asbool(registry.settings.get('indexer_retry_scheduler', False))
+        if self.pipeline_size and self.retry_scheduler:
+            log.warning(
+                'indexer_retry_scheduler is not used with indexer_pipeline_size, '
+                'pipeline writer threads retry with backoffs'
+            )
+        # Record each chunk's reverse embed dependencies in postgres
+        self.embed_dependencies = (
+            registry.settings.get('indexer.embed_dependencies') in EMBED_DEPENDENCIES_MODES
+        )
         if registry.settings.get('indexer'):
             self._setup_queues(registry)
 
@@ -368,8 +406,30 @@ class Indexer(object):
                     str_update_info = json.dumps(update_info, ensure_ascii=False)
                     file_handler.write(str_update_info + '\n')
                     counter += 1
+                for item_type, type_info in sorted(self.aggregate_stage_timings(update_infos).items()):
+                    type_info['item_type'] = item_type
+                    file_handler.write(json.dumps(type_info, ensure_ascii=False) + '\n')
             log.warning('Logged %d uuids.  One per line' % counter)
 
+    @staticmethod
+    def aggregate_stage_timings(update_infos):
+        '''Sum the stage_timings of update_infos per item type'''
+        item_types = {}
+        for update_info in update_infos:
+            stages = update_info.get('stage_timings')
+            if not stages:
+                continue
+            item_type = update_info['es_info'].get('item_type')
+            type_info = item_types.get(item_type)
+            if type_info is None:
+                type_info = item_types[item_type] = {
+                    'uuids': 0,
+                    'stage_timings': {},
+                }
+            type_info['uuids'] += 1
+            merge_stage_timings(type_info['stage_timings'], stages)
+        return item_types
+
     def _setup_queues(self, registry):
         '''Init helper - Setup server and worker queues'''
         self.index = registry.settings['snovault.elasticsearch.index']
@@ -510,8 +570,14 @@ class Indexer(object):
             snapshot_id=None,
             restart=False,
             timeout=None,
+            checkpoint=None,
         ):
-        '''Run indexing process with queue server and optional worker'''
+        '''
+        Run indexing process with queue server and optional worker
+
+        checkpoint is called with the uuids each local worker run indexed
+        without errors.
+        '''
         # pylint: disable=too-many-arguments
         errors = []
         err_msg = self._serve_objects_init(uuids)
@@ -546,6 +612,11 @@ class Indexer(object):
                 )
                 if not uuids_ran:
                     break
+                if checkpoint is not None:
+                    checkpoint([
+                        update_info['uuid'] for update_info in update_infos
+                        if update_info.get('error') is None
+                    ])
                 self.worker_runs.append({
                     'worker_id':self.queue_worker.worker_id,
                     'uuids': uuids_ran,
@@ -558,6 +629,7 @@ class Indexer(object):
                 err_msg = 'Indexer sleep timeout'
                 break
         self.queue_server.close_indexing()
+        self.end_cycle()
         return update_infos, errors, err_msg
 
     def run_worker(self, request, xmin, snapshot_id, restart):
@@ -604,8 +676,10 @@ class Indexer(object):
         '''Run indexing process on uuids'''
         errors = []
         update_infos = []
-        for i, uuid in enumerate(uuids):
-            update_info = self.update_object(self.es, request, uuid, xmin)
+        rendered = self.chunk_update_objects(
+            self.es, request, uuids, xmin, self.write_options
+        )
+        for i, update_info in enumerate(rendered):
             update_info['return_time'] = time.time()
             update_infos.append(update_info)
             error = update_info.get('error')
@@ -616,8 +690,195 @@ class Indexer(object):
                 log.info('Indexing %d', i + 1)
         return update_infos, errors
 
+    @property
+    def write_options(self):
+        '''How update_objects writes to es, see chunk_update_objects'''
+        return {
+            'bulk_size': self.bulk_size,
+            'pipeline_size': self.pipeline_size,
+            'pipeline_writers': self.pipeline_writers,
+            'retry_scheduler': self.retry_scheduler,
+            'embed_dependencies': self.embed_dependencies,
+        }
+
+    @staticmethod
+    def chunk_update_objects(encoded_es, request, uuids, xmin, write_options):
+        '''
+        Render and write uuids with the write_options of an indexer
+
+        pipeline_size takes precedence, its writer threads write in bulk with
+        bulk_size and retry with blocking backoffs off the rendering thread.
+        Otherwise bulk_size writes in bulk, retrying from a RetryScheduler
+        with retry_scheduler.  retry_scheduler alone schedules the retries
+        of single document writes.
+
+        With embed_dependencies the rendered documents' dependencies are
+        recorded in one postgres transaction once the chunk is written.
+        '''
+        dependencies = None
+        if write_options.get('embed_dependencies'):
+            dependencies = []
+        if write_options['pipeline_size']:
+            update_infos = Indexer.pipeline_update_objects(
+                encoded_es, request, uuids, xmin, write_options['pipeline_size'],
+                pipeline_writers=write_options['pipeline_writers'],
+                bulk_size=write_options['bulk_size'],
+                dependencies=dependencies,
+            )
+        elif write_options['bulk_size']:
+            update_infos = Indexer.bulk_update_objects(
+                encoded_es, request, uuids, xmin, write_options['bulk_size'],
+                retry_scheduler=write_options['retry_scheduler'],
+                dependencies=dependencies,
+            )
+        elif write_options['retry_scheduler']:
+            update_infos = Indexer.scheduled_update_objects(
+                encoded_es, request, uuids, xmin, dependencies=dependencies,
+            )
+        else:
+            update_infos = (
+                Indexer.update_object(
+                    encoded_es, request, uuid, xmin, dependencies=dependencies,
+                )
+                for uuid in uuids
+            )
+        yield from update_infos
+        if dependencies:
+            request.registry[STORAGE].write.update_embed_dependencies(dependencies)
+
+    @staticmethod
+    def scheduled_update_objects(encoded_es, request, uuids, xmin, dependencies=None):
+        # pylint: disable=too-many-arguments
+        '''Render and write uuids, failed writes are retried in the background'''
+        update_infos = []
+
+        def try_write(uuid, doc, update_info, retry):
+            return Indexer.try_write_object(
+                encoded_es, uuid, doc, xmin, update_info, retry
+            )
+
+        scheduler = RetryScheduler(try_write)
+        try:
+            for uuid in uuids:
+                update_info, doc, last_exc = Indexer.render_object(
+                    request, uuid, xmin, dependencies=dependencies,
+                )
+                if last_exc is None:
+                    retry, last_exc = try_write(uuid, doc, update_info, 0)
+                    if retry:
+                        scheduler.schedule(uuid, doc, update_info, last_exc)
+                        continue
+                    Indexer.end_write_object(update_info)
+                update_infos.append(
+                    Indexer.finish_update_info(update_info, last_exc)
+                )
+        finally:
+            retried = scheduler.finish()
+        for update_info, last_exc in retried:
+            Indexer.end_write_object(update_info)
+            update_infos.append(Indexer.finish_update_info(update_info, last_exc))
+        return update_infos
+
+    @staticmethod
+    def bulk_update_objects(
+            encoded_es,
+            request,
+            uuids,
+            xmin,
+            bulk_size,
+            retry_scheduler=False,
+            dependencies=None,
+        ):
+        # pylint: disable=too-many-arguments
+        '''
+        Render uuids one at a time and write them with the es bulk api
+
+        With retry_scheduler, documents failing with retryable errors are
+        retried one at a time from a RetryScheduler instead of sleeping
+        between bulk requests.
+        '''
+        update_infos = []
+
+        def try_write(uuid, doc, update_info, retry):
+            return Indexer.try_write_object(
+                encoded_es, uuid, doc, xmin, update_info, retry
+            )
+
+        scheduler = RetryScheduler(try_write) if retry_scheduler else None
+        writer = BulkIndexWriter(encoded_es, xmin, bulk_size, retry_scheduler=scheduler)
+        flushed = []
+        retried = []
+        try:
+            for uuid in uuids:
+                update_info, doc, last_exc = Indexer.render_object(
+                    request, uuid, xmin, dependencies=dependencies,
+                )
+                if last_exc is None:
+                    flushed.extend(writer.add(uuid, doc, update_info))
+                else:
+                    update_infos.append(
+                        Indexer.finish_update_info(update_info, last_exc)
+                    )
+            flushed.extend(writer.flush())
+        finally:
+            if scheduler is not None:
+                retried = scheduler.finish()
+        for update_info, last_exc in retried:
+            Indexer.end_write_object(update_info)
+            flushed.append((update_info, last_exc))
+        for update_info, last_exc in flushed:
+            update_infos.append(Indexer.finish_update_info(update_info, last_exc))
+        return update_infos
+
     @staticmethod
-    def update_object(encoded_es, request, uuid, xmin, restart=False):
+    def pipeline_update_objects(
+            encoded_es,
+            request,
+            uuids,
+            xmin,
+            pipeline_size,
+            pipeline_writers=1,
+            bulk_size=0,
+            dependencies=None,
+        ):
+        # pylint: disable=too-many-arguments
+        '''Render uuids while writer threads write the rendered documents'''
+        update_infos = []
+        writer = PipelinedIndexWriter(
+            lambda uuid, doc, update_info: Indexer.write_object(
+                encoded_es, uuid, doc, xmin, update_info
+            ),
+            pipeline_size,
+            writers=pipeline_writers,
+            encoded_es=encoded_es,
+            xmin=xmin,
+            bulk_size=bulk_size,
+        )
+        try:
+            for uuid in uuids:
+                update_info, doc, last_exc = Indexer.render_object(
+                    request, uuid, xmin, dependencies=dependencies,
+                )
+                if last_exc is None:
+                    writer.put(uuid, doc, update_info)
+                else:
+                    update_infos.append(
+                        Indexer.finish_update_info(update_info, last_exc)
+                    )
+        finally:
+            written = writer.finish()
+        for update_info, last_exc in written:
+            update_infos.append(Indexer.finish_update_info(update_info, last_exc))
+        return update_infos
+
+    @staticmethod
+    def render_object(request, uuid, xmin, dependencies=None):
+        '''
+        Render @@index-data, returns (update_info, doc, last_exc)
+
+        A rendered document's (uuid, embedded_uuids, linked_uuids) is
+        appended to dependencies when given.
+        '''
         update_info = {
             'uuid': uuid,
             'xmin': xmin,
@@ -641,13 +902,26 @@ class Indexer(object):
             'backoffs': {},
             'item_type': None,
         }
+        update_info['req_info'] = req_info
+        update_info['es_info'] = es_info
         request.datastore = 'database'
+        doc = None
         last_exc = None
         req_info['start_time'] = time.time()
         backoff = 0
+        root_request = get_root_request() or request
+        timings = None
+        settings = getattr(getattr(request, 'registry', None), 'settings', None) or {}
+        if asbool(settings.get('indexer.stage_timings', False)):
+            timings = StageTimings(getattr(root_request, '_stats', {}))
+            root_request._stage_timings = timings
         try:
             req_info['url'] ='/%s/@@index-data/' % uuid
             doc = request.embed(req_info['url'], as_user='INDEXER')
+            if dependencies is not None:
+                dependencies.append(
+                    (doc['uuid'], doc['embedded_uuids'], doc['linked_uuids'])
+                )
         except StatementError:
             # Can't reconnect until invalid transaction is rolled back
             raise
@@ -662,77 +936,124 @@ class Indexer(object):
                     'last_exc': last_exc,
                 }
             )
+        finally:
+            if timings is not None:
+                root_request._stage_timings = None
+                update_info['stage_timings'] = timings.as_dict()
         req_info['end_time'] = time.time()
         req_info['run_time'] = req_info['end_time'] - req_info['start_time']
-        if last_exc is None:
-            es_info['start_time'] = time.time()
-            es_info['item_type'] = doc['item_type']
-            do_break = False
-            for backoff in [0, 10, 20, 40, 80]:
-                time.sleep(backoff)
-                backoff_info = {
-                    'start_time': time.time(),
-                    'end_time': None,
-                    'run_time': None,
-                    'error': None,
-                }
-                try:
-                    encoded_es.index(
-                        index=doc['item_type'], doc_type=doc['item_type'], body=doc,
-                        id=str(uuid), version=xmin, version_type='external_gte',
-                        request_timeout=30,
-                    )
-                except StatementError:
-                    # Can't reconnect until invalid transaction is rolled back
-                    raise
-                except ConflictError:
-                    msg = 'Conflict indexing %s at version %d' % (uuid, xmin)
-                    log.warning(msg)
-                    backoff_info['error'] = {
-                        'msg': msg,
-                        'last_exc': None,
-                    }
-                    do_break = True
-                except (ConnectionError, ReadTimeoutError, TransportError) as e:
-                    msg = 'Retryable error indexing %s: %r' % (uuid, e)
-                    log.warning(msg)
-                    last_exc = repr(e)
-                    backoff_info['error'] = {
-                        'msg': msg,
-                        'last_exc': last_exc,
-                    }
-                except Exception as e:
-                    msg = 'Error indexing %s' % (uuid)
-                    log.error(msg, exc_info=True)
-                    last_exc = repr(e)
-                    backoff_info['error'] = {
-                        'msg': msg,
-                        'last_exc': None,
-                    }
-                    do_break = True
-                else:
-                    # Get here on success and outside of try
-                    do_break = True
-                end_time = time.time()
-                backoff_info['end_time'] = end_time
-                backoff_info['run_time'] = end_time - backoff_info['start_time']
-                es_info['backoffs'][str(backoff)] = backoff_info
-                if do_break:
-                    break
-            es_info['end_time'] = time.time()
-            es_info['run_time'] = es_info['end_time'] - es_info['start_time']
-        update_info['req_info'] = req_info
-        update_info['es_info'] = es_info
+        return update_info, doc, last_exc
+
+    @staticmethod
+    def finish_update_info(update_info, last_exc):
+        '''Set error and end times on a rendered and written update_info'''
         if last_exc:
             update_info['error'] = {
                 'error_message': last_exc,
                 'timestamp': datetime.datetime.now().isoformat(),
-                'uuid': str(uuid)
+                'uuid': str(update_info['uuid'])
             }
         end_time = time.time()
         update_info['end_time'] = end_time
         update_info['run_time'] = end_time - update_info['start_time']
         return update_info
 
+    @staticmethod
+    def try_write_object(encoded_es, uuid, doc, xmin, update_info, retry=0, backoff=None):
+        # pylint: disable=too-many-arguments
+        '''
+        Make one write attempt of a rendered document
+
+        Returns (retry, last_exc), retry is True for retryable errors.  The
+        attempt is recorded in es_info['backoffs'] under its backoff, or
+        under its retry count for scheduled retries.
+        '''
+        es_info = update_info['es_info']
+        if es_info['start_time'] is None:
+            es_info['start_time'] = time.time()
+            es_info['item_type'] = doc['item_type']
+        retry_again = False
+        last_exc = None
+        backoff_info = {
+            'start_time': time.time(),
+            'end_time': None,
+            'run_time': None,
+            'error': None,
+            'retry': retry,
+        }
+        try:
+            encoded_es.index(
+                index=doc['item_type'], doc_type=doc['item_type'], body=doc,
+                id=str(uuid), version=xmin, version_type='external_gte',
+                request_timeout=30,
+            )
+        except StatementError:
+            # Can't reconnect until invalid transaction is rolled back
+            raise
+        except ConflictError:
+            msg = 'Conflict indexing %s at version %d' % (uuid, xmin)
+            log.warning(msg)
+            backoff_info['error'] = {
+                'msg': msg,
+                'last_exc': None,
+            }
+        except (ConnectionError, ReadTimeoutError, TransportError) as e:
+            msg = 'Retryable error indexing %s: %r' % (uuid, e)
+            log.warning(msg)
+            last_exc = repr(e)
+            backoff_info['error'] = {
+                'msg': msg,
+                'last_exc': last_exc,
+            }
+            retry_again = True
+        except Exception as e:
+            msg = 'Error indexing %s' % (uuid)
+            log.error(msg, exc_info=True)
+            last_exc = repr(e)
+            backoff_info['error'] = {
+                'msg': msg,
+                'last_exc': None,
+            }
+        end_time = time.time()
+        backoff_info['end_time'] = end_time
+        backoff_info['run_time'] = end_time - backoff_info['start_time']
+        es_info['backoffs'][str(retry if backoff is None else backoff)] = backoff_info
+        return retry_again, last_exc
+
+    @staticmethod
+    def end_write_object(update_info):
+        '''Set es_info end times once a document is written or given up on'''
+        es_info = update_info['es_info']
+        es_info['end_time'] = time.time()
+        es_info['run_time'] = es_info['end_time'] - es_info['start_time']
+
+    @staticmethod
+    def write_object(encoded_es, uuid, doc, xmin, update_info):
+        '''Write a rendered document with backoffs, returns last_exc'''
+        last_exc = None
+        for retry, backoff in enumerate([0, 10, 20, 40, 80]):
+            time.sleep(backoff)
+            retry_again, last_exc = Indexer.try_write_object(
+                encoded_es, uuid, doc, xmin, update_info, retry=retry, backoff=backoff,
+            )
+            if not retry_again:
+                break
+        Indexer.end_write_object(update_info)
+        return last_exc
+
+    @staticmethod
+    def update_object(encoded_es, request, uuid, xmin, restart=False, dependencies=None):
+        # pylint: disable=too-many-arguments, unused-argument
+        update_info, doc, last_exc = Indexer.render_object(
+            request, uuid, xmin, dependencies=dependencies,
+        )
+        if last_exc is None:
+            last_exc = Indexer.write_object(encoded_es, uuid, doc, xmin, update_info)
+        return Indexer.finish_update_info(update_info, last_exc)
+
+    def end_cycle(self):
+        '''Called when serve_objects has finished an indexing cycle'''
+        pass
+
     def shutdown(self):
         pass
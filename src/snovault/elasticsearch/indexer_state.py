@@ -8,18 +8,21 @@ from pyramid.view import view_config
 from sqlalchemy.exc import StatementError
 from snovault import (
     COLLECTIONS,
+    CONNECTION,
     DBSESSION,
     STORAGE
 )
 from snovault.storage import (
     TransactionRecord,
 )
+from snovault.util import UuidArray
 from urllib3.exceptions import ReadTimeoutError
 from .interfaces import (
     ELASTIC_SEARCH,
     INDEXER
 )
 import datetime
+import itertools
 import logging
 import pytz
 import time
@@ -29,6 +32,8 @@ import requests
 import re
 
 SEARCH_MAX = 99999  # OutOfMemoryError if too high
+CHECKPOINT_SIZE = 10000  # finished uuids per progress checkpoint
+LIST_CHUNK_SIZE = 10000  # uuids per object of lists stored in chunks
 
 es_logger = logging.getLogger("elasticsearch")
 es_logger.setLevel(logging.ERROR)
@@ -41,15 +46,16 @@ def includeme(config):
 class IndexerState(object):
     _is_reindex_base = '_is_reindex'
     # Keeps track of uuids and indexer state by cycle.  Also handles handoff of uuids to followup indexer
-    def __init__(self, es, index, title='primary', followups=[]):
+    def __init__(self, es, index, title='primary', followups=[], checkpoint_size=CHECKPOINT_SIZE,
+                 list_chunk_size=LIST_CHUNK_SIZE):
         self.es = es
         self.index = index  # "index where indexerstate is stored"
 
         self.title           = title
         self.state_id        = self.title + '_indexer'       # State of the current or last cycle
-        self.todo_set        = self.title + '_in_progress'   # one cycle of uuids, sent to the Secondary Indexer
+        self.todo_set        = self.title + '_in_progress'   # one cycle of uuids in chunks, sent to the Secondary Indexer
         #self.failed_set      = self.title + '_failed'
-        #self.done_set        = self.title + '_done'          # Trying to get all uuids from 'todo' to this set
+        self.done_set        = self.title + '_done'          # Checkpoints of finished uuids, chunks in done_set + '_<n>'
         self.troubled_set    = self.title + '_troubled'      # uuids that failed to index in any cycle
         self.last_set        = self.title + '_last_cycle'    # uuids in the most recent finished cycle
         self.success_set     = None                          # None is the same as self.done_set
@@ -66,13 +72,18 @@ class IndexerState(object):
                 list_id = 'staged_for_' + name
                 assert list_id == self.staged_for_vis_list or list_id == self.staged_for_regions_list
                 self.followup_lists.append(list_id)
+        self.checkpoint_size = checkpoint_size  # 0 disables checkpoints
+        self.list_chunk_size = list_chunk_size  # todo, last cycle and followup lists
+        self._checkpoint_buffer = []
+        self._checkpoint_chunks = 0
         self.clock = {}
         self._is_reindex_key = self.title + self._is_reindex_base
+        self.embed_dependencies_key = 'embed_dependencies'  # Backfill of the postgres table
         self.is_reindexing = False
         # Initial indexing will also be true if the indexing has been reset
         self.is_initial_indexing = False
         # some goals:
-        # 1) Detect and recover from interrupted cycle - working but ignored for now
+        # 1) Detect and recover from interrupted cycle - resumes from checkpoints
         # 2) Record (double?) failures and consider blacklisting them - not tried, could do.
 
     def _del_is_reindex(self):
@@ -87,6 +98,24 @@ class IndexerState(object):
         # Flag should be set in request_reindex funciton
         self.put_obj(self._is_reindex_key, {'is_reindex': True})
 
+    def start_embed_dependencies_backfill(self, xmin):
+        '''A cycle indexing all uuids at xmin records every embed dependency'''
+        self.put_obj(self.embed_dependencies_key, {'xmin': xmin, 'backfilled': False})
+
+    def finish_embed_dependencies_backfill(self, xmin):
+        '''Marks the backfill done when its cycle, maybe resumed, finishes'''
+        obj = self.get_obj(self.embed_dependencies_key)
+        if obj.get('xmin') == xmin and obj.get('backfilled') is False:
+            obj['backfilled'] = True
+            self.put_obj(self.embed_dependencies_key, obj)
+
+    def reset_embed_dependencies_backfill(self):
+        if self.get_obj(self.embed_dependencies_key):
+            self.delete_objs([self.embed_dependencies_key])
+
+    def is_embed_dependencies_backfilled(self):
+        return self.get_obj(self.embed_dependencies_key).get('backfilled') is True
+
     def log_reindex_init_state(self):
         # Must call after priority cycle
         if self.is_reindexing and self.is_initial_indexing:
@@ -117,7 +146,16 @@ class IndexerState(object):
                 pass
 
     def get_list(self, id):
-        return self.get_obj(id).get('list',[])
+        return list(self.iter_list(id))
+
+    def iter_list(self, id):
+        '''Yields a list stored whole or in chunks, one chunk in memory at a time'''
+        obj = self.get_obj(id)
+        if 'chunks' not in obj:
+            yield from obj.get('list', [])
+            return
+        for chunk in range(obj['chunks']):
+            yield from self.get_obj(self._chunk_id(id, chunk)).get('list', [])
 
     def get_count(self, id):
         return self.get_obj(id).get('count',0)
@@ -143,20 +181,54 @@ class IndexerState(object):
             set_to_update = set(vals)
         self.put_list(id, set_to_update)
 
-    def list_extend(self, id, vals):
-        list_to_extend = self.get_list(id)
-        if len(list_to_extend) > 0:
-            list_to_extend.extend(vals)  # TODO: consider capping at SEARCH_MAX (keeping count but not uuids).  Requires followup handoff work.
-        else:
-            list_to_extend = vals
+    def _chunk_id(self, id, chunk):
+        return '%s_%d' % (id, chunk)
 
-        self.put_list(id, list_to_extend)
+    def list_extend(self, id, vals):
+        '''Appends vals as new chunks of list_chunk_size, earlier chunks are not rewritten'''
+        obj = self.get_obj(id)
+        chunks = obj.get('chunks', 0)
+        count = obj.get('count', 0)
+        if 'list' in obj:  # Stored whole, becomes the first chunk
+            self.put_list(self._chunk_id(id, 0), obj['list'])
+            chunks = 1
+        vals = iter(vals)
+        while True:
+            # Explicit str uuids, not the serializer's view of a UuidArray
+            chunk = [str(val) for val in itertools.islice(vals, self.list_chunk_size)]
+            if not chunk:
+                break
+            self.put_list(self._chunk_id(id, chunks), chunk)
+            chunks += 1
+            count += len(chunk)
+        self.put_obj(id, {'chunks': chunks, 'count': count})
+
+    def delete_lists(self, ids):
+        '''Deletes objects, along with their chunks for lists stored in chunks'''
+        for id in ids:
+            chunks = self.get_obj(id).get('chunks', 0)
+            self.delete_objs([self._chunk_id(id, chunk) for chunk in range(chunks)] + [id])
 
     def rename_objs(self, from_id, to_id):
-        val = self.get_list(from_id)
-        if val:
-            self.put_list(to_id, val)
-            self.delete_objs([from_id])
+        obj = self.get_obj(from_id)
+        if 'chunks' not in obj:
+            if obj.get('list'):
+                self.put_list(to_id, obj['list'])
+                self.delete_objs([from_id])
+            return
+        for chunk in range(obj['chunks']):
+            self.put_list(self._chunk_id(to_id, chunk), self.get_list(self._chunk_id(from_id, chunk)))
+        self.put_obj(to_id, obj)
+        self.delete_lists([from_id])
+
+    def _checkpoint_id(self, chunk):
+        return self._chunk_id(self.done_set, chunk)
+
+    def _delete_checkpoints(self):
+        chunks = self.get_obj(self.done_set).get('chunks', 0)
+        self.delete_objs([self._checkpoint_id(chunk) for chunk in range(chunks)] + [self.done_set])
+        self._checkpoint_buffer = []
+        self._checkpoint_chunks = 0
 
     # Public access...
     def get(self):
@@ -203,22 +275,22 @@ class IndexerState(object):
         return None
 
     def all_indexable_uuids(self, request):
-        '''returns list of uuids pertinant to this indexer.'''
-        return list(all_uuids(request.registry))
+        '''returns UuidArray of uuids pertinant to this indexer.'''
+        return all_uuid_array(request.registry)
 
     def reindex_requested(self, request):
         '''returns list of uuids if a reindex was requested.'''
         override = self.get_obj(self.override)
         if override:
             if override.get('all_uuids', False):
-                self.delete_objs([self.override] + self.followup_lists)
+                self.delete_lists([self.override] + self.followup_lists)
                 return self.all_indexable_uuids(request)
             else:
                 uuids =  override.get('uuids',[])
                 uuid_count = len(uuids)
                 if uuid_count > 0:
                     if uuid_count > SEARCH_MAX:
-                        self.delete_objs([self.override] + self.followup_lists)
+                        self.delete_lists([self.override] + self.followup_lists)
                     else:
                         self.delete_objs([self.override])
                     return uuids
@@ -257,7 +329,7 @@ class IndexerState(object):
         self.is_reindexing = self._get_is_reindex()
         if not initialized:
             self.is_initial_indexing = True
-            self.delete_objs([self.override] + self.followup_lists)
+            self.delete_lists([self.override] + self.followup_lists)
             state = self.get()
             state['status'] = 'uninitialized'
             self.put(state)
@@ -280,11 +352,16 @@ class IndexerState(object):
         if xmin == -1:  # or snapshot is None:
             return (-1, [], False)
 
-        #assert(self.get_count(self.done_set) == 0)  # Valid for cycle-level accounting only
-        #undone_uuids = self.get_diff(self.todo_set, [self.done_set])  # works for any accountingu
-        undone_uuids = self.get_list(self.todo_set)                    # works fastest for cycle-level accounting
+        done_uuids = self.get_checkpointed()
+        undone_uuids = UuidArray(
+            uuid for uuid in self.iter_list(self.todo_set) if uuid not in done_uuids
+        )
         if len(undone_uuids) <= 0:  # TODO SEARCH_MAX?  SEARCH_MAX/10
             return (-1, [], False)
+        log.warning(
+            '%s resuming interrupted cycle at xmin %s, %d of %d uuids left',
+            self.state_id, xmin, len(undone_uuids), self.get_count(self.todo_set),
+        )
 
         # Note: do not clean up last cycle yet because we could be restarted multiple times.
         return (xmin, undone_uuids, True)
@@ -292,9 +369,8 @@ class IndexerState(object):
 
     def prep_for_followup(self, xmin, uuids):
         '''Prepare a cycle of uuids for passing to a followup indexer (e.g. audits, viscache)'''
-        prep_list = [ "xmin:%s" % xmin ]
-        prep_list.extend(uuids)
-        self.put_list(self.followup_prep_list, prep_list)
+        self.delete_lists([self.followup_prep_list])
+        self.list_extend(self.followup_prep_list, itertools.chain(["xmin:%s" % xmin], uuids))
         # No need to preserve anything on the prep_list as it passes to the staged list in one cycle.
 
     def start_cycle(self, uuids, state=None):
@@ -308,11 +384,34 @@ class IndexerState(object):
         state['cycle_count'] = len(uuids)
 
         self.put(state)
-        self.delete_objs(self.cleanup_last_cycle)
-        self.delete_objs(self.cleanup_this_cycle)
-        self.put_list(self.todo_set, set(uuids))
+        self.delete_lists(self.cleanup_last_cycle)
+        self.delete_lists(self.cleanup_this_cycle)
+        self._delete_checkpoints()
+        if not isinstance(uuids, UuidArray):
+            uuids = set(uuids)
+        self.list_extend(self.todo_set, uuids)
         return state
 
+    def checkpoint(self, uuids):
+        '''Record uuids finished this cycle, persisted every checkpoint_size uuids'''
+        if not self.checkpoint_size:
+            return
+        self._checkpoint_buffer.extend(uuids)
+        if len(self._checkpoint_buffer) < self.checkpoint_size:
+            return
+        # Each chunk is its own object so a checkpoint never rewrites earlier ones
+        self.put_list(self._checkpoint_id(self._checkpoint_chunks), self._checkpoint_buffer)
+        self._checkpoint_chunks += 1
+        self.put_obj(self.done_set, {'chunks': self._checkpoint_chunks})
+        self._checkpoint_buffer = []
+
+    def get_checkpointed(self):
+        '''Returns set of uuids checkpointed in the current or interrupted cycle'''
+        done_uuids = set()
+        for chunk in range(self.get_obj(self.done_set).get('chunks', 0)):
+            done_uuids.update(self.get_list(self._checkpoint_id(chunk)))
+        return done_uuids
+
     def add_errors(self, errors, finished=True):
         '''To avoid 16 worker concurency issues, errors are recorded at the end of a cycle.'''
         uuids = [err['uuid'] for err in errors]  # better be uuids!
@@ -340,12 +439,11 @@ class IndexerState(object):
         # pass any staged items to followup
         if self.followup_prep_list is not None:
             # TODO: send signal for 'all' when appropriate.  Saves the following expensive lines.
-            hand_off_list = self.get_list(self.followup_prep_list)
-            if len(hand_off_list) > 0:  # Have to push because ready_list may still have previous cycles in it
+            if self.get_count(self.followup_prep_list) > 0:  # Have to push because ready_list may still have previous cycles in it
                 for id in self.followup_lists:
-                    self.list_extend(id, hand_off_list)
+                    self.list_extend(id, self.iter_list(self.followup_prep_list))
                     #log.warn("prmary added to %s" % id)
-                self.delete_objs([self.followup_prep_list])
+                self.delete_lists([self.followup_prep_list])
 
         # cycle-level accounting so todo => done => last in this function
         #self.rename_objs(self.todo_set, self.done_set)
@@ -359,7 +457,8 @@ class IndexerState(object):
         state['indexed'] = done_count
 
         #self.rename_objs(self.done_set, self.last_set)   # cycle-level accounting so todo => done => last in this function
-        self.delete_objs(self.cleanup_this_cycle)
+        self.delete_lists(self.cleanup_this_cycle)
+        self._delete_checkpoints()
         state['status'] = 'done'
         state['cycles'] = state.get('cycles', 0) + 1
         state['cycle_took'] = self.elapsed('cycle')
@@ -572,7 +671,7 @@ class IndexerState(object):
                     uuid_end = uuid_start+100
                     if uuid_start > 0:
                         uuids_to_show.append("... skipped first %d uuids" % (uuid_start))
-                    uuids_to_show.extend(uuid_list['list'][uuid_start:uuid_end])
+                    uuids_to_show.extend(itertools.islice(self.iter_list(self.todo_set), uuid_start, uuid_end))
                     if uuid_list.get('count',0) > uuid_end:
                         uuids_to_show.append("another %d uuids..." % (uuid_list.get('count',0) - uuid_end))
                 elif uuid_start > 0:
@@ -640,22 +739,29 @@ def all_types(registry):
     return sorted(collections.by_item_type)
 
 
-def all_uuids(registry, types=None):
+def _uuid_collection_names(registry, types=None):
     # First index user and access_key so people can log in
     collections = registry[COLLECTIONS]
     initial = ['user', 'access_key']
-    for collection_name in initial:
-        collection = collections.by_item_type.get(collection_name, [])
-        # for snovault test application, there are no users or keys
-        if types is not None and collection_name not in types:
-            continue
-        for uuid in collection:
-            yield str(uuid)
-    for collection_name in sorted(collections.by_item_type):
-        if collection_name in initial:
-            continue
-        if types is not None and collection_name not in types:
-            continue
-        collection = collections.by_item_type[collection_name]
-        for uuid in collection:
+    # for snovault test application, there are no users or keys
+    names = [name for name in initial if name in collections.by_item_type]
+    names.extend(name for name in sorted(collections.by_item_type) if name not in initial)
+    return [name for name in names if types is None or name in types]
+
+
+def all_uuids(registry, types=None):
+    collections = registry[COLLECTIONS]
+    for collection_name in _uuid_collection_names(registry, types):
+        for uuid in collections.by_item_type[collection_name]:
             yield str(uuid)
+
+
+def all_uuid_array(registry, types=None):
+    '''all_uuids as a UuidArray streamed from the database, 16 bytes per uuid'''
+    collections = registry[COLLECTIONS]
+    connection = registry[CONNECTION]
+    uuids = UuidArray()
+    for collection_name in _uuid_collection_names(registry, types):
+        subtypes = collections.by_item_type[collection_name].type_info.subtypes
+        uuids.extend(connection.iter_uuid_bytes(*subtypes))
+    return uuids
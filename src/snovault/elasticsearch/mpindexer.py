@@ -10,7 +10,9 @@ from pyramid.threadlocal import (
     manager,
 )
 import atexit
+import humanfriendly
 import logging
+import psutil
 import time
 import transaction
 from .indexer import (
@@ -23,6 +25,10 @@ from .interfaces import (
 )
 
 log = logging.getLogger('snovault.elasticsearch.es_index_listener')
+# task: workers exit after maxtasks pool tasks, the original behavior
+# cycle: workers live until the end of an indexing cycle
+# persistent: workers live across cycles
+WORKER_LIFECYCLES = ('task', 'cycle', 'persistent')
 
 
 def includeme(config):
@@ -54,9 +60,10 @@ def initializer(app_factory, settings):
 
 
 def set_snapshot(xmin, snapshot_id):
+    '''Begin a snapshot transaction, returns False if the current one was reused'''
     global current_xmin_snapshot_id
     if current_xmin_snapshot_id == (xmin, snapshot_id):
-        return
+        return False
     clear_snapshot()
     current_xmin_snapshot_id = (xmin, snapshot_id)
 
@@ -84,6 +91,7 @@ def set_snapshot(xmin, snapshot_id):
     request.root = app.root_factory(request)
     request._stats = {}
     manager.push({'request': request, 'registry': registry})
+    return True
 
 
 def clear_snapshot(signum=None, frame=None):
@@ -97,16 +105,20 @@ def clear_snapshot(signum=None, frame=None):
 
 @contextmanager
 def snapshot(xmin, snapshot_id):
+    # Chunks sharing (xmin, snapshot_id) reuse the open transaction, it is
+    # only cleared after the worker has been idle for 5 seconds.
     import signal
     signal.alarm(0)
-    set_snapshot(xmin, snapshot_id)
-    yield
-    signal.alarm(5)
+    is_new = set_snapshot(xmin, snapshot_id)
+    try:
+        yield is_new
+    finally:
+        signal.alarm(5)
 
 
 def update_object_in_snapshot(args):
     uuid, xmin, snapshot_id, restart = args
-    with snapshot(xmin, snapshot_id):
+    with snapshot(xmin, snapshot_id) as is_new_snapshot:
         request = get_current_request()
         encoded_es = request.registry[ELASTIC_SEARCH]
         map_info = {
@@ -114,6 +126,7 @@ def update_object_in_snapshot(args):
             'end_time': None,
             'run_time': None,
             'pid':os.getpid(),
+            'snapshot_reused': not is_new_snapshot,
         }
         update_info = Indexer.update_object(
             encoded_es,
@@ -129,6 +142,33 @@ def update_object_in_snapshot(args):
         return update_info
 
 
+def update_objects_in_snapshot(args):
+    uuids, xmin, snapshot_id, write_options = args
+    with snapshot(xmin, snapshot_id) as is_new_snapshot:
+        request = get_current_request()
+        encoded_es = request.registry[ELASTIC_SEARCH]
+        map_info = {
+            'start_time': time.time(),
+            'end_time': None,
+            'run_time': None,
+            'pid':os.getpid(),
+            'snapshot_reused': not is_new_snapshot,
+        }
+        update_infos = list(Indexer.chunk_update_objects(
+            encoded_es,
+            request,
+            uuids,
+            xmin,
+            write_options,
+        ))
+        map_info['end_time'] = time.time()
+        map_info['run_time'] = map_info['end_time'] - map_info['start_time']
+        for update_info in update_infos:
+            update_info['snapshot_id'] = snapshot_id
+            update_info['map_info'] = map_info
+        return update_infos
+
+
 # Running in main process
 
 class MPIndexer(Indexer):
@@ -137,6 +177,29 @@ class MPIndexer(Indexer):
     def __init__(self, registry, processes=None):
         super(MPIndexer, self).__init__(registry)
         self.initargs = (registry[APP_FACTORY], registry.settings,)
+        self.worker_lifecycle = 'task'
+        self.worker_rss_limit = None
+        self._setup_worker_lifecycle(registry.settings)
+
+    def _setup_worker_lifecycle(self, settings):
+        '''Init helper - Set how long pooled worker processes live'''
+        worker_lifecycle = settings.get('indexer.worker_lifecycle', 'task')
+        if worker_lifecycle not in WORKER_LIFECYCLES:
+            log.warning(
+                'Unknown indexer.worker_lifecycle %r.  Defaulting to task.',
+                worker_lifecycle,
+            )
+            worker_lifecycle = 'task'
+        self.worker_lifecycle = worker_lifecycle
+        if worker_lifecycle == 'task':
+            return
+        # Long lived workers are recycled on a task count or rss budget.
+        # Pool tasks are imap chunks, not single uuids.
+        maxtasks = settings.get('indexer.worker_maxtasks')
+        self.maxtasks = int(maxtasks) if maxtasks else None
+        rss_limit = settings.get('indexer.worker_rss_limit')
+        if rss_limit:
+            self.worker_rss_limit = humanfriendly.parse_size(rss_limit)
 
     @reify
     def pool(self):
@@ -165,19 +228,14 @@ class MPIndexer(Indexer):
         chunkiness = int((uuid_count - 1) / processes) + 1
         if chunkiness > chunk_size:
             chunkiness = chunk_size
-        tasks = [
-            (uuid, xmin, snapshot_id, restart)
-            for uuid in uuids
-        ]
         errors = []
         update_infos = []
         start_time = time.time()
         try:
             for i, update_info in enumerate(
-                    self.pool.imap_unordered(
-                        update_object_in_snapshot,
-                        tasks,
-                        chunkiness)
+                    self._imap_update_infos(
+                        uuids, xmin, snapshot_id, restart, chunkiness
+                    )
                 ):
                 update_info['return_time'] = time.time()
                 update_infos.append(update_info)
@@ -190,8 +248,85 @@ class MPIndexer(Indexer):
         except:
             self.shutdown()
             raise
+        self._check_worker_rss()
         return update_infos, errors
 
+    def _get_worker_rss(self):
+        '''Return rss by pid of the pooled worker processes'''
+        worker_rss = {}
+        if 'pool' not in self.__dict__:
+            return worker_rss
+        # pylint: disable=protected-access
+        for process in self.pool._pool:
+            try:
+                worker_rss[process.pid] = psutil.Process(process.pid).memory_info().rss
+            except psutil.Error:
+                continue
+        return worker_rss
+
+    def _check_worker_rss(self):
+        '''
+        Recycle the pool between batches if any worker is over the rss limit
+
+        Idle pool workers cannot be killed one at a time without risking the
+        pool task queue lock, so the whole pool is closed and rebuilt lazily.
+        '''
+        if self.worker_lifecycle == 'task' or not self.worker_rss_limit:
+            return
+        for pid, rss in self._get_worker_rss().items():
+            if rss > self.worker_rss_limit:
+                log.warning(
+                    'Recycling indexer pool. Worker %d rss %d exceeds limit of %d',
+                    pid,
+                    rss,
+                    self.worker_rss_limit,
+                )
+                self._close_pool()
+                return
+
+    def _close_pool(self):
+        '''Let idle workers exit cleanly so their snapshots are aborted'''
+        if 'pool' in self.__dict__:
+            self.pool.close()
+            self.pool.join()
+            del self.pool
+
+    def end_cycle(self):
+        if self.worker_lifecycle == 'cycle':
+            self._close_pool()
+
+    def _imap_update_infos(self, uuids, xmin, snapshot_id, restart, chunkiness):
+        # pylint: disable=too-many-arguments
+        '''Yield update_infos from the pool, one task per uuid or per chunk'''
+        write_options = self.write_options
+        if not (
+                self.bulk_size
+                or self.pipeline_size
+                or self.retry_scheduler
+                or self.embed_dependencies
+            ):
+            tasks = [
+                (uuid, xmin, snapshot_id, restart)
+                for uuid in uuids
+            ]
+            yield from self.pool.imap_unordered(
+                update_object_in_snapshot,
+                tasks,
+                chunkiness,
+            )
+            return
+        # Each task renders and writes a whole chunk in one worker
+        uuids = list(uuids)
+        tasks = [
+            (uuids[i:i + chunkiness], xmin, snapshot_id, write_options)
+            for i in range(0, len(uuids), chunkiness)
+        ]
+        for update_infos in self.pool.imap_unordered(
+                update_objects_in_snapshot,
+                tasks,
+            ):
+            yield from update_infos
+
     def shutdown(self):
         if 'pool' in self.__dict__:
             self.pool.terminate()
@@ -0,0 +1,122 @@
+'''
+Retry scheduler for es writes
+- A write that failed with a retryable error is put on a delay queue
+instead of sleeping in the worker, so the worker moves on to the next
+uuid.  A scheduler thread re-attempts writes when they are due.
+- Delays grow exponentially with jitter so retries from many workers do
+not hit a recovering cluster at the same time.
+'''
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+
+log = logging.getLogger('snovault.elasticsearch.es_index_listener')
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 80
+RETRY_MAX_ATTEMPTS = 4  # retries after the first write, like the blocking backoffs
+
+
+def get_retry_delay(retry, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    '''Jittered delay before a retry, retry counts from 1'''
+    delay = min(max_delay, base_delay * 2 ** (retry - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryScheduler(object):
+    '''
+    Re-attempt failed writes from a scheduler thread
+
+    try_write(uuid, doc, update_info, retry) makes one write attempt and
+    returns (retry_again, last_exc).  finish waits for every scheduled write
+    to succeed or run out of attempts and returns (update_info, last_exc)
+    pairs.
+    '''
+    def __init__(
+            self,
+            try_write,
+            max_attempts=RETRY_MAX_ATTEMPTS,
+            base_delay=RETRY_BASE_DELAY,
+            max_delay=RETRY_MAX_DELAY,
+        ):
+        self.try_write = try_write
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._heap = []
+        self._counter = itertools.count()
+        self._results = []
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='index-retry-scheduler',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __len__(self):
+        return self._pending
+
+    def schedule(self, uuid, doc, update_info, last_exc, retry=1):
+        '''Schedule a retry of a failed write, never blocks'''
+        # pylint: disable=too-many-arguments
+        if retry > self.max_attempts:
+            with self._cond:
+                self._results.append((update_info, last_exc))
+            return
+        delay = get_retry_delay(retry, self.base_delay, self.max_delay)
+        with self._cond:
+            if retry == 1:
+                self._pending += 1
+            heapq.heappush(
+                self._heap,
+                (time.time() + delay, next(self._counter), uuid, doc, update_info, retry),
+            )
+            self._cond.notify()
+
+    def finish(self):
+        '''Wait for all scheduled retries, returns (update_info, last_exc) pairs'''
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        results = self._results
+        self._results = []
+        return results
+
+    def _next_due(self):
+        '''Wait for the next due retry, None when closed and done'''
+        with self._cond:
+            while True:
+                if self._heap:
+                    wait = self._heap[0][0] - time.time()
+                    if wait <= 0:
+                        return heapq.heappop(self._heap)
+                    self._cond.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            entry = self._next_due()
+            if entry is None:
+                break
+            _, _, uuid, doc, update_info, retry = entry
+            try:
+                retry_again, last_exc = self.try_write(uuid, doc, update_info, retry)
+            except Exception as ecp:  # pylint: disable=broad-except
+                log.error('Error retrying %s', uuid, exc_info=True)
+                retry_again, last_exc = False, repr(ecp)
+            if retry_again and retry < self.max_attempts:
+                self.schedule(uuid, doc, update_info, last_exc, retry=retry + 1)
+                continue
+            with self._cond:
+                self._pending -= 1
+                self._results.append((update_info, last_exc))
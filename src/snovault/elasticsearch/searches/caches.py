@@ -0,0 +1,200 @@
+'''
+Response cache for search views.
+
+Set search.cache.capacity to keep up to that many rendered search responses
+per process.  Responses are keyed by the view, its sorted query string
+params, the requesting principals and the index generation, a counter the
+indexer bumps after every cycle that writes to the resources index, along
+with the uuids of the indices so recreating them starts a new generation.
+The generation is read from elasticsearch at most once every
+search.cache.check_interval seconds, so results may lag an indexing cycle by
+that long.
+'''
+import logging
+import threading
+import time
+
+from functools import wraps
+from operator import itemgetter
+from pyramid.view import view_config
+from sqlalchemy.util import LRUCache
+
+from snovault.stats import add_request_stat
+from snovault.util import quick_deepcopy
+from snovault.elasticsearch.interfaces import ELASTIC_SEARCH
+from snovault.elasticsearch.interfaces import RESOURCES_INDEX
+
+from .interfaces import AT_ID
+from .interfaces import SEARCH_CACHE
+
+
+log = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 1.0  # seconds
+GENERATION_ID = 'generation'
+
+
+def includeme(config):
+    settings = config.registry.settings
+    capacity = int(settings.get('search.cache.capacity', 0))
+    config.registry[SEARCH_CACHE] = None
+    if capacity:
+        generation = IndexGeneration(
+            config.registry[ELASTIC_SEARCH],
+            settings['snovault.elasticsearch.index'],
+            check_interval=float(settings.get('search.cache.check_interval', CHECK_INTERVAL)),
+        )
+        config.registry[SEARCH_CACHE] = SearchResponseCache(capacity, generation)
+    config.add_route('_search_cache', '/_search_cache')
+    config.scan(__name__)
+
+
+def bump_index_generation(es, index):
+    '''
+    Called by the indexer after a cycle, the meta document's version is the generation.
+    '''
+    es.index(index=index, doc_type='meta', id=GENERATION_ID, body={'timestamp': time.time()})
+
+
+class IndexGeneration:
+    '''
+    Version of the generation meta document and the uuids of the meta and
+    resources indices, checked at most once per check_interval.
+    '''
+
+    def __init__(self, es, index, check_interval=CHECK_INTERVAL):
+        self.es = es
+        self.index = index
+        self.check_interval = check_interval
+        self.generation = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _get_index_uuids(self):
+        settings = self.es.indices.get_settings(
+            index=','.join([self.index, RESOURCES_INDEX]),
+            name='index.uuid'
+        )
+        return tuple(sorted(
+            index_settings['settings']['index']['uuid']
+            for index_settings in settings.values()
+        ))
+
+    def _get_generation(self):
+        result = self.es.get(
+            index=self.index,
+            doc_type='meta',
+            id=GENERATION_ID,
+            _source=False,
+            ignore=[400, 404]
+        )
+        return (result.get('_version', 0), self._get_index_uuids())
+
+    def get(self):
+        '''
+        Returns the current generation, None when it could not be read.
+        '''
+        with self._lock:
+            now = time.time()
+            if self._checked is not None and now - self._checked < self.check_interval:
+                return self.generation
+            self._checked = now
+            try:
+                self.generation = self._get_generation()
+            except Exception:
+                log.warning('Could not check index generation', exc_info=True)
+                self.generation = None
+            return self.generation
+
+
+class SearchResponseCache:
+    '''
+    Process wide LRU cache of rendered search responses.
+    '''
+
+    def __init__(self, capacity, generation, threshold=.5):
+        self.capacity = capacity
+        self.generation = generation
+        self._cache = LRUCache(capacity, threshold)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, request, view_name):
+        generation = self.generation.get()
+        if generation is None:
+            return None
+        return (
+            view_name,
+            request.path,
+            # Stable sort by name, repeated sort and field values keep their order
+            tuple(sorted(request.params.items(), key=itemgetter(0))),
+            tuple(sorted(request.effective_principals)),
+            generation,
+        )
+
+    def get(self, key):
+        result = self._cache.get(key)
+        if result is None:
+            with self._lock:
+                self.misses += 1
+            add_request_stat('search_cache_miss', 1)
+            return None
+        with self._lock:
+            self.hits += 1
+        add_request_stat('search_cache_hit', 1)
+        return result
+
+    def set(self, key, result):
+        with self._lock:
+            self._cache[key] = result
+
+    def as_dict(self):
+        return {
+            'capacity': self.capacity,
+            'generation': self.generation.generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+        }
+
+    def __len__(self):
+        return len(self._cache)
+
+
+def cached_search_response(view):
+    '''
+    Serves the view's response from the search cache when it is enabled.
+
+    Only top level requests rendered in memory are cached, streamed and
+    embedded responses are left alone.  Callers get their own copy of the
+    cached response to modify.  Params are sorted by name in the key, so the @id
+    of a cached response is set from the request.
+    '''
+    @wraps(view)
+    def wrapper(context, request):
+        cache = request.registry.get(SEARCH_CACHE)
+        if cache is None or request.__parent__ is not None:
+            return view(context, request)
+        key = cache.make_key(request, view.__name__)
+        if key is None:
+            return view(context, request)
+        result = cache.get(key)
+        if result is None:
+            result = view(context, request)
+            if isinstance(result, dict):
+                cache.set(key, quick_deepcopy(result))
+            return result
+        result = quick_deepcopy(result)
+        if AT_ID in result:
+            result[AT_ID] = request.path_qs
+        return result
+    return wrapper
+
+
+@view_config(route_name='_search_cache', request_method='GET', permission='index')
+def search_cache_view(request):
+    cache = request.registry[SEARCH_CACHE]
+    if cache is None:
+        return {}
+    return cache.as_dict()
@@ -85,6 +85,15 @@ INTERNAL_AUDIT_FACETS = [
 
 MAX_ES_RESULTS_WINDOW = 9999
 
+# Hits per search_after page when streaming limit=all results
+SEARCH_AFTER_PAGE_SIZE = 1000
+
+# Appended to the sort so search_after pages follow a total order
+SEARCH_AFTER_TIEBREAKER = {'uuid': {'order': 'asc'}}
+
+# Characters per chunk written by StreamedResponse
+STREAMED_RESPONSE_CHUNK_SIZE = 1 << 16
+
 DEFAULT_FRAMES = [
     EMBEDDED_FRAME,
     OBJECT_FRAME,
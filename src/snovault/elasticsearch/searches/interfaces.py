@@ -1,4 +1,5 @@
 ADVANCED_QUERY_KEY = 'advancedQuery'
+AGGS = 'aggs'
 ALL = 'all'
 AND = 'AND'
 AND_JOIN = ' AND '
@@ -65,12 +66,16 @@ QUERY_STRING = 'query_string'
 RAW_QUERY = 'raw_query'
 REMOVE = 'remove'
 REPORT_TITLE = 'Report'
+SCORE = '_score'
+SEARCH_AFTER = 'search_after'
 SEARCH_AUDIT = 'search_audit'
 SEARCH_BASE = 'search_base'
+SEARCH_CACHE = 'search_cache'
 SEARCH_PATH = '/search/'
 SEARCH_TITLE = 'Search'
 SEARCH_TERM_KEY = 'searchTerm'
 SIMPLE_QUERY_STRING = 'simple_query_string'
+SIZE = 'size'
 SORT_KEY = 'sort'
 _SOURCE = '_source'
 SUCCESS = 'Success'
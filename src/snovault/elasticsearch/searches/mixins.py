@@ -1,26 +1,38 @@
 from collections import defaultdict
 from collections import OrderedDict
+from elasticsearch_dsl.connections import connections
+from elasticsearch_dsl.response import Hit
 from functools import lru_cache
+from uuid import uuid4
 
 from .defaults import AUDIT_FIELDS
 from .defaults import KEEP_LAYERED_FIELDS
+from .defaults import SEARCH_AFTER_TIEBREAKER
+from .interfaces import AGGS
 from .interfaces import APPENDED
 from .interfaces import BUCKETS
 from .interfaces import DASH
 from .interfaces import DOC_COUNT
 from .interfaces import FIELD_KEY
+from .interfaces import FROM_KEY
+from .interfaces import HITS
 from .interfaces import JS_IS_EQUAL
 from .interfaces import JS_TRUE
 from .interfaces import JS_FALSE
 from .interfaces import KEY
 from .interfaces import OPEN_ON_LOAD
 from .interfaces import PERIOD
+from .interfaces import SCORE
+from .interfaces import SEARCH_AFTER
+from .interfaces import SIZE
+from .interfaces import SORT_KEY
 from .interfaces import TERMS
 from .interfaces import TITLE
 from .interfaces import TOTAL
 from .interfaces import TYPE_KEY
 from .interfaces import X
 from .interfaces import Y
+from .interfaces import _SOURCE
 
 
 class AggsToFacetsMixin:
@@ -186,8 +198,45 @@ class HitsToGraphMixin:
                 break
             yield r
 
-    def _scan(self):
-        results = self.results._search.scan()
+    def _get_search_after_body(self, search):
+        body = search.to_dict()
+        body.pop(AGGS, None)
+        body.pop(FROM_KEY, None)
+        body[SIZE] = self.query_builder._get_search_after_page_size()
+        body[SORT_KEY] = (body.get(SORT_KEY) or [SCORE]) + [SEARCH_AFTER_TIEBREAKER]
+        return body
+
+    def _search_after_hits(self):
+        '''
+        Pages through all hits in the requested sort order with search_after.
+        No scroll context is held between pages. The uuid tiebreaker makes the
+        order total and the preference keeps every page on the same shard copies.
+        '''
+        search = self.results._search
+        es = connections.get_connection(search._using)
+        body = self._get_search_after_body(search)
+        preference = uuid4().hex
+        while True:
+            hits = es.search(
+                index=search._index,
+                doc_type=search._doc_type,
+                body=body,
+                preference=preference,
+                **search._params
+            )[HITS][HITS]
+            yield from hits
+            if len(hits) < body[SIZE]:
+                break
+            body[SEARCH_AFTER] = hits[-1][SORT_KEY]
+
+    def _search_after(self):
+        search = self.results._search
+        for hit in self._search_after_hits():
+            callback = search._doc_type_map.get(hit['_type'], Hit)
+            callback = getattr(callback, 'from_es', callback)
+            yield callback(hit)
+
+    def _limit_results(self, results):
         if not self.query_builder._limit_is_all():
             results = self._limit_generator(
                 results,
@@ -195,27 +244,54 @@ class HitsToGraphMixin:
             )
         return results
 
+    def _scan(self):
+        return self._limit_results(self._search_after())
+
+    def _scan_sources(self):
+        '''
+        Raw _source of scanned hits, skips wrapping every hit in a dsl Hit.
+        '''
+        return self._limit_results(
+            hit[_SOURCE] for hit in self._search_after_hits()
+        )
+
     def _get_results(self):
         if self.query_builder._should_scan_over_results():
             return self._scan()
         return self.results
 
+    def _get_sources(self):
+        if self.query_builder._should_scan_over_results():
+            return self._scan_sources()
+        return (
+            r.to_dict()
+            for r in self.results
+        )
+
     def _unlayer(self, hit_dict, keep_layered=KEEP_LAYERED_FIELDS):
         '''
         Removes embedded.* and object.* prefix from results but keeps audit.* prefix.
+        Keys are sorted, the dict is only rebuilt when they are out of order.
         '''
         r = {}
         for k, v in hit_dict.items():
             if k in keep_layered:
-                r.update({k: v})
+                r[k] = v
             else:
                 r.update(v)
-        return OrderedDict(sorted(r.items()))
+        keys = list(r)
+        sorted_keys = sorted(keys)
+        if keys == sorted_keys:
+            return r
+        return {
+            k: r[k]
+            for k in sorted_keys
+        }
 
     def to_graph(self):
         return (
-            self._unlayer(r.to_dict())
-            for r in self._get_results()
+            self._unlayer(source)
+            for source in self._get_sources()
         )
 
 
@@ -228,10 +304,7 @@ class RawHitsToGraphMixin(HitsToGraphMixin):
         super().__init__(*args, **kwargs)
 
     def to_graph(self):
-        return [
-            r.to_dict()
-            for r in self._get_results()
-        ]
+        return list(self._get_sources())
 
 
 class AggsToMatrixMixin:
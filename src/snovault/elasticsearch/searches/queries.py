@@ -30,6 +30,7 @@ from .defaults import DEFAULT_SORT_OPTIONS
 from .defaults import INTERNAL_AUDIT_FACETS
 from .defaults import MAX_ES_RESULTS_WINDOW
 from .defaults import NOT_FILTERS
+from .defaults import SEARCH_AFTER_PAGE_SIZE
 from .interfaces import ALL
 from .interfaces import AND
 from .interfaces import AND_JOIN
@@ -417,6 +418,14 @@ class AbstractQueryFactory:
             return default_limit
         return self._get_limit_value_as_int()
 
+    def _get_search_after_page_size(self):
+        return int(
+            self.params_parser._request.registry.settings.get(
+                'search.search_after_page_size',
+                SEARCH_AFTER_PAGE_SIZE
+            )
+        )
+
     @assert_one_or_none_returned(error_message='Invalid to specify multiple mode parameters:')
     def _get_mode(self):
         return self.params_parser.get_mode()
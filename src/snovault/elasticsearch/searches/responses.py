@@ -4,7 +4,13 @@ from collections import OrderedDict
 from pyramid.response import Response
 from types import GeneratorType
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .decorators import remove_from_return
+from .defaults import STREAMED_RESPONSE_CHUNK_SIZE
 from .interfaces import APPLICATION_JSON
 from .mixins import AggsToFacetsMixin
 from .mixins import AggsToMatrixMixin
@@ -102,11 +108,13 @@ class FieldedGeneratorResponse(FieldedResponse):
 class StreamedResponse:
     '''
     Streams FieldedResponse generators that would otherwise run the machine
-    out of memory.
+    out of memory. Values are encoded with orjson when it is installed and
+    written in chunks of about chunk_size characters.
     '''
 
-    def __init__(self, fielded_response):
+    def __init__(self, fielded_response, chunk_size=STREAMED_RESPONSE_CHUNK_SIZE):
         self.fielded_response = fielded_response
+        self.chunk_size = chunk_size
 
     def _start_dict(self):
         return '{'
@@ -127,6 +135,11 @@ class StreamedResponse:
         return ':'
 
     def _to_json(self, value):
+        if orjson is not None:
+            try:
+                return orjson.dumps(value).decode('utf-8')
+            except TypeError:
+                pass
         return json.dumps(value)
 
     def _to_json_from_generator(self, generator):
@@ -151,10 +164,17 @@ class StreamedResponse:
         yield self._end_dict()
 
     def __iter__(self):
-        yield from (
-            s.encode('utf-8')
-            for s in self._iter()
-        )
+        chunk = []
+        size = 0
+        for s in self._iter():
+            chunk.append(s)
+            size += len(s)
+            if size >= self.chunk_size:
+                yield ''.join(chunk).encode('utf-8')
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk).encode('utf-8')
 
     def _make_streamed_response(self):
         response = self.fielded_response.get_or_create_response()
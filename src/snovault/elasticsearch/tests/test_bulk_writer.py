@@ -0,0 +1,146 @@
+'''
+Test the BulkIndexWriter used by the indexer for es bulk api writes
+'''
+from unittest import (
+    TestCase,
+    mock,
+)
+
+from elasticsearch.exceptions import ConnectionError as ESConnectionError
+
+from snovault.elasticsearch.bulk_writer import BulkIndexWriter
+
+from .writerfixtures import get_update_info
+
+
+def _get_bulk_res(statuses):
+    items = []
+    for status in statuses:
+        item = {'status': status}
+        if status >= 300:
+            item['error'] = {'type': 'fake_%d' % status}
+        items.append({'index': item})
+    return {'errors': True, 'items': items}
+
+
+class TestBulkIndexWriter(TestCase):
+    '''Test Bulk Index Writer'''
+    def setUp(self):
+        self.es = mock.MagicMock()
+        self.writer = BulkIndexWriter(self.es, 10, 3)
+
+    def _add(self, uuids):
+        flushed = []
+        for uuid in uuids:
+            doc = {'item_type': 'snowball', 'uuid': uuid}
+            flushed.extend(self.writer.add(uuid, doc, get_update_info(uuid)))
+        return flushed
+
+    def test_add_flushes_at_bulk_size(self):
+        '''Test writer flushes when bulk_size documents are pending'''
+        self.es.bulk.return_value = _get_bulk_res([201, 201, 201])
+        self.assertListEqual(self._add(['a', 'b']), [])
+        self.assertEqual(len(self.writer), 2)
+        flushed = self._add(['c'])
+        self.assertEqual(len(flushed), 3)
+        self.assertEqual(len(self.writer), 0)
+        self.es.bulk.assert_called_once()
+
+    def test_bulk_body(self):
+        '''Test bulk body keeps external_gte versioning per document'''
+        self.es.bulk.return_value = _get_bulk_res([201])
+        self._add(['a'])
+        self.writer.flush()
+        body = self.es.bulk.call_args[1]['body']
+        self.assertDictEqual(
+            body[0],
+            {
+                'index': {
+                    '_index': 'snowball',
+                    '_type': 'snowball',
+                    '_id': 'a',
+                    '_version': 10,
+                    '_version_type': 'external_gte',
+                },
+            },
+        )
+        self.assertDictEqual(body[1], {'item_type': 'snowball', 'uuid': 'a'})
+
+    def test_flush_empty(self):
+        '''Test flush with no documents does not call es'''
+        self.assertListEqual(self.writer.flush(), [])
+        self.es.bulk.assert_not_called()
+
+    def test_flush_conflict_not_error(self):
+        '''Test version conflicts are not reported as errors'''
+        self.es.bulk.return_value = _get_bulk_res([201, 409])
+        self._add(['a', 'b'])
+        flushed = self.writer.flush()
+        self.assertListEqual([last_exc for _, last_exc in flushed], [None, None])
+        backoff_info = flushed[1][0]['es_info']['backoffs']['0']
+        self.assertEqual(
+            backoff_info['error']['msg'],
+            'Conflict indexing b at version 10',
+        )
+
+    def test_flush_item_error(self):
+        '''Test non retryable item errors are returned without retry'''
+        self.es.bulk.return_value = _get_bulk_res([400, 201])
+        self._add(['a', 'b'])
+        flushed = self.writer.flush()
+        self.assertIsNotNone(flushed[0][1])
+        self.assertIsNone(flushed[1][1])
+        self.es.bulk.assert_called_once()
+
+    @mock.patch('snovault.elasticsearch.bulk_writer.time.sleep')
+    def test_flush_item_retry(self, mock_sleep):
+        '''Test only the retryable items are sent again'''
+        self.es.bulk.side_effect = [
+            _get_bulk_res([201, 429]),
+            _get_bulk_res([201]),
+        ]
+        self._add(['a', 'b'])
+        flushed = self.writer.flush()
+        self.assertListEqual([last_exc for _, last_exc in flushed], [None, None])
+        self.assertEqual(self.es.bulk.call_count, 2)
+        retry_body = self.es.bulk.call_args[1]['body']
+        self.assertEqual(len(retry_body), 2)
+        self.assertEqual(retry_body[0]['index']['_id'], 'b')
+        self.assertListEqual(
+            sorted(flushed[1][0]['es_info']['backoffs']),
+            ['0', '10'],
+        )
+        mock_sleep.assert_any_call(10)
+
+    @mock.patch('snovault.elasticsearch.bulk_writer.time.sleep')
+    def test_flush_connection_retries_exhausted(self, mock_sleep):
+        '''Test connection errors retry every backoff then fail the items'''
+        self.es.bulk.side_effect = ESConnectionError('N/A', 'down', None)
+        self._add(['a', 'b'])
+        flushed = self.writer.flush()
+        self.assertEqual(self.es.bulk.call_count, 5)
+        self.assertEqual(mock_sleep.call_count, 5)
+        for update_info, last_exc in flushed:
+            self.assertIsNotNone(last_exc)
+            self.assertEqual(len(update_info['es_info']['backoffs']), 5)
+
+    @mock.patch('snovault.elasticsearch.bulk_writer.time.sleep')
+    def test_flush_item_retry_scheduled(self, mock_sleep):
+        '''Test retryable items are scheduled instead of sent again'''
+        retry_scheduler = mock.MagicMock()
+        self.writer = BulkIndexWriter(self.es, 10, 3, retry_scheduler=retry_scheduler)
+        self.es.bulk.return_value = _get_bulk_res([201, 429])
+        self._add(['a', 'b'])
+        flushed = self.writer.flush()
+        self.es.bulk.assert_called_once()
+        mock_sleep.assert_called_once_with(0)
+        self.assertListEqual(
+            [(update_info['uuid'], last_exc) for update_info, last_exc in flushed],
+            [('a', None)],
+        )
+        retry_scheduler.schedule.assert_called_once()
+        uuid, doc, update_info, last_exc = retry_scheduler.schedule.call_args[0]
+        self.assertEqual(uuid, 'b')
+        self.assertDictEqual(doc, {'item_type': 'snowball', 'uuid': 'b'})
+        self.assertEqual(update_info['uuid'], 'b')
+        self.assertIsNotNone(last_exc)
@@ -31,3 +31,89 @@ class TestPickStorage(object):
         assert write.get_rev_links.called_once
         rev_links_model = write.get_rev_links.call_args[0][0]
         assert rev_links_model is model2
+
+
+class TestElasticSearchStorage(object):
+
+    def test_get_by_id(self, mocker):
+        from ..esstorage import ElasticSearchStorage
+        uuid = '16157204-8c8f-4672-a1a4-14f4b8021fcd'
+        other = '220fe4e5-5c2a-4b2c-a1a5-7f0c64e6de0e'
+
+        def hit(uuid, index):
+            return {
+                '_id': uuid, '_index': index, '_version': 3, 'found': True,
+                '_source': {'uuid': uuid, 'item_type': index},
+            }
+
+        es = mocker.Mock()
+        es.search.return_value = {'hits': {'total': 1, 'hits': [hit(uuid, 'testing_link_target')]}}
+        storage = ElasticSearchStorage(es, 'snovault-resources')
+        assert storage.get_by_uuid(uuid).uuid == uuid
+        assert es.search.call_count == 1
+
+        es.get.return_value = hit(uuid, 'testing_link_target')
+        assert storage.get_by_uuid(uuid).uuid == uuid
+        es.get.assert_called_once_with(
+            index='testing_link_target', doc_type='testing_link_target', id=uuid,
+            _source=True, ignore=404,
+        )
+        assert es.search.call_count == 1
+
+        es.get.return_value = {'found': False}
+        es.search.return_value = {'hits': {'total': 0, 'hits': []}}
+        assert storage.get_by_uuid(other, index='testing_link_source') is None
+        assert es.search.call_count == 2
+
+        es.mget.return_value = {'docs': [hit(uuid, 'testing_link_target')]}
+        es.search.return_value = {'hits': {'total': 1, 'hits': [hit(other, 'testing_link_source')]}}
+        models = storage.get_many([uuid, other])
+        assert sorted(models) == sorted([uuid, other])
+        es.mget.assert_called_once_with(body={'docs': [
+            {'_index': 'testing_link_target', '_type': 'testing_link_target', '_id': uuid},
+        ]}, _source=True)
+        assert es.search.call_args[1]['body']['query'] == {'terms': {'uuid': [other]}}
+
+    def test_get_rev_links_many_uuids(self, mocker):
+        # Keys and values are UUIDs, matching RDBStorage.get_rev_links_many
+        from uuid import UUID
+        from ..esstorage import ElasticSearchStorage
+
+        lab, award, snowball, snowflake = (
+            '%08d-0000-0000-0000-000000000000' % n for n in range(4)
+        )
+        mocker.patch(
+            'snovault.elasticsearch.esstorage.scan',
+            return_value=[
+                {'_id': snowball, '_source': {'links': {'lab': [lab, award]}}},
+                {'_id': snowflake, '_source': {'links': {'lab': [lab]}}},
+            ],
+        )
+        storage = ElasticSearchStorage(Mock(), 'snovault')
+        rev_links = storage.get_rev_links_many([Mock(uuid=lab)], 'lab')
+        assert rev_links == {UUID(lab): [UUID(snowball), UUID(snowflake)]}
+
+
+class TestSessionEdits(object):
+
+    def test_invalidates(self):
+        from uuid import uuid4
+        from ..esstorage import SessionEdits
+        uuids = sorted(str(uuid4()) for _ in range(200))
+        embedded, linked, edited = uuids[:150], uuids[:5], uuids[150:]
+        source = {'embedded_uuids': embedded, 'linked_uuids': linked}
+        edits = SessionEdits([
+            [10, [embedded[100]], []],
+            [20, edited, [linked[2]]],
+            [30, edited[:3], []],
+        ])
+        assert edits.invalidates(5, source)
+        assert edits.invalidates(15, source)
+        assert not edits.invalidates(25, source)
+        assert not edits.invalidates(31, source)
+        # Long lists are binary searched
+        assert edits.invalidates(30, {'embedded_uuids': uuids, 'linked_uuids': []})
+        assert not edits.invalidates(30, {'embedded_uuids': uuids[:100], 'linked_uuids': []})
+        stale = SessionEdits([[10, None, None], [20, edited, []]])
+        assert stale.invalidates(5, source)
+        assert not stale.invalidates(15, source)
@@ -0,0 +1,88 @@
+'''
+Test the PipelinedIndexWriter used by the indexer for threaded es writes
+'''
+import threading
+from unittest import (
+    TestCase,
+    mock,
+)
+
+from snovault.elasticsearch.index_pipeline import PipelinedIndexWriter
+
+from .writerfixtures import get_update_info
+
+
+class TestPipelinedIndexWriter(TestCase):
+    '''Test Pipelined Index Writer'''
+    def test_writes_every_document(self):
+        '''Test all queued documents are written and returned'''
+        written = []
+        writer = PipelinedIndexWriter(
+            lambda uuid, doc, update_info: written.append(uuid),
+            2,
+            writers=3,
+        )
+        uuids = [str(num) for num in range(20)]
+        for uuid in uuids:
+            writer.put(uuid, {'item_type': 'snowball'}, get_update_info(uuid))
+        results = writer.finish()
+        self.assertListEqual(sorted(written), sorted(uuids))
+        self.assertListEqual(
+            sorted(update_info['uuid'] for update_info, _ in results),
+            sorted(uuids),
+        )
+        self.assertTrue(all(last_exc is None for _, last_exc in results))
+
+    def test_put_blocks_when_full(self):
+        '''Test rendering waits for the writer when the queue is full'''
+        release = threading.Event()
+
+        def write_object(uuid, doc, update_info):  # pylint: disable=unused-argument
+            release.wait()
+
+        writer = PipelinedIndexWriter(write_object, 1)
+        writer.put('a', {}, get_update_info('a'))  # taken by the writer
+        writer.put('b', {}, get_update_info('b'))  # fills the queue
+        putter = threading.Thread(
+            target=writer.put, args=('c', {}, get_update_info('c')),
+        )
+        putter.start()
+        putter.join(0.2)
+        self.assertTrue(putter.is_alive())
+        release.set()
+        putter.join()
+        self.assertEqual(len(writer.finish()), 3)
+
+    def test_write_errors_are_per_uuid(self):
+        '''Test a failing write is reported for its uuid only'''
+        def write_object(uuid, doc, update_info):  # pylint: disable=unused-argument
+            if uuid == 'b':
+                raise ValueError('Fake write exception.')
+            return 'last_exc' if uuid == 'c' else None
+
+        writer = PipelinedIndexWriter(write_object, 5)
+        for uuid in ('a', 'b', 'c'):
+            writer.put(uuid, {}, get_update_info(uuid))
+        results = {
+            update_info['uuid']: last_exc
+            for update_info, last_exc in writer.finish()
+        }
+        self.assertIsNone(results['a'])
+        self.assertIn('Fake write exception.', results['b'])
+        self.assertEqual(results['c'], 'last_exc')
+
+    def test_bulk_writers(self):
+        '''Test writer threads batch documents with the bulk api'''
+        es = mock.MagicMock()
+        es.bulk.side_effect = lambda body, request_timeout: {
+            'errors': False,
+            'items': [{'index': {'status': 201}} for _ in body[::2]],
+        }
+        writer = PipelinedIndexWriter(None, 10, encoded_es=es, xmin=5, bulk_size=4)
+        for num in range(10):
+            uuid = str(num)
+            writer.put(uuid, {'item_type': 'snowball'}, get_update_info(uuid))
+        results = writer.finish()
+        self.assertEqual(len(results), 10)
+        self.assertEqual(es.bulk.call_count, 3)
+        self.assertTrue(all(last_exc is None for _, last_exc in results))
@@ -0,0 +1,49 @@
+"""Tests get_related_uuids batching with a mocked elasticsearch scan"""
+from unittest import mock
+
+from snovault.elasticsearch import indexer
+from snovault.elasticsearch.indexer import get_related_uuids
+
+from .test_indexer_simple import _get_uuids
+
+
+def _mock_scan(es, query=None, index=None, size=None, request_timeout=None):
+    # pylint: disable=unused-argument
+    """Every uuid is embedded in the document with id 'rel-<uuid>'"""
+    for uuid in query['query']['terms'][_get_field(query)]:
+        yield {'_id': 'rel-' + uuid}
+        yield {'_id': 'shared'}
+
+
+def _get_field(query):
+    for field in query['query']['terms']:
+        if field != '_cache':
+            return field
+    return None
+
+
+def test_related_uuids_empty():
+    """No updated or renamed uuids does not query es"""
+    es = mock.MagicMock()
+    assert get_related_uuids(None, es, set(), set()) == set()
+    es.indices.refresh.assert_not_called()
+
+
+@mock.patch('snovault.elasticsearch.indexer.RELATED_UUIDS_BATCH', 3)
+@mock.patch('snovault.elasticsearch.indexer.scan', side_effect=_mock_scan)
+def test_related_uuids_batched(mock_scan):
+    """Large updated sets are queried in batches, not a full reindex"""
+    es = mock.MagicMock()
+    updated = _get_uuids(10)
+    renamed = _get_uuids(2)
+    related_set = get_related_uuids(None, es, updated, renamed)
+    assert mock_scan.call_count == 5
+    fields = [_get_field(call[1]['query']) for call in mock_scan.call_args_list]
+    assert fields == ['embedded_uuids'] * 4 + ['linked_uuids']
+    for call in mock_scan.call_args_list:
+        assert len(call[1]['query']['query']['terms'][_get_field(call[1]['query'])]) <= 3
+        assert call[1]['index'] == indexer.RESOURCES_INDEX
+    expected = {'rel-' + uuid for uuid in updated | renamed}
+    expected.add('shared')
+    assert related_set == expected
+    es.indices.refresh.assert_called_once_with(indexer.RESOURCES_INDEX)
@@ -60,6 +60,17 @@ class MockES(object):  # pylint: disable=too-few-public-methods
         if raise_ecp:
             raise raise_ecp('Fake es index exception.')
 
+    @staticmethod
+    def bulk(body=None, request_timeout=None):  # pylint: disable=unused-argument
+        '''Fake bulk, every index action succeeds'''
+        return {
+            'errors': False,
+            'items': [
+                {'index': {'_id': action['index']['_id'], 'status': 201}}
+                for action in body[::2]
+            ],
+        }
+
 
 class MockRegistry(dict):
     """
@@ -209,6 +220,98 @@ def test_smsimp_indexrun(small_index_objs):
         uuids_ran += worker_run['uuids']
     assert uuids_ran == SMALL_UUIDS_CNT
 
+def test_smsimp_indexrun_bulk(small_index_objs):
+    """test simple indexer run with the es bulk api writer"""
+    indexer, request, invalidated = small_index_objs
+    indexer.bulk_size = 4
+    _, errors, err_msg = indexer.serve_objects(
+        request,
+        invalidated,
+        None,  # xmin
+        snapshot_id=None,
+        restart=False,
+        timeout=SMALL_SERVE_TIMEOUT,
+    )
+    assert err_msg is None
+    assert not errors
+    assert sorted(request.embeded_uuids) == sorted(invalidated)
+
+
+def test_smsimp_indexrun_pipeline(small_index_objs):
+    """test simple indexer run with es writes on a writer thread"""
+    indexer, request, invalidated = small_index_objs
+    indexer.pipeline_size = 2
+    request.set_embed_errors(1)
+    _, errors, err_msg = indexer.serve_objects(
+        request,
+        invalidated,
+        None,  # xmin
+        snapshot_id=None,
+        restart=False,
+        timeout=SMALL_SERVE_TIMEOUT,
+    )
+    assert err_msg is None
+    assert len(errors) == 1
+    assert len(request.embeded_uuids) == len(invalidated) - 1
+
+
+def test_smsimp_pipeline_update_infos(small_index_objs):
+    """test pipelined update infos keep the update_object shape"""
+    indexer, request, invalidated = small_index_objs
+    request.set_embed_errors(2)
+    update_infos = indexer.pipeline_update_objects(
+        indexer.es, request, list(invalidated), 1, 3, pipeline_writers=2
+    )
+    assert sorted(info['uuid'] for info in update_infos) == sorted(invalidated)
+    errors = [info['error'] for info in update_infos if info['error']]
+    assert len(errors) == 2
+    for update_info in update_infos:
+        if update_info['error'] is None:
+            assert update_info['es_info']['item_type'] == 'fake item type'
+            assert '0' in update_info['es_info']['backoffs']
+            assert update_info['run_time'] is not None
+
+
+def test_smsimp_bulk_update_infos(small_index_objs):
+    """test bulk update infos keep the update_object shape"""
+    indexer, request, invalidated = small_index_objs
+    request.set_embed_errors(2)
+    update_infos = indexer.bulk_update_objects(
+        indexer.es, request, list(invalidated), 1, 3
+    )
+    assert len(update_infos) == len(invalidated)
+    errors = [info['error'] for info in update_infos if info['error']]
+    assert len(errors) == 2
+    for update_info in update_infos:
+        assert set(update_info) >= {
+            'uuid', 'xmin', 'start_time', 'end_time', 'run_time',
+            'error', 'req_info', 'es_info',
+        }
+        if update_info['error'] is None:
+            assert update_info['es_info']['item_type'] == 'fake item type'
+            assert '0' in update_info['es_info']['backoffs']
+
+
+def test_smsimp_aggregate_stage_timings(small_index_objs):
+    """test stage timings of update infos add up per item type"""
+    indexer, _, _ = small_index_objs
+    stage = {
+        'count': 1, 'run_time': 0.5, 'db_count': 2, 'db_time': 0.25, 'stages': {},
+    }
+    update_infos = [
+        {'es_info': {'item_type': item_type}, 'stage_timings': {'embed @@object': dict(stage)}}
+        for item_type in ('snowball', 'snowball', 'snowflake')
+    ]
+    update_infos.append({'es_info': {'item_type': None}})
+    item_types = indexer.aggregate_stage_timings(update_infos)
+    assert sorted(item_types) == ['snowball', 'snowflake']
+    assert item_types['snowball']['uuids'] == 2
+    snowball_object = item_types['snowball']['stage_timings']['embed @@object']
+    assert snowball_object['count'] == 2
+    assert snowball_object['db_count'] == 4
+    assert snowball_object['run_time'] == 1.0
+
+
 def _test_smsimp_indexrun_emberr(small_index_objs):
     """test simple indexer run  with small vars with embed errors"""
     indexer, request, invalidated = small_index_objs
@@ -249,6 +352,56 @@ def test_simple_mpindexinit():
     assert True
 
 
+def test_mpindexer_task_lifecycle():
+    """test mpindexer defaults to one task per worker"""
+    registry = MockRegistry(SMALL_UUIDS_CNT)
+    mpindexer = MPIndexer(registry)
+    assert mpindexer.worker_lifecycle == 'task'
+    assert mpindexer.maxtasks == 1
+    assert mpindexer.worker_rss_limit is None
+
+
+def test_mpindexer_persistent_lifecycle():
+    """test mpindexer long lived worker settings"""
+    registry = MockRegistry(SMALL_UUIDS_CNT)
+    registry.settings['indexer.worker_lifecycle'] = 'persistent'
+    registry.settings['indexer.worker_maxtasks'] = '50'
+    registry.settings['indexer.worker_rss_limit'] = '1GB'
+    mpindexer = MPIndexer(registry)
+    assert mpindexer.worker_lifecycle == 'persistent'
+    assert mpindexer.maxtasks == 50
+    assert mpindexer.worker_rss_limit == 1000 ** 3
+    mpindexer._close_pool = mock.MagicMock()
+    mpindexer.end_cycle()
+    mpindexer._close_pool.assert_not_called()
+    mpindexer._get_worker_rss = mock.MagicMock(return_value={1: 10, 2: 1000 ** 3})
+    mpindexer._check_worker_rss()
+    mpindexer._close_pool.assert_not_called()
+    mpindexer._get_worker_rss = mock.MagicMock(return_value={1: 10, 2: 1000 ** 3 + 1})
+    mpindexer._check_worker_rss()
+    mpindexer._close_pool.assert_called_once()
+
+
+def test_mpindexer_cycle_lifecycle():
+    """test mpindexer cycle workers are closed at the end of a cycle"""
+    registry = MockRegistry(SMALL_UUIDS_CNT)
+    registry.settings['indexer.worker_lifecycle'] = 'cycle'
+    mpindexer = MPIndexer(registry)
+    assert mpindexer.maxtasks is None
+    mpindexer._close_pool = mock.MagicMock()
+    mpindexer.end_cycle()
+    mpindexer._close_pool.assert_called_once()
+
+
+def test_mpindexer_unknown_lifecycle():
+    """test mpindexer falls back to task lifecycle"""
+    registry = MockRegistry(SMALL_UUIDS_CNT)
+    registry.settings['indexer.worker_lifecycle'] = 'forever'
+    mpindexer = MPIndexer(registry)
+    assert mpindexer.worker_lifecycle == 'task'
+    assert mpindexer.maxtasks == 1
+
+
 class TestIndexer(TestCase):
     """Test Indexer in indexer.py"""
     @classmethod
@@ -0,0 +1,154 @@
+'''
+Test IndexerState progress checkpoints with an in memory meta index
+'''
+import uuid
+from unittest import (
+    TestCase,
+    mock,
+)
+
+from elasticsearch.exceptions import NotFoundError
+
+from snovault.elasticsearch.indexer_state import IndexerState
+from snovault.util import UuidArray
+
+
+class MockES(object):
+    '''Keeps meta documents by id'''
+    def __init__(self):
+        self.docs = {}
+
+    def get(self, index=None, doc_type=None, id=None):  # pylint: disable=redefined-builtin, unused-argument
+        if id not in self.docs:
+            raise NotFoundError(404, 'not found')
+        return {'_source': self.docs[id]}
+
+    def index(self, index=None, doc_type=None, id=None, body=None):  # pylint: disable=redefined-builtin, unused-argument
+        self.docs[id] = dict(body, list=list(body['list'])) if 'list' in body else dict(body)
+
+    def delete(self, index=None, doc_type=None, id=None):  # pylint: disable=redefined-builtin, unused-argument
+        del self.docs[id]
+
+
+class TestIndexerStateCheckpoints(TestCase):
+    '''Test checkpoints and resuming an interrupted cycle'''
+    def setUp(self):
+        self.es = MockES()
+        self.es.docs['indexing'] = {'xmin': 5}
+        self.uuids = [str(uuid.UUID(int=num)) for num in range(10)]
+
+    def _start_cycle(self, checkpoint_size=3):
+        state = IndexerState(self.es, 'snovault', checkpoint_size=checkpoint_size)
+        result = state.get_initial_state()
+        result['xmin'] = 12
+        return state, state.start_cycle(self.uuids, result)
+
+    def test_checkpoint_chunks(self):
+        '''Test uuids are persisted once a chunk is full'''
+        state, _ = self._start_cycle()
+        state.checkpoint(self.uuids[:2])
+        self.assertSetEqual(state.get_checkpointed(), set())
+        state.checkpoint(self.uuids[2:7])
+        self.assertSetEqual(state.get_checkpointed(), set(self.uuids[:7]))
+        self.assertEqual(self.es.docs['primary_done']['chunks'], 1)
+
+    def test_resume_remainder(self):
+        '''Test an interrupted cycle resumes the unfinished uuids at its xmin'''
+        state, _ = self._start_cycle()
+        state.checkpoint(self.uuids[:6])
+        # Crash, the next index run starts with a new IndexerState
+        state = IndexerState(self.es, 'snovault')
+        xmin, uuids, restart = state.priority_cycle(None)
+        self.assertTrue(restart)
+        self.assertEqual(xmin, 12)
+        self.assertIsInstance(uuids, UuidArray)
+        self.assertSetEqual(set(uuids), set(self.uuids[6:]))
+
+    def test_finish_cycle_clears_checkpoints(self):
+        '''Test checkpoints do not outlive their cycle'''
+        state, result = self._start_cycle()
+        state.checkpoint(self.uuids)
+        state.finish_cycle(result, [])
+        self.assertSetEqual(state.get_checkpointed(), set())
+        self.assertFalse(
+            [doc_id for doc_id in self.es.docs if doc_id.startswith('primary_done')]
+        )
+
+
+class TestIndexerStateChunkedLists(TestCase):
+    '''Test the todo, last cycle and followup lists are stored in chunks'''
+    def setUp(self):
+        self.es = MockES()
+        self.state = IndexerState(
+            self.es, 'snovault', followups=['vis_indexer'], list_chunk_size=4
+        )
+        self.uuids = ['uuid-%d' % num for num in range(10)]
+
+    def _ids(self, prefix):
+        return [doc_id for doc_id in self.es.docs if doc_id.startswith(prefix)]
+
+    def test_start_cycle_chunks(self):
+        '''Test the todo set is written one chunk per object'''
+        from snovault.util import UuidArray
+        uuids = UuidArray(['00000000-0000-0000-0000-%012d' % num for num in range(10)])
+        result = self.state.start_cycle(uuids, {})
+        self.assertEqual(result['cycle_count'], 10)
+        self.assertEqual(self.es.docs['primary_in_progress'], {'chunks': 3, 'count': 10})
+        self.assertEqual(self.es.docs['primary_in_progress_2'], {'list': list(uuids)[8:], 'count': 2})
+        self.assertListEqual(self.state.get_list('primary_in_progress'), list(uuids))
+
+    def test_finish_cycle_moves_chunks(self):
+        '''Test todo chunks become the last cycle and followups get the prep list'''
+        self.state.prep_for_followup(12, self.uuids)
+        result = self.state.start_cycle(self.uuids, {})
+        result = self.state.finish_cycle(result, [])
+        self.assertEqual(result['indexed'], 10)
+        self.assertSetEqual(set(self.state.get_list('primary_last_cycle')), set(self.uuids))
+        self.assertListEqual(
+            self.state.get_list('staged_for_vis_indexer'), ['xmin:12'] + self.uuids
+        )
+        self.assertFalse(self._ids('primary_in_progress'))
+        self.assertFalse(self._ids('primary_followup_prep_list'))
+        self.state.start_cycle(self.uuids[:1], {})
+        self.assertFalse(self._ids('primary_last_cycle'))
+
+    def test_list_extend_whole_list(self):
+        '''Test a list stored whole is kept as the first chunk'''
+        self.state.put_list('staged_for_vis_indexer', ['xmin:1', 'uuid-0'])
+        self.state.list_extend('staged_for_vis_indexer', ['xmin:2'] + self.uuids[1:3])
+        self.assertEqual(self.state.get_count('staged_for_vis_indexer'), 5)
+        self.assertListEqual(
+            self.state.get_list('staged_for_vis_indexer'),
+            ['xmin:1', 'uuid-0', 'xmin:2', 'uuid-1', 'uuid-2'],
+        )
+
+
+class TestIndexerStateEmbedDependencies(TestCase):
+    '''Test the embed dependencies backfill marker'''
+    def setUp(self):
+        self.es = MockES()
+        self.state = IndexerState(self.es, 'snovault')
+
+    def test_backfill_finished_at_its_xmin(self):
+        '''Test only the cycle that started the backfill completes it'''
+        self.assertFalse(self.state.is_embed_dependencies_backfilled())
+        self.state.start_embed_dependencies_backfill(12)
+        self.state.finish_embed_dependencies_backfill(10)
+        self.assertFalse(self.state.is_embed_dependencies_backfilled())
+        self.state.finish_embed_dependencies_backfill(12)
+        self.assertTrue(self.state.is_embed_dependencies_backfilled())
+        self.state.finish_embed_dependencies_backfill(15)
+        self.assertTrue(self.state.is_embed_dependencies_backfilled())
+
+    def test_backfill_reset(self):
+        '''Test an unrecorded cycle clears the marker'''
+        self.state.start_embed_dependencies_backfill(12)
+        self.state.finish_embed_dependencies_backfill(12)
+        self.state.reset_embed_dependencies_backfill()
+        self.assertFalse(self.state.is_embed_dependencies_backfilled())
+        # No delete is sent once the marker is gone
+        with mock.patch.object(self.es, 'delete') as mock_delete:
+            self.state.reset_embed_dependencies_backfill()
+        mock_delete.assert_not_called()
+        self.state.finish_embed_dependencies_backfill(12)
+        self.assertFalse(self.state.is_embed_dependencies_backfilled())
@@ -0,0 +1,133 @@
+'''
+Test the RetryScheduler used by the indexer for background es write retries
+'''
+import time
+from unittest import (
+    TestCase,
+    mock,
+)
+
+from elasticsearch.exceptions import ConnectionError as ESConnectionError
+
+from snovault.elasticsearch.indexer import Indexer
+from snovault.elasticsearch.retry_scheduler import (
+    RetryScheduler,
+    get_retry_delay,
+)
+
+from .writerfixtures import get_update_info
+
+
+class TestRetryScheduler(TestCase):
+    '''Test Retry Scheduler'''
+    def test_retry_delay_is_jittered_and_capped(self):
+        '''Test delays grow exponentially within the jitter and the cap'''
+        for retry, delay in ((1, 10), (2, 20), (3, 40), (4, 80), (5, 80)):
+            retry_delay = get_retry_delay(retry)
+            self.assertGreaterEqual(retry_delay, delay / 2)
+            self.assertLessEqual(retry_delay, delay)
+
+    def test_schedule_does_not_block(self):
+        '''Test scheduling returns before the retry is due'''
+        try_write = mock.MagicMock(return_value=(False, None))
+        scheduler = RetryScheduler(try_write, base_delay=0.2, max_delay=0.2)
+        start_time = time.time()
+        scheduler.schedule('a', {}, get_update_info('a'), 'last_exc')
+        self.assertLess(time.time() - start_time, 0.1)
+        self.assertEqual(len(scheduler), 1)
+        results = scheduler.finish()
+        try_write.assert_called_once()
+        self.assertEqual(results[0][1], None)
+        self.assertEqual(len(scheduler), 0)
+
+    def test_error_after_final_attempt(self):
+        '''Test a write is only an error once it ran out of attempts'''
+        try_write = mock.MagicMock(return_value=(True, 'last_exc'))
+        scheduler = RetryScheduler(
+            try_write, max_attempts=3, base_delay=0.01, max_delay=0.01,
+        )
+        scheduler.schedule('a', {}, get_update_info('a'), 'first_exc')
+        results = scheduler.finish()
+        self.assertEqual(try_write.call_count, 3)
+        self.assertListEqual(
+            [call[0][3] for call in try_write.call_args_list], [1, 2, 3],
+        )
+        self.assertEqual(results[0][1], 'last_exc')
+
+    @mock.patch(
+        'snovault.elasticsearch.retry_scheduler.get_retry_delay',
+        return_value=0.01,
+    )
+    def test_scheduled_update_objects(self, _):
+        '''Test failed writes are retried after the following uuids'''
+        calls = []
+
+        def index(**kwargs):
+            calls.append(kwargs['id'])
+            if calls.count('b') == 1 and kwargs['id'] == 'b':
+                raise ESConnectionError('Fake es index exception.')
+
+        encoded_es = mock.MagicMock()
+        encoded_es.index.side_effect = index
+        request = mock.MagicMock()
+        request.embed.return_value = {'item_type': 'snowball'}
+        update_infos = Indexer.scheduled_update_objects(
+            encoded_es, request, ['a', 'b', 'c'], 5,
+        )
+        self.assertListEqual(calls, ['a', 'b', 'c', 'b'])
+        self.assertListEqual([info['uuid'] for info in update_infos], ['a', 'c', 'b'])
+        retried = update_infos[2]
+        self.assertIsNone(retried['error'])
+        self.assertListEqual(sorted(retried['es_info']['backoffs']), ['0', '1'])
+        self.assertEqual(retried['es_info']['backoffs']['1']['retry'], 1)
+
+    @mock.patch(
+        'snovault.elasticsearch.retry_scheduler.get_retry_delay',
+        return_value=0.01,
+    )
+    def test_bulk_update_objects_scheduled(self, _):
+        '''Test failed bulk items are retried from the scheduler'''
+        encoded_es = mock.MagicMock()
+        encoded_es.bulk.return_value = {
+            'errors': True,
+            'items': [
+                {'index': {'status': 201}},
+                {'index': {'status': 429, 'error': {'type': 'fake_429'}}},
+            ],
+        }
+        request = mock.MagicMock()
+        request.embed.return_value = {'item_type': 'snowball'}
+        update_infos = Indexer.bulk_update_objects(
+            encoded_es, request, ['a', 'b'], 5, 2, retry_scheduler=True,
+        )
+        encoded_es.bulk.assert_called_once()
+        encoded_es.index.assert_called_once()
+        self.assertEqual(encoded_es.index.call_args[1]['id'], 'b')
+        self.assertListEqual([info['uuid'] for info in update_infos], ['a', 'b'])
+        self.assertIsNone(update_infos[1]['error'])
+
+    def test_chunk_update_objects_records_dependencies(self):
+        '''Test a chunk's embed dependencies are written once it is indexed'''
+        encoded_es = mock.MagicMock()
+        request = mock.MagicMock()
+        request.embed.side_effect = lambda url, as_user=None: {
+            'item_type': 'snowball',
+            'uuid': url.split('/')[1],
+            'embedded_uuids': ['lab'],
+            'linked_uuids': [],
+        }
+        storage = request.registry.__getitem__.return_value.write
+        write_options = {
+            'bulk_size': 0,
+            'pipeline_size': 0,
+            'pipeline_writers': 1,
+            'retry_scheduler': False,
+            'embed_dependencies': True,
+        }
+        update_infos = Indexer.chunk_update_objects(
+            encoded_es, request, ['a', 'b'], 5, write_options,
+        )
+        self.assertEqual(len(list(update_infos)), 2)
+        storage.update_embed_dependencies.assert_called_once_with(
+            [('a', ['lab'], []), ('b', ['lab'], [])]
+        )
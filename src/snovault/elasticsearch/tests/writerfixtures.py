@@ -0,0 +1,20 @@
+'''
+Shared update_info for the indexer es writer tests
+'''
+import time
+
+
+def get_update_info(uuid):
+    '''update_info as Indexer.render_object starts it, before the es write'''
+    return {
+        'uuid': uuid,
+        'start_time': time.time(),
+        'error': None,
+        'es_info': {
+            'start_time': None,
+            'end_time': None,
+            'run_time': None,
+            'backoffs': {},
+            'item_type': None,
+        },
+    }
@@ -1,4 +1,4 @@
-from .util import quick_deepcopy
+from .util import lazy_copy
 from posixpath import join
 from pyramid.compat import (
     native_,
@@ -6,6 +6,7 @@ from pyramid.compat import (
 )
 from pyramid.httpexceptions import HTTPNotFound
 from .interfaces import CONNECTION
+from .stats import stage_timer
 import logging
 log = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ def includeme(config):
     config.add_request_method(embed, 'embed')
     config.add_request_method(lambda request: set(), '_embedded_uuids', reify=True)
     config.add_request_method(lambda request: set(), '_linked_uuids', reify=True)
+    config.add_request_method(lambda request: set(), '_rev_linked_uuids', reify=True)
     config.add_request_method(lambda request: None, '__parent__', reify=True)
 
 
@@ -50,25 +52,56 @@ def embed(request, *elements, **kw):
     """
     # Should really be more careful about what gets included instead.
     # Cache cut response time from ~800ms to ~420ms.
-    embed_cache = request.registry[CONNECTION].embed_cache
+    connection = request.registry[CONNECTION]
+    embed_cache = connection.embed_cache
     as_user = kw.get('as_user')
     path = join(*elements)
     path = unquote_bytes_to_wsgi(native_(path))
     log.debug('embed: %s', path)
-    if as_user is not None:
-        result, embedded, linked = _embed(request, path, as_user)
-    else:
-        cached = embed_cache.get(path, None)
-        if cached is None:
-            cached = _embed(request, path)
-            embed_cache[path] = cached
-        result, embedded, linked = cached
-        result = quick_deepcopy(result)
+    with stage_timer('embed', _stage_name(path)):
+        if as_user is not None:
+            result, embedded, linked, rev_linked = _embed(request, path, as_user)
+        else:
+            cached = embed_cache.get(path, None)
+            if cached is None:
+                cached = _process_embed(request, connection, path)
+                embed_cache[path] = cached
+            result, embedded, linked, rev_linked = cached
+            result = lazy_copy(result)
     request._embedded_uuids.update(embedded)
     request._linked_uuids.update(linked)
+    request._rev_linked_uuids.update(rev_linked)
     return result
 
 
+def _stage_name(path):
+    """ Subrequest view name, without the resource so timings add up """
+    view = path.partition('@@')[2].split('?', 1)[0]
+    return '@@' + view if view else '@@page'
+
+
+def _process_embed(request, connection, path):
+    """ Embed through the optional process wide cache
+
+    Cached renders are always made as the EMBED user so principals do not
+    vary.  They are shared while the tids of every embedded and linked uuid
+    are unchanged.  Renders that read rev links are not shared, a new rev
+    link does not change any tid.
+    """
+    process_cache = connection.process_embed_cache
+    if process_cache is None:
+        return _embed(request, path)
+    cached = process_cache.get(path, connection.get_tids)
+    if cached is not None:
+        return cached
+    cached = _embed(request, path)
+    result, embedded, linked, rev_linked = cached
+    if not rev_linked:
+        tids = connection.get_tids(list(embedded | linked))
+        process_cache.set(path, cached, tids)
+    return cached
+
+
 def _embed(request, path, as_user='EMBED'):
     subreq = make_subrequest(request, path)
     subreq.override_renderer = 'null_renderer'
@@ -80,7 +113,7 @@ def _embed(request, path, as_user='EMBED'):
         result = request.invoke_subrequest(subreq)
     except HTTPNotFound:
         raise KeyError(path)
-    return result, subreq._embedded_uuids, subreq._linked_uuids
+    return result, subreq._embedded_uuids, subreq._linked_uuids, subreq._rev_linked_uuids
 
 
 class NullRenderer:
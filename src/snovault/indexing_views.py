@@ -6,6 +6,7 @@ from pyramid.security import (
 from pyramid.traversal import resource_path
 from pyramid.view import view_config
 from .resources import Item
+from .stats import stage_timer
 
 
 def includeme(config):
@@ -15,7 +16,8 @@ def includeme(config):
 @view_config(context=Item, name='index-data', permission='index', request_method='GET')
 def item_index_data(context, request):
     uuid = str(context.uuid)
-    properties = context.upgrade_properties()
+    with stage_timer('upgrade', context.type_info.item_type):
+        properties = context.upgrade_properties()
     links = context.links(properties)
     unique_keys = context.unique_keys(properties)
 
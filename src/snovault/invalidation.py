@@ -13,6 +13,10 @@ from .util import simple_path_ids
 import transaction
 
 
+# Larger @@bulk edits are recorded in the session without their uuids
+MAX_EDIT_UUIDS = 10
+
+
 def includeme(config):
     config.scan(__name__)
     config.add_request_method(lambda request: defaultdict(set), '_updated_uuid_paths', reify=True)
@@ -97,7 +101,11 @@ def es_update_data(event):
 
     if login is not None and (login.startswith('mailto.') or login == 'remoteuser.TEST'):
         edits = request.session.setdefault('edits', [])
-        edits.append([xid, list(updated), list(renamed)])
+        if request.view_name == 'bulk' and len(updated) + len(renamed) > MAX_EDIT_UUIDS:
+            # Batches are too large for the session cookie, everything indexed before xid is stale
+            edits.append([xid, None, None])
+        else:
+            edits.append([xid, list(updated), list(renamed)])
         edits[:] = edits[-10:]
 
     # XXX How can we ensure consistency here but update written records
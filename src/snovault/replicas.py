@@ -0,0 +1,161 @@
+""" Route read only transactions to replica databases
+
+Set replica.urls to one or more replica database urls.  Transactions of GET
+and HEAD requests, and doomed transactions without an exported snapshot such
+as the indexer's snapshot free reads, then run on a replica.  A transaction
+routed to a replica is doomed, so it stays read only, and keeps the same
+connection throughout.  When no replica is current it runs on the primary and
+is not doomed.
+
+Replicas are used while they keep up with the primary.  Each one's
+txid_current_snapshot() xmin is checked every replica.check_interval seconds,
+and a replica is skipped while it is more than replica.max_lag xids behind the
+primary, or has not yet replayed the last write made by this process.
+
+Read your writes is only tracked per process: a write made through another
+process, or another server, may not be visible on the replica a following
+GET reads from until it is replayed, within replica.max_lag xids.
+"""
+from sqlalchemy import orm
+from sqlalchemy import event
+import itertools
+import logging
+import threading
+import time
+import transaction
+
+
+log = logging.getLogger(__name__)
+
+MAX_LAG = 1000  # xids
+CHECK_INTERVAL = 1.0  # seconds
+
+_select_snapshot_xmin = "SELECT txid_snapshot_xmin(txid_current_snapshot());"
+
+
+def includeme(config):
+    config.add_tween(
+        'snovault.replicas.read_only_tween_factory',
+        under='pyramid_tm.tm_tween_factory',
+    )
+
+
+def read_only_tween_factory(handler, registry):
+
+    def read_only_tween(request):
+        if request.method in ('GET', 'HEAD'):
+            request.tm.get().setExtendedInfo('_snovault_read_only', True)
+        return handler(request)
+
+    return read_only_tween
+
+
+def read_only_transaction():
+    ''' Doomed or GET and HEAD transactions are read only, those with a snapshot use the primary's
+    '''
+    txn = transaction.get()
+    if 'snapshot_id' in txn._extension:
+        return False
+    return txn.isDoomed() or txn._extension.get('_snovault_read_only', False)
+
+
+class ReplicaPool(object):
+    ''' Replica engines and how far each lags behind the primary
+    '''
+    def __init__(self, primary, replicas, max_lag=MAX_LAG, check_interval=CHECK_INTERVAL):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.last_write_xid = 0
+        self.primary_xmin = None
+        self.xmins = {}
+        self._checked = None
+        self._lock = threading.Lock()
+        self._next = itertools.cycle(range(len(self.replicas)))
+
+    @staticmethod
+    def _snapshot_xmin(engine):
+        with engine.connect() as connection:
+            return connection.execute(_select_snapshot_xmin).scalar()
+
+    def check(self, force=False):
+        ''' Refresh snapshot xmins, at most once per check_interval
+        '''
+        with self._lock:
+            now = time.time()
+            if not force and self._checked is not None and now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            try:
+                self.primary_xmin = self._snapshot_xmin(self.primary)
+            except Exception:
+                log.warning('Could not check primary snapshot', exc_info=True)
+                self.primary_xmin = None
+            for engine in self.replicas:
+                try:
+                    self.xmins[engine] = self._snapshot_xmin(engine)
+                except Exception:
+                    log.warning('Could not check replica %r', engine, exc_info=True)
+                    self.xmins[engine] = None
+
+    def is_current(self, engine):
+        ''' Replica is within max_lag of the primary and has this process's writes
+        '''
+        xmin = self.xmins.get(engine)
+        if xmin is None or self.primary_xmin is None:
+            return False
+        if xmin <= self.last_write_xid:
+            return False
+        return self.primary_xmin - xmin <= self.max_lag
+
+    def choose(self):
+        ''' Returns the next current replica engine, None to use the primary
+        '''
+        self.check()
+        for _ in self.replicas:
+            engine = self.replicas[next(self._next)]
+            if self.is_current(engine):
+                return engine
+        return None
+
+    def record_write(self, xid):
+        with self._lock:
+            self.last_write_xid = max(self.last_write_xid, xid)
+
+
+class RoutingSession(orm.Session):
+    ''' Session binding read only transactions to a replica
+
+    The replica is chosen once per transaction so all its queries share one
+    connection and snapshot.  Transactions bound to a replica are doomed.
+    '''
+    def __init__(self, replicas=None, **kw):
+        super(RoutingSession, self).__init__(**kw)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.replicas is not None and read_only_transaction():
+            txn = transaction.get()
+            data = txn._extension
+            if '_snovault_replica' not in data:
+                data['_snovault_replica'] = self.replicas.choose()
+            engine = data['_snovault_replica']
+            if engine is not None:
+                if not txn.isDoomed():
+                    txn.doom()
+                return engine
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def record_write(session):
+    ''' Remember the xid of writes so replicas are not read before replaying them
+    '''
+    if session.replicas is None:
+        return
+    data = transaction.get()._extension
+    if '_snovault_transaction_record' not in data:
+        return
+    xid = session.connection().execute('SELECT txid_current();').scalar()
+    session.replicas.record_write(xid)
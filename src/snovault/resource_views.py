@@ -33,7 +33,7 @@ from .resources import (
     Item,
     Root,
 )
-from .util import expand_path
+from .util import expand_paths
 
 
 def includeme(config):
@@ -191,9 +191,13 @@ def uuid_to_path(request, obj, path):
         return
     conn = request.registry[CONNECTION]
     if isinstance(value, list):
+        items = conn.get_many(value)
+        for v, item in zip(value, items):
+            if item is None:
+                raise KeyError(v)
         obj[name] = [
-            request.resource_path(conn[v])
-            for v in value
+            request.resource_path(item)
+            for item in items
         ]
     else:
         obj[name] = request.resource_path(conn[value])
@@ -242,8 +246,7 @@ def item_view_object_with_select_calculated_properties(context, request):
 def item_view_embedded(context, request):
     item_path = request.resource_path(context)
     properties = request.embed(item_path, '@@object')
-    for path in context.embedded:
-        expand_path(request, properties, path)
+    expand_paths(request, properties, context.embedded)
     return properties
 
 
@@ -262,8 +265,7 @@ def item_view_page(context, request):
 def item_view_expand(context, request):
     path = request.resource_path(context)
     properties = request.embed(path, '@@object')
-    for path in request.params.getall('expand'):
-        expand_path(request, properties, path)
+    expand_paths(request, properties, request.params.getall('expand'))
     return properties
 
 
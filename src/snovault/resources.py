@@ -7,6 +7,7 @@ from pyramid.security import (
     Allow,
     Everyone,
 )
+from pyramid.threadlocal import get_current_request
 from pyramid.traversal import resource_path
 from .calculated import (
     calculate_properties,
@@ -162,16 +163,16 @@ class AbstractCollection(Resource, Mapping):
             resource.type_info.name in resource.type_info.subtypes
 
     def get(self, name, default=None):
-        resource = self.connection.get_by_uuid(name, None)
+        # Give the storage a hint of which index to search.
+        # If this is a collection of an abstract type,
+        # the item_type will be None and we'll search all snovault indices.
+        index = getattr(self.type_info, 'item_type', None)
+        resource = self.connection.get_by_uuid(name, None, index=index)
         if resource is not None:
             if not self._allow_contained(resource):
                 return default
             return resource
         if self.unique_key is not None:
-            # Give the storage a hint of which index to search.
-            # If this is a collection of an abstract type,
-            # the item_type will be None and we'll search all snovault indices.
-            index = getattr(self.type_info, 'item_type', None)
             resource = self.connection.get_by_unique_key(
                 self.unique_key, name, index=index)
             if resource is not None:
@@ -261,6 +262,10 @@ class Item(Resource):
         }
 
     def get_rev_links(self, name):
+        # Record rev linked objects, their renders depend on other items' links
+        rev_linked = getattr(get_current_request(), '_rev_linked_uuids', None)
+        if rev_linked is not None:
+            rev_linked.add(str(self.uuid))
         types = self.registry[TYPES]
         type_name, rel = self.rev[name]
         types = types[type_name].subtypes
@@ -311,6 +316,14 @@ class Item(Resource):
     def update(self, properties, sheets=None):
         self._update(properties, sheets)
 
+    def unique_keys_and_links(self, properties):
+        unique_keys = self.unique_keys(properties)
+        for k, values in unique_keys.items():
+            if len(set(values)) != len(values):
+                msg = "Duplicate keys for %r: %r" % (k, values)
+                raise ValidationFailure('body', [], msg)
+        return unique_keys, self.links(properties)
+
     def _update(self, properties, sheets=None):
         unique_keys = None
         links = None
@@ -319,13 +332,7 @@ class Item(Resource):
                 properties = properties.copy()
                 del properties['uuid']
 
-            unique_keys = self.unique_keys(properties)
-            for k, values in unique_keys.items():
-                if len(set(values)) != len(values):
-                    msg = "Duplicate keys for %r: %r" % (k, values)
-                    raise ValidationFailure('body', [], msg)
-
-            links = self.links(properties)
+            unique_keys, links = self.unique_keys_and_links(properties)
 
         connection = self.registry[CONNECTION]
         connection.update(self.model, properties, sheets, unique_keys, links)
@@ -1,14 +1,24 @@
+import os
 import psutil
+import threading
 import time
 import pyramid.tweens
+from contextlib import (
+    contextmanager,
+    nullcontext,
+)
+from pyramid.view import view_config
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from urllib.parse import urlencode
 from .util import get_root_request
 
 
 def includeme(config):
     config.add_tween('snovault.stats.stats_tween_factory', under=pyramid.tweens.INGRESS)
+    config.add_route('_pool_stats', '/_pool_stats')
+    config.scan(__name__)
 
 
 def requests_timing_hook(prefix='requests'):
@@ -30,6 +40,72 @@ def requests_timing_hook(prefix='requests'):
     return response_hook
 
 
+def _new_stage():
+    return {
+        'count': 0,
+        'run_time': 0.0,
+        'db_count': 0,
+        'db_time': 0.0,
+        'stages': {},
+    }
+
+
+class StageTimings(object):
+    """Nested timings of the stages of a rendering.
+
+    Stages are keyed '<kind> <name>' under their parent stage, repeated
+    stages add up.  Query counts and times come from the root request stats
+    kept by the sqlalchemy hooks below, times are in seconds.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.root = _new_stage()
+        self._stack = [self.root]
+
+    @contextmanager
+    def stage(self, kind, name):
+        key = '%s %s' % (kind, name)
+        node = self._stack[-1]['stages'].get(key)
+        if node is None:
+            node = self._stack[-1]['stages'][key] = _new_stage()
+        self._stack.append(node)
+        db_count = self.stats.get('db_count', 0)
+        db_time = self.stats.get('db_time', 0)
+        start = time.time()
+        try:
+            yield node
+        finally:
+            node['count'] += 1
+            node['run_time'] += time.time() - start
+            node['db_count'] += self.stats.get('db_count', 0) - db_count
+            node['db_time'] += (self.stats.get('db_time', 0) - db_time) / 1e6
+            self._stack.pop()
+
+    def as_dict(self):
+        return self.root['stages']
+
+
+def stage_timer(kind, name):
+    """Time a stage if the root request is collecting StageTimings."""
+    request = get_root_request()
+    timings = getattr(request, '_stage_timings', None)
+    if timings is None:
+        return nullcontext()
+    return timings.stage(kind, name)
+
+
+def merge_stage_timings(into, stages):
+    """Add the stages of a StageTimings.as_dict() into another one."""
+    for key, node in stages.items():
+        total = into.get(key)
+        if total is None:
+            total = into[key] = _new_stage()
+        for name in ('count', 'run_time', 'db_count', 'db_time'):
+            total[name] += node[name]
+        merge_stage_timings(total['stages'], node['stages'])
+    return into
+
+
 # See http://www.sqlalchemy.org/trac/wiki/UsageRecipes/Profiling
 @event.listens_for(Engine, 'before_cursor_execute')
 def before_cursor_execute(
@@ -52,6 +128,139 @@ def after_cursor_execute(
     stats['db_time'] = stats.get('db_time', 0) + duration
 
 
+# Connection pools of this process by name, see instrument_pool
+POOL_STATS = {}
+
+
+class PoolStats(object):
+    """Totals for one engine's connection pool in this process.
+
+    Times are in microseconds like the request stats.  Overflow is the most
+    connections seen open beyond pool_size, invalidations include
+    connections found stale by pool_pre_ping.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.totals = {
+            'checkout_count': 0,
+            'checkout_time': 0,
+            'checkout_time_max': 0,
+            'hold_time': 0,
+            'hold_time_max': 0,
+            'connect_count': 0,
+            'invalidate_count': 0,
+            'overflow_max': 0,
+        }
+
+    def add(self, name, value):
+        with self.lock:
+            self.totals[name] += value
+            if name + '_max' in self.totals:
+                self.totals[name + '_max'] = max(self.totals[name + '_max'], value)
+
+    def maximum(self, name, value):
+        with self.lock:
+            self.totals[name] = max(self.totals[name], value)
+
+    def as_dict(self):
+        pool = self.engine.pool
+        with self.lock:
+            result = dict(self.totals)
+        result['pool'] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            result.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        return result
+
+
+def add_request_stat(name, value, maximum=False):
+    request = get_root_request()
+    if request is None:
+        return
+    stats = getattr(request, '_stats', None)
+    if stats is None:
+        return
+    if maximum:
+        stats[name] = max(stats.get(name, value), value)
+    else:
+        stats[name] = stats.get(name, 0) + value
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool timing how long checkouts wait for a connection."""
+    stats = None
+
+    def connect(self):
+        return self._timed_checkout(super(InstrumentedQueuePool, self).connect)
+
+    def unique_connection(self):
+        # Used by Engine.connect()
+        return self._timed_checkout(super(InstrumentedQueuePool, self).unique_connection)
+
+    def _timed_checkout(self, checkout):
+        start = int(time.time() * 1e6)
+        connection = checkout()
+        duration = int(time.time() * 1e6) - start
+        add_request_stat('db_checkout_count', 1)
+        add_request_stat('db_checkout_time', duration)
+        add_request_stat('db_pool_overflow', max(self.overflow(), 0), maximum=True)
+        if self.stats is not None:
+            self.stats.add('checkout_count', 1)
+            self.stats.add('checkout_time', duration)
+            self.stats.maximum('overflow_max', self.overflow())
+        return connection
+
+    def recreate(self):
+        pool = super(InstrumentedQueuePool, self).recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def instrument_pool(engine, name=None):
+    """Record pool stats of an engine, per request and per process."""
+    if name is None:
+        name = repr(engine.url)
+    stats = POOL_STATS[name] = PoolStats(engine)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checkout_begin'] = int(time.time() * 1e6)
+
+    @event.listens_for(engine, 'checkin')
+    def checkin(dbapi_connection, connection_record):
+        begin = connection_record.info.pop('checkout_begin', None)
+        if begin is None:
+            return
+        duration = int(time.time() * 1e6) - begin
+        stats.add('hold_time', duration)
+        add_request_stat('db_hold_time', duration)
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        stats.add('connect_count', 1)
+
+    @event.listens_for(engine, 'invalidate')
+    def invalidate(dbapi_connection, connection_record, exception):
+        stats.add('invalidate_count', 1)
+        add_request_stat('db_invalidate_count', 1)
+
+    return stats
+
+
+@view_config(route_name='_pool_stats', request_method='GET', permission='index')
+def pool_stats_view(request):
+    return {
+        'pid': os.getpid(),
+        'pools': {name: stats.as_dict() for name, stats in POOL_STATS.items()},
+    }
+
+
 # http://docs.pylonsproject.org/projects/pyramid/en/latest/narr/hooks.html#creating-a-tween-factory
 def stats_tween_factory(handler, registry):
     process = psutil.Process()
@@ -4,6 +4,7 @@ from sqlalchemy import (
     DDL,
     ForeignKey,
     bindparam,
+    cast,
     event,
     func,
     null,
@@ -34,6 +35,8 @@ from .interfaces import (
 from .json_renderer import json_renderer
 import boto3
 import botocore
+import csv
+import io
 import json
 import transaction
 import uuid
@@ -42,9 +45,27 @@ import uuid
 _DBSESSION = None
 
 
+# off, write keeps current_properties up to date, read also loads from it
+CURRENT_PROPERTIES_MODES = ('off', 'write', 'read')
+
+# json keeps updated and renamed in transactions.data, array in uuid[] columns
+TRANSACTION_UUIDS_MODES = ('json', 'array')
+
+
 def includeme(config):
     registry = config.registry
-    registry[STORAGE] = RDBStorage(registry[DBSESSION])
+    current_properties_mode = registry.settings.get('storage.current_properties', 'off')
+    if current_properties_mode not in CURRENT_PROPERTIES_MODES:
+        raise ValueError('Invalid storage.current_properties: %r' % current_properties_mode)
+    Resource.maintain_current_properties = current_properties_mode != 'off'
+    transaction_uuids_mode = registry.settings.get('storage.transaction_uuids', 'json')
+    if transaction_uuids_mode not in TRANSACTION_UUIDS_MODES:
+        raise ValueError('Invalid storage.transaction_uuids: %r' % transaction_uuids_mode)
+    TransactionRecord.compact_uuids = transaction_uuids_mode == 'array'
+    registry[STORAGE] = RDBStorage(
+        registry[DBSESSION],
+        read_current_properties=current_properties_mode == 'read',
+    )
     global _DBSESSION
     _DBSESSION = registry[DBSESSION]
     if registry.settings.get('blob_bucket'):
@@ -61,6 +82,22 @@ Base = declarative_base()
 
 bakery = baked.bakery()
 baked_query_resource = bakery(lambda session: session.query(Resource))
+baked_query_resources = bakery(
+    lambda session: session.query(Resource).filter(
+        Resource.rid.in_(bindparam('rids', expanding=True)),
+    )
+)
+baked_query_resource_current = bakery(
+    lambda session: session.query(Resource).options(
+        orm.lazyload(Resource.data),
+        orm.joinedload(Resource.current),
+    )
+)
+baked_query_resources_current = baked_query_resource_current + (
+    lambda query: query.filter(
+        Resource.rid.in_(bindparam('rids', expanding=True)),
+    )
+)
 baked_query_unique_key = bakery(
     lambda session: session.query(Key).options(
         orm.joinedload(Key.resource, innerjoin=True)
@@ -68,13 +105,33 @@ baked_query_unique_key = bakery(
         .joinedload(CurrentPropertySheet.propsheet, innerjoin=True),
     ).filter(Key.name == bindparam('name'), Key.value == bindparam('value'))
 )
+baked_query_unique_key_current = bakery(
+    lambda session: session.query(Key).options(
+        orm.joinedload(Key.resource, innerjoin=True)
+        .joinedload(Resource.current),
+        orm.defaultload(Key.resource).lazyload(Resource.data),
+    ).filter(Key.name == bindparam('name'), Key.value == bindparam('value'))
+)
+baked_query_rev_links = bakery(
+    lambda session: session.query(Link.target_rid, Link.source_rid).filter(
+        Link.target_rid.in_(bindparam('targets', expanding=True)),
+        Link.rel == bindparam('rel'),
+    )
+)
+baked_query_rev_links_by_type = baked_query_rev_links + (
+    lambda query: query.join(Resource, Resource.rid == Link.source_rid).filter(
+        Resource.item_type.in_(bindparam('item_types', expanding=True)),
+    )
+)
 
 
 class RDBStorage(object):
     batchsize = 1000
 
-    def __init__(self, DBSession):
+    def __init__(self, DBSession, read_current_properties=False):
         self.DBSession = DBSession
+        # Load resources from current_properties instead of joining propsheets
+        self.read_current_properties = read_current_properties
 
     @property
     def write(self):
@@ -84,29 +141,132 @@ class RDBStorage(object):
     def read(self):
         return self
 
-    def get_by_uuid(self, rid, default=None):
+    def get_by_uuid(self, rid, default=None, index=None):
         session = self.DBSession()
-        model = baked_query_resource(session).get(uuid.UUID(rid))
+        if self.read_current_properties:
+            model = baked_query_resource_current(session).get(uuid.UUID(rid))
+        else:
+            model = baked_query_resource(session).get(uuid.UUID(rid))
         if model is None:
             return default
         return model
 
+    def get_many(self, rids):
+        '''Returns dict of uuid to model, loaded with their propsheets in one query per batch'''
+        rids = list({uuid.UUID(str(rid)) for rid in rids})
+        session = self.DBSession()
+        models = {}
+        baked_query = baked_query_resources
+        if self.read_current_properties:
+            baked_query = baked_query_resources_current
+        for beg in range(0, len(rids), self.batchsize):
+            query = baked_query(session).params(
+                rids=rids[beg:beg + self.batchsize],
+            )
+            for model in query:
+                models[str(model.rid)] = model
+        return models
+
     def get_by_unique_key(self, unique_key, name, default=None, index=None):
         session = self.DBSession()
+        baked_query = baked_query_unique_key
+        if self.read_current_properties:
+            baked_query = baked_query_unique_key_current
         try:
-            key = baked_query_unique_key(session).params(name=unique_key, value=name).one()
+            key = baked_query(session).params(name=unique_key, value=name).one()
         except NoResultFound:
             return default
         else:
             return key.resource
 
+    def update_embed_dependencies(self, dependencies):
+        '''
+        Replace the reverse dependencies recorded for indexed documents
+
+        dependencies are (rid, embedded_uuids, linked_uuids) for a chunk of
+        documents.  The indexer renders in a read only snapshot, so the rows
+        are written on a separate connection in one transaction.
+        '''
+        table = EmbedDependency.__table__
+        rids = []
+        rows = []
+        for rid, embedded_uuids, linked_uuids in dependencies:
+            rids.append(str(rid))
+            rows.extend(
+                {'target': target, 'rel': 'embedded', 'source': rid}
+                for target in embedded_uuids
+            )
+            rows.extend(
+                {'target': target, 'rel': 'linked', 'source': rid}
+                for target in linked_uuids
+            )
+        if not rids:
+            return
+        connection = self.DBSession.bind.connect()
+        try:
+            with connection.begin():
+                connection.execute(table.delete().where(table.c.source.in_(rids)))
+                if rows:
+                    connection.execute(table.insert(), rows)
+        finally:
+            connection.close()
+
+    def get_embed_dependents(self, updated, renamed):
+        '''Yield rids of documents embedding updated or linking renamed uuids'''
+        session = self.DBSession()
+        connection = session.connection().execution_options(stream_results=True)
+        result = connection.execute(
+            _select_embed_dependents,
+            updated=[str(rid) for rid in updated],
+            renamed=[str(rid) for rid in renamed],
+        )
+        for source, in result:
+            yield str(source)
+
+    def get_transaction_summary(self, xmin):
+        '''Returns (count, max xid, first timestamp) of transactions since xmin'''
+        session = self.DBSession()
+        count, max_xid, first_timestamp = session.connection().execute(
+            _select_transaction_summary, xmin=xmin,
+        ).first()
+        return count, max_xid, first_timestamp
+
+    def iter_transaction_uuids(self, xmin):
+        '''Yield distinct (uuid, updated, renamed) of transactions since xmin'''
+        if TransactionRecord.compact_uuids:
+            query = _select_transaction_uuids_array
+        else:
+            query = _select_transaction_uuids_json
+        session = self.DBSession()
+        connection = session.connection().execution_options(stream_results=True)
+        result = connection.execute(query, xmin=xmin)
+        while True:
+            rows = result.fetchmany(self.batchsize)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+
     def get_rev_links(self, model, rel, *item_types):
+        rev_links = self.get_rev_links_many([model], rel, *item_types)
+        return rev_links.get(uuid.UUID(str(model.uuid)), [])
+
+    def get_rev_links_many(self, models, rel, *item_types):
+        '''Returns dict of target uuid to source uuids in one query'''
+        targets = list({uuid.UUID(str(model.uuid)) for model in models})
+        if not targets:
+            return {}
+        session = self.DBSession()
         if item_types:
-            return [
-                link.source_rid for link in model.revs
-                if link.rel == rel and link.source.item_type in item_types]
+            query = baked_query_rev_links_by_type(session).params(
+                targets=targets, rel=rel, item_types=list(item_types),
+            )
         else:
-            return [link.source_rid for link in model.revs if link.rel == rel]
+            query = baked_query_rev_links(session).params(targets=targets, rel=rel)
+        rev_links = {}
+        for target, source in query:
+            rev_links.setdefault(target, []).append(source)
+        return rev_links
 
     def __iter__(self, *item_types):
         session = self.DBSession()
@@ -120,6 +280,21 @@ class RDBStorage(object):
         for rid, in query.yield_per(self.batchsize):
             yield rid
 
+    def iter_uuid_bytes(self, *item_types):
+        '''Yield rids as 16 bytes from a server side cursor, without UUID objects'''
+        session = self.DBSession()
+        connection = session.connection().execution_options(stream_results=True)
+        result = connection.execute(
+            _select_uuid_bytes,
+            item_types=list(item_types) if item_types else None,
+        )
+        while True:
+            rows = result.fetchmany(self.batchsize)
+            if not rows:
+                break
+            for rid, in rows:
+                yield bytes(rid)
+
     def __len__(self, *item_types):
         session = self.DBSession()
         query = session.query(Resource.rid)
@@ -166,6 +341,63 @@ class RDBStorage(object):
         msg = 'Keys conflict: %r' % conflicts
         raise HTTPConflict(msg)
 
+    def bulk_create(self, rows):
+        '''
+        Insert new resources with COPY
+
+        rows are (item_type, rid, properties, unique_keys, links) tuples.  All
+        rows share the current transaction record, any uuid or unique key
+        conflict fails the whole batch.
+        '''
+        import psycopg2
+        rows = list(rows)
+        if not rows:
+            return
+        session = self.DBSession()
+        add_transaction_record(session, None, None)
+        session.flush()
+        tid = str(transaction.get()._extension['tid'])
+        connection = session.connection()
+        sids = [sid for sid, in connection.execute(_select_propsheet_sids, count=len(rows))]
+
+        resources = []
+        propsheets = []
+        current_propsheets = []
+        keys = []
+        links = []
+        for sid, (item_type, rid, properties, unique_keys, rels) in zip(sids, rows):
+            rid = str(rid)
+            value = json_renderer.dumps(properties)
+            resources.append((rid, item_type))
+            propsheets.append((sid, rid, '', value, tid))
+            current_propsheets.append((rid, '', sid))
+            keys.extend((name, v, rid) for name, values in unique_keys.items() for v in values)
+            links.extend((rid, rel, str(target)) for rel, targets in rels.items() for target in targets)
+
+        # Resources are copied first, links and current_propsheets reference them immediately
+        copies = [
+            ('resources', ('rid', 'item_type'), resources),
+            ('propsheets', ('sid', 'rid', 'name', 'properties', 'tid'), propsheets),
+            ('current_propsheets', ('rid', 'name', 'sid'), current_propsheets),
+            ('keys', ('name', 'value', 'rid'), keys),
+            ('links', ('source', 'rel', 'target'), links),
+        ]
+        if Resource.maintain_current_properties:
+            copies.append((
+                'current_properties', ('rid', 'name', 'properties', 'tid'),
+                [(rid, name, value, tid) for _, rid, name, value, tid in propsheets],
+            ))
+
+        cursor = connection.connection.cursor()
+        try:
+            for table, columns, values in copies:
+                _copy_rows(cursor, table, columns, values)
+        except psycopg2.IntegrityError as e:
+            msg = 'Bulk insert conflict: %s' % (e.diag.message_detail or e.diag.message_primary)
+            raise HTTPConflict(msg)
+        finally:
+            cursor.close()
+
     def delete_by_uuid(self, rid):
         # WARNING USE WITH CARE PERMANENTLY DELETES RESOURCES
         session = self.DBSession()
@@ -180,6 +412,9 @@ class RDBStorage(object):
                 session.delete(current_propsheet)
             # now delete the resource, keys and links(via cascade)
             session.delete(model)
+            session.query(EmbedDependency).filter(
+                EmbedDependency.source_rid == model.rid
+            ).delete(synchronize_session=False)
             sp.commit()
         except Exception as e:
             sp.rollback()
@@ -239,6 +474,19 @@ class RDBStorage(object):
         return to_add, to_remove
 
 
+def _copy_rows(cursor, table, columns, rows):
+    '''COPY rows in csv, every value quoted so empty strings are not NULL'''
+    if not rows:
+        return
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_ALL).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(
+        'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (table, ', '.join(columns)),
+        buf,
+    )
+
+
 class UUID(types.TypeDecorator):
     """Platform-independent UUID type.
 
@@ -272,6 +520,38 @@ class UUID(types.TypeDecorator):
             return uuid.UUID(value)
 
 
+# Downloads are read in chunks of this many bytes
+BLOB_CHUNK_SIZE = 1 << 18
+MAX_BLOB_SIZE = 1 << 30  # bytea values are limited to 1GB, substring to it reads the rest
+
+
+class BlobIter(object):
+    '''
+    WSGI app_iter streaming a blob from blob storage
+
+    Webob serves Range requests with app_iter_range when the response has
+    conditional_response set and a content_length.
+    '''
+    def __init__(self, blob_storage, download_meta, size, start=0, stop=None):
+        self.blob_storage = blob_storage
+        self.download_meta = download_meta
+        self.size = size
+        self.start = start
+        self.stop = size if stop is None else min(stop, size)
+        self._chunks = None
+
+    def __iter__(self):
+        self._chunks = self.blob_storage.iter_blob(self.download_meta, self.start, self.stop)
+        return self._chunks
+
+    def app_iter_range(self, start, stop):
+        return BlobIter(self.blob_storage, self.download_meta, self.size, start, stop)
+
+    def close(self):
+        if self._chunks is not None:
+            self._chunks.close()
+
+
 class RDBBlobStorage(object):
     def __init__(self, DBSession):
         self.DBSession = DBSession
@@ -294,6 +574,49 @@ class RDBBlobStorage(object):
         blob = session.query(Blob).get(blob_id)
         return blob.data
 
+    def get_blob_size(self, download_meta):
+        blob_id = download_meta['blob_id']
+        session = self.DBSession()
+        return session.query(func.octet_length(Blob.data)).filter(
+            Blob.blob_id == blob_id,
+        ).scalar()
+
+    def iter_blob(self, download_meta, start=0, stop=None, chunk_size=BLOB_CHUNK_SIZE):
+        '''
+        Yield the bytes from start to stop in chunks
+
+        Runs after the request transaction has ended, so reads on its own
+        connection.  Blobs are stored uncompressed so each chunk only reads
+        its own toast slices.  Blobs compressed before the column was set to
+        EXTERNAL (see migrate-blob-storage) would be decompressed for every
+        chunk, so their range is read in one go.
+        '''
+        # pylint: disable=too-many-arguments
+        blob_id = download_meta['blob_id']
+        connection = self.DBSession.bind.connect()
+        try:
+            with connection.begin():
+                if connection.execute(_select_blob_compressed, blob_id=blob_id).scalar():
+                    length = MAX_BLOB_SIZE if stop is None else stop - start
+                    data = connection.execute(
+                        _select_blob_chunk, blob_id=blob_id, offset=start + 1, length=length,
+                    ).scalar() or b''
+                    for beg in range(0, len(data), chunk_size):
+                        yield bytes(data[beg:beg + chunk_size])
+                    return
+                offset = start
+                while stop is None or offset < stop:
+                    length = chunk_size if stop is None else min(chunk_size, stop - offset)
+                    chunk = connection.execute(
+                        _select_blob_chunk, blob_id=blob_id, offset=offset + 1, length=length,
+                    ).scalar()
+                    if not chunk:
+                        break
+                    yield bytes(chunk)
+                    offset += len(chunk)
+        finally:
+            connection.close()
+
 
 class S3BlobStorage(object):
     def __init__(self, bucket, read_profile_name=None, store_profile_name=None):
@@ -355,6 +678,33 @@ class S3BlobStorage(object):
             Key=key
         )['Body'].read()
 
+    def get_blob_size(self, download_meta):
+        bucket_name, key = self._get_bucket_key(download_meta)
+        return self.read_conn.head_object(
+            Bucket=bucket_name,
+            Key=key
+        )['ContentLength']
+
+    def iter_blob(self, download_meta, start=0, stop=None, chunk_size=BLOB_CHUNK_SIZE):
+        '''Yield the bytes from start to stop in chunks, with a ranged get'''
+        # pylint: disable=too-many-arguments
+        if stop is not None and stop <= start:
+            return
+        bucket_name, key = self._get_bucket_key(download_meta)
+        params = {}
+        if start or stop is not None:
+            params['Range'] = 'bytes=%d-%s' % (start, '' if stop is None else stop - 1)
+        body = self.read_conn.get_object(
+            Bucket=bucket_name,
+            Key=key,
+            **params
+        )['Body']
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
 
 class JSON(types.TypeDecorator):
     """Represents an immutable structure as a json-encoded string.
@@ -414,8 +764,11 @@ class Link(Base):
         'source', UUID, ForeignKey('resources.rid'), primary_key=True)
     rel = Column(types.String, primary_key=True)
     target_rid = Column(
-        'target', UUID, ForeignKey('resources.rid'), primary_key=True,
-        index=True)  # Single column index for reverse lookup
+        'target', UUID, ForeignKey('resources.rid'), primary_key=True)
+    __table_args__ = (
+        # Reverse lookup by target and rel, also serves target alone
+        schema.Index('ix_links_target_rel', 'target', 'rel'),
+    )
 
     source = orm.relationship(
         'Resource', foreign_keys=[source_rid], backref=backref('rels', cascade='all, delete-orphan'))
@@ -423,6 +776,69 @@ class Link(Base):
         'Resource', foreign_keys=[target_rid], backref=backref('revs', cascade='all, delete-orphan'))
 
 
+class EmbedDependency(Base):
+    """ reverse dependencies of indexed documents
+
+    source embeds (rel 'embedded') or links to (rel 'linked') target.
+    Written by the indexer, the primary key leads with target for the
+    invalidation lookup.  No foreign keys, rows describe indexed documents.
+    """
+    __tablename__ = 'embed_dependencies'
+    target_rid = Column('target', UUID, primary_key=True)
+    rel = Column(types.String, primary_key=True)
+    source_rid = Column('source', UUID, primary_key=True, index=True)
+
+
+_select_uuid_bytes = text("""
+    SELECT uuid_send(rid) FROM resources
+    WHERE CAST(:item_types AS text[]) IS NULL
+    OR item_type = ANY(CAST(:item_types AS text[]));
+""")
+
+
+_select_propsheet_sids = text("""
+    SELECT nextval(pg_get_serial_sequence('propsheets', 'sid'))
+    FROM generate_series(1, :count);
+""")
+
+
+_select_transaction_summary = text("""
+    SELECT count(*), coalesce(max(xid), 0), min(timestamp)
+    FROM transactions WHERE xid >= :xmin;
+""")
+
+
+_select_transaction_uuids = """
+    SELECT CAST(uuid AS text), bool_or(NOT is_renamed), bool_or(is_renamed) FROM (
+        SELECT CAST(updated.uuid AS uuid), false AS is_renamed
+        FROM transactions, json_array_elements_text(CAST(data AS json) -> 'updated') AS updated(uuid)
+        WHERE xid >= :xmin
+        UNION ALL
+        SELECT CAST(renamed.uuid AS uuid), true
+        FROM transactions, json_array_elements_text(CAST(data AS json) -> 'renamed') AS renamed(uuid)
+        WHERE xid >= :xmin
+        %s
+    ) AS transaction_uuids (uuid, is_renamed)
+    GROUP BY uuid;
+"""
+
+_select_transaction_uuids_json = text(_select_transaction_uuids % '')
+
+_select_transaction_uuids_array = text(_select_transaction_uuids % """
+        UNION ALL
+        SELECT unnest(updated), false FROM transactions WHERE xid >= :xmin
+        UNION ALL
+        SELECT unnest(renamed), true FROM transactions WHERE xid >= :xmin
+""")
+
+
+_select_embed_dependents = text("""
+    SELECT DISTINCT source FROM embed_dependencies
+    WHERE (rel = 'embedded' AND target = ANY(CAST(:updated AS uuid[])))
+    OR (rel = 'linked' AND target = ANY(CAST(:renamed AS uuid[])));
+""")
+
+
 class PropertySheet(Base):
     '''A triple describing a resource
     '''
@@ -478,6 +894,21 @@ class CurrentPropertySheet(Base):
     }
 
 
+class CurrentProperties(Base):
+    '''Copy of the current propsheets, read without joining the history
+    '''
+    __tablename__ = 'current_properties'
+    rid = Column(UUID, ForeignKey('resources.rid', ondelete='CASCADE'),
+                 nullable=False, primary_key=True)
+    name = Column(types.String, nullable=False, primary_key=True)
+    properties = Column(JSON)
+    tid = Column(UUID,
+                 ForeignKey('transactions.tid',
+                            deferrable=True,
+                            initially='DEFERRED'),
+                 nullable=False)
+
+
 class Resource(Base):
     '''Resources are described by multiple propsheets
     '''
@@ -489,6 +920,12 @@ class Resource(Base):
         innerjoin=True, lazy='joined',
         collection_class=collections.attribute_mapped_collection('name'),
     )
+    current = orm.relationship(
+        'CurrentProperties', cascade='all, delete-orphan', passive_deletes=True,
+        collection_class=collections.attribute_mapped_collection('name'),
+    )
+    # Set from storage.current_properties
+    maintain_current_properties = False
 
     def __init__(self, item_type, data=None, rid=None):
         if rid is None:
@@ -498,7 +935,17 @@ class Resource(Base):
             for k, v in data.items():
                 self.propsheets[k] = v
 
+    def _current_properties(self):
+        '''current_properties rows when they were loaded in place of propsheets'''
+        unloaded = orm.attributes.instance_state(self).unloaded
+        if 'data' in unloaded and 'current' not in unloaded and self.current:
+            return self.current
+        return None
+
     def __getitem__(self, key):
+        current = self._current_properties()
+        if current is not None:
+            return current[key].properties
         return self.data[key].propsheet.properties
 
     def __setitem__(self, key, value):
@@ -507,8 +954,17 @@ class Resource(Base):
             self.data[key] = current = CurrentPropertySheet(name=key, rid=self.rid)
         propsheet = PropertySheet(name=key, properties=value, rid=self.rid)
         current.propsheet = propsheet
+        if self.maintain_current_properties:
+            properties = self.current.get(key, None)
+            if properties is None:
+                self.current[key] = properties = CurrentProperties(name=key, rid=self.rid)
+            properties.properties = value
+            properties.tid = None  # Set to the transaction tid on flush, like the propsheet
 
     def keys(self):
+        current = self._current_properties()
+        if current is not None:
+            return current.keys()
         return self.data.keys()
 
     def items(self):
@@ -535,7 +991,11 @@ class Resource(Base):
 
     @property
     def tid(self):
-        tids = (str(self.data[k].propsheet.tid) for k in self.data.keys())
+        current = self._current_properties()
+        if current is not None:
+            tids = (str(properties.tid) for properties in current.values())
+        else:
+            tids = (str(self.data[k].propsheet.tid) for k in self.data.keys())
         return ','.join(sorted(set(tids)))
 
     def invalidated(self):
@@ -553,6 +1013,28 @@ class Blob(Base):
     data = Column(types.LargeBinary)
 
 
+_select_blob_chunk = orm.Query(
+    func.substring(Blob.data, bindparam('offset'), bindparam('length')),
+).filter(Blob.blob_id == bindparam('blob_id')).statement
+
+
+_select_blob_compressed = orm.Query(
+    func.pg_column_size(Blob.data) < func.octet_length(Blob.data),
+).filter(Blob.blob_id == bindparam('blob_id')).statement
+
+
+# Stored uncompressed so ranges are read without detoasting the whole blob,
+# migrate-blob-storage sets existing databases
+blob_storage_ddl = DDL("""
+    ALTER TABLE %(table)s ALTER COLUMN data SET STORAGE EXTERNAL;
+""")
+
+event.listen(
+    Blob.__table__, 'after_create',
+    blob_storage_ddl.execute_if(dialect='postgresql'),
+)
+
+
 class TransactionRecord(Base):
     __tablename__ = 'transactions'
     order = Column(types.Integer, autoincrement=True, primary_key=True)
@@ -562,6 +1044,11 @@ class TransactionRecord(Base):
         types.DateTime(timezone=True), nullable=False, server_default=func.now())
     # A server_default is necessary for the notify_ddl overwrite to work
     xid = Column(types.BigInteger, nullable=True, server_default=null())
+    # Deferred so databases without the columns can be read in json mode
+    updated = orm.deferred(Column(postgresql.ARRAY(postgresql.UUID), nullable=True))
+    renamed = orm.deferred(Column(postgresql.ARRAY(postgresql.UUID), nullable=True))
+    # Set from storage.transaction_uuids
+    compact_uuids = False
     __mapper_args__ = {
         'eager_defaults': True,
     }
@@ -636,6 +1123,10 @@ def set_tid(mapper, connection, target):
     target.tid = data['tid']
 
 
+event.listen(CurrentProperties, 'before_insert', set_tid)
+event.listen(CurrentProperties, 'before_update', set_tid)
+
+
 def register(DBSession):
     event.listen(DBSession, 'before_flush', add_transaction_record)
     event.listen(DBSession, 'before_commit', record_transaction_data)
@@ -676,7 +1167,13 @@ def record_transaction_data(session):
     if userid:
         data['userid'] = userid
 
-    record.data = {k: v for k, v in data.items() if not k.startswith('_')}
+    record_data = {k: v for k, v in data.items() if not k.startswith('_')}
+    if record.compact_uuids:
+        for name in ('updated', 'renamed'):
+            uuids = record_data.pop(name, None)
+            if uuids is not None:
+                setattr(record, name, cast(uuids, postgresql.ARRAY(postgresql.UUID)))
+    record.data = record_data
     session.add(record)
 
 
@@ -104,6 +104,20 @@ def test_download_create_json(testapp, testing_download_json):
     assert test_res.body == b64decode(FILLED_JSON.split(',', 1)[1])
 
 
+def test_download_range(testapp, testing_download):
+    data = b64decode(RED_DOT.split(',', 1)[1])
+    url = testing_download + '/@@download/attachment/red-dot.png'
+    res = testapp.get(url)
+    assert res.headers['Accept-Ranges'] == 'bytes'
+    assert res.content_length == len(data)
+    res = testapp.get(url, headers={'Range': 'bytes=0-9'}, status=206)
+    assert res.body == data[:10]
+    assert res.headers['Content-Range'] == 'bytes 0-9/%d' % len(data)
+    res = testapp.get(url, headers={'Range': 'bytes=-5'}, status=206)
+    assert res.body == data[-5:]
+    testapp.get(url, headers={'Range': 'bytes=%d-' % (len(data) + 10)}, status=416)
+
+
 def test_download_update(testapp, testing_download):
     from base64 import b64decode
     item = {
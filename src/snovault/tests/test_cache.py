@@ -0,0 +1,32 @@
+def test_tid_lru_cache_hit():
+    from unittest import mock
+    from snovault.cache import TidLRUCache
+    tids = {'a': 't1', 'b': 't2'}
+    get_tids = mock.Mock(side_effect=lambda uuids: {uuid: tids.get(uuid) for uuid in uuids})
+    cache = TidLRUCache(10)
+    cache.set('/a/@@object', 'render', {'a': 't1', 'b': 't2'})
+    assert cache.get('/a/@@object', get_tids) == 'render'
+    get_tids.assert_called_once()
+    assert sorted(get_tids.call_args[0][0]) == ['a', 'b']
+    assert cache.get('/b/@@object', get_tids) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_tid_lru_cache_invalidated_by_tid():
+    from snovault.cache import TidLRUCache
+    tids = {'a': 't1', 'b': 't2'}
+    cache = TidLRUCache(10)
+    cache.set('/a/@@object', 'render', dict(tids))
+    tids['b'] = 't3'
+    assert cache.get('/a/@@object', lambda uuids: {uuid: tids.get(uuid) for uuid in uuids}) is None
+    assert cache.invalidations == 1
+    assert len(cache) == 0
+
+
+def test_tid_lru_cache_capacity():
+    from snovault.cache import TidLRUCache
+    cache = TidLRUCache(4, threshold=.5)
+    for n in range(20):
+        cache.set(n, n, {})
+    assert len(cache) <= 6
+    assert cache.get(19, lambda uuids: {}) == 19
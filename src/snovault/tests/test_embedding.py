@@ -52,6 +52,36 @@ def test_embedded_uuids_expand_target(content, dummy_request, threadlocals):
     assert dummy_request._embedded_uuids == {sources[0]['uuid'], targets[0]['uuid']}
 
 
+def test_get_many(content, connection, threadlocals):
+    uuids = [target['uuid'] for target in targets]
+    items = connection.get_many(uuids + ['not-a-uuid', uuids[0]], default='missing')
+    assert [str(item.uuid) for item in items[:2]] == uuids
+    assert items[2] == 'missing'
+    assert items[3] is items[0]
+    assert connection.item_cache.get(uuids[1]) is items[1]
+
+
+def test_get_tids(content, connection, threadlocals):
+    uuids = [target['uuid'] for target in targets]
+    missing = '00000000-0000-0000-0000-000000000000'
+    tids = connection.get_tids(uuids + [missing])
+    assert tids == dict(
+        {uuid: connection.get_by_uuid(uuid).tid for uuid in uuids},
+        **{missing: None}
+    )
+
+
+def test_all_uuid_array(content, registry, threadlocals):
+    from snovault.elasticsearch.indexer_state import (
+        all_uuid_array,
+        all_uuids,
+    )
+    assert list(all_uuid_array(registry)) == list(all_uuids(registry))
+    types = ['testing_link_target']
+    assert list(all_uuid_array(registry, types)) == list(all_uuids(registry, types))
+    assert sorted(all_uuid_array(registry, types)) == sorted(target['uuid'] for target in targets)
+
+
 def test_updated_source(content, testapp):
     url = '/testing-link-sources/' + sources[0]['uuid']
     res = testapp.patch_json(url, {})
@@ -68,3 +98,28 @@ def test_updated_target(content, testapp):
     url = '/testing-link-targets/' + targets[0]['uuid']
     res = testapp.patch_json(url, {})
     assert set(res.headers['X-Updated'].split(',')) == {targets[0]['uuid']}
+
+
+def test_es_update_data_session_edits():
+    import transaction
+    import uuid
+    from unittest import mock
+    from pyramid import testing
+    from snovault.invalidation import es_update_data
+    config = testing.setUp()
+    config.testing_securitypolicy(userid='remoteuser.TEST')
+    uuids = [str(uuid.uuid4()) for _ in range(20)]
+    try:
+        txn = transaction.begin()
+        txn._extension['_snovault_transaction_record'] = mock.Mock(xid=5)
+        request = testing.DummyRequest(view_name='')
+        request._updated_uuid_paths = {u: {'/items/%s/' % u} for u in uuids}
+        es_update_data({'request': request})
+        assert request.session['edits'] == [[5, uuids, []]]
+
+        request.view_name = 'bulk'
+        es_update_data({'request': request})
+        assert request.session['edits'][-1] == [5, None, None]
+    finally:
+        transaction.abort()
+        testing.tearDown()
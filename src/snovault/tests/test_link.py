@@ -53,3 +53,40 @@ def test_links_quoted_ids(posted_targets_and_sources, testapp, session):
     target = res.json
     source = {'name': 'C', 'target': target['@id']}
     testapp.post_json('/testing-link-sources/', source, status=201)
+
+
+def test_links_bulk_add(targets, sources, testapp, session):
+    from snovault.storage import (
+        Key,
+        Link,
+    )
+    res = testapp.post_json('/testing-link-targets/@@bulk', {'@graph': targets}, status=201)
+    assert res.json['@graph'] == [target['uuid'] for target in targets]
+    assert set(res.headers['X-Updated'].split(',')) == {target['uuid'] for target in targets}
+    res = testapp.post_json('/testing-link-sources/@@bulk', {'@graph': sources}, status=201)
+    # New sources rev_link their targets, which need reindexing too
+    assert set(res.headers['X-Updated'].split(',')) == {
+        item['uuid'] for item in targets[:2] + sources
+    }
+
+    links = sorted([
+        (str(link.source_rid), link.rel, str(link.target_rid))
+        for link in session.query(Link).all()
+    ])
+    expected = sorted([
+        (sources[0]['uuid'], u'target', targets[0]['uuid']),
+        (sources[1]['uuid'], u'target', targets[1]['uuid']),
+    ])
+    assert links == expected
+    assert session.query(Key).get(('testing_link_target:name', 'quote:name')) is not None
+
+    res = testapp.get('/testing-link-targets/%s/?frame=object' % targets[0]['name'])
+    assert res.json['reverse'] == ['/testing-link-sources/%s/' % sources[0]['uuid']]
+
+    res = testapp.post_json('/testing-link-targets/@@bulk', {'@graph': targets[:1]}, status=409)
+
+
+def test_links_bulk_add_validation(targets, testapp):
+    items = [{'name': 'A', 'target': 'one'}, {'name': 'B'}]
+    res = testapp.post_json('/testing-link-sources/@@bulk', {'@graph': items}, status=422)
+    assert [error['name'] for error in res.json['errors']] == [['@graph', 0, 'target'], ['@graph', 1]]
@@ -0,0 +1,99 @@
+import pytest
+
+
+def test_replica_pool_skips_lagging_replicas(monkeypatch):
+    from snovault.replicas import ReplicaPool
+    xmins = {'primary': 5000, 'one': 3000, 'two': 4500, 'three': None}
+
+    def snapshot_xmin(engine):
+        if xmins[engine] is None:
+            raise Exception('down')
+        return xmins[engine]
+
+    monkeypatch.setattr(ReplicaPool, '_snapshot_xmin', staticmethod(snapshot_xmin))
+    pool = ReplicaPool('primary', ['one', 'two', 'three'], max_lag=1000)
+    assert [pool.choose() for _ in range(3)] == ['two', 'two', 'two']
+    pool.record_write(4600)
+    assert pool.choose() is None
+    xmins['two'] = 4700
+    xmins['one'] = 4800
+    pool.check(force=True)
+    assert {pool.choose() for _ in range(4)} == {'one', 'two'}
+
+
+def test_routing_session_binds_read_only_transactions():
+    import transaction
+    from unittest import mock
+    from sqlalchemy import create_engine
+    from snovault.replicas import RoutingSession
+    primary = create_engine('sqlite://')
+    replica = create_engine('sqlite://')
+    replicas = mock.Mock()
+    replicas.choose.return_value = replica
+    session = RoutingSession(bind=primary, replicas=replicas)
+    try:
+        transaction.begin()
+        assert session.get_bind() is primary
+        transaction.abort()
+
+        txn = transaction.begin()
+        txn.doom()
+        assert session.get_bind() is replica
+        assert session.get_bind() is replica
+        assert replicas.choose.call_count == 1
+        transaction.abort()
+
+        txn = transaction.begin()
+        txn.doom()
+        txn.setExtendedInfo('snapshot_id', '00000003-1')
+        assert session.get_bind() is primary
+    finally:
+        transaction.abort()
+
+
+def test_routing_session_dooms_only_replica_transactions():
+    import transaction
+    from unittest import mock
+    from sqlalchemy import create_engine
+    from snovault.replicas import RoutingSession
+    primary = create_engine('sqlite://')
+    replica = create_engine('sqlite://')
+    replicas = mock.Mock()
+    session = RoutingSession(bind=primary, replicas=replicas)
+    try:
+        replicas.choose.return_value = None
+        txn = transaction.begin()
+        txn.setExtendedInfo('_snovault_read_only', True)
+        assert session.get_bind() is primary
+        assert not txn.isDoomed()
+        transaction.abort()
+
+        replicas.choose.return_value = replica
+        txn = transaction.begin()
+        txn.setExtendedInfo('_snovault_read_only', True)
+        assert session.get_bind() is replica
+        assert txn.isDoomed()
+    finally:
+        transaction.abort()
+
+
+def test_read_only_tween_marks_get_requests():
+    import transaction
+    from pyramid.testing import DummyRequest
+    from snovault.replicas import (
+        read_only_transaction,
+        read_only_tween_factory,
+    )
+    seen = []
+    tween = read_only_tween_factory(lambda request: seen.append(read_only_transaction()), None)
+    try:
+        for method in ('GET', 'POST'):
+            txn = transaction.begin()
+            request = DummyRequest(method=method)
+            request.tm = transaction.manager
+            tween(request)
+            assert not txn.isDoomed()
+            transaction.abort()
+    finally:
+        transaction.abort()
+    assert seen == [True, False]
@@ -0,0 +1,115 @@
+import pytest
+
+
+@pytest.fixture
+def search_cache(dummy_request, mocker, monkeypatch):
+    from snovault.elasticsearch.searches.caches import IndexGeneration
+    from snovault.elasticsearch.searches.caches import SearchResponseCache
+    from snovault.elasticsearch.searches.interfaces import SEARCH_CACHE
+    es = mocker.Mock()
+    es.get.return_value = {'_version': 1}
+    es.indices.get_settings.return_value = {
+        'snovault': {'settings': {'index': {'uuid': 'a'}}},
+    }
+    cache = SearchResponseCache(10, IndexGeneration(es, 'snovault', check_interval=0))
+    monkeypatch.setitem(dummy_request.registry, SEARCH_CACHE, cache)
+    return cache
+
+
+def test_searches_caches_index_generation_check_interval(mocker):
+    from snovault.elasticsearch.searches.caches import IndexGeneration
+    es = mocker.Mock()
+    es.get.return_value = {'_version': 3}
+    es.indices.get_settings.return_value = {
+        'snovault': {'settings': {'index': {'uuid': 'b'}}},
+        'snowball': {'settings': {'index': {'uuid': 'a'}}},
+    }
+    generation = IndexGeneration(es, 'snovault', check_interval=60)
+    assert generation.get() == (3, ('a', 'b'))
+    es.get.return_value = {'_version': 4}
+    assert generation.get() == (3, ('a', 'b'))
+    assert es.get.call_count == 1
+    generation.check_interval = 0
+    assert generation.get() == (4, ('a', 'b'))
+    # Recreated indices restart the meta document version
+    es.get.return_value = {'_version': 3}
+    es.indices.get_settings.return_value['snowball']['settings']['index']['uuid'] = 'c'
+    assert generation.get() == (3, ('b', 'c'))
+    es.get.side_effect = Exception('down')
+    assert generation.get() is None
+
+
+def test_searches_caches_cached_search_response(dummy_request, search_cache, threadlocals):
+    from snovault.elasticsearch.searches.caches import cached_search_response
+    calls = []
+
+    @cached_search_response
+    def dummy_view(context, request):
+        calls.append(request.path_qs)
+        return {'@id': request.path_qs, 'total': len(calls)}
+
+    dummy_request.environ['QUERY_STRING'] = 'type=Snowball&status=released'
+    assert dummy_view(None, dummy_request) == {
+        '@id': '/dummy?type=Snowball&status=released', 'total': 1
+    }
+    dummy_request.environ['QUERY_STRING'] = 'status=released&type=Snowball'
+    assert dummy_view(None, dummy_request) == {
+        '@id': '/dummy?status=released&type=Snowball', 'total': 1
+    }
+    assert search_cache.hits == 1
+    assert search_cache.misses == 1
+    assert dummy_request._stats['search_cache_hit'] == 1
+    dummy_request.environ['QUERY_STRING'] = 'type=Snowball'
+    assert dummy_view(None, dummy_request)['total'] == 2
+    search_cache.generation.es.get.return_value = {'_version': 2}
+    dummy_request.environ['QUERY_STRING'] = 'type=Snowball&status=released'
+    assert dummy_view(None, dummy_request)['total'] == 3
+    assert search_cache.as_dict()['size'] == 3
+
+
+def test_searches_caches_cached_search_response_param_order(dummy_request, search_cache, threadlocals):
+    from snovault.elasticsearch.searches.caches import cached_search_response
+    calls = []
+
+    @cached_search_response
+    def dummy_view(context, request):
+        calls.append(request.path_qs)
+        return {'sort': request.params.getall('sort'), 'total': len(calls)}
+
+    dummy_request.environ['QUERY_STRING'] = 'type=Snowball&sort=a&sort=b'
+    assert dummy_view(None, dummy_request) == {'sort': ['a', 'b'], 'total': 1}
+    dummy_request.environ['QUERY_STRING'] = 'sort=b&type=Snowball&sort=a'
+    assert dummy_view(None, dummy_request) == {'sort': ['b', 'a'], 'total': 2}
+    dummy_request.environ['QUERY_STRING'] = 'sort=a&sort=b&type=Snowball'
+    assert dummy_view(None, dummy_request) == {'sort': ['a', 'b'], 'total': 1}
+    assert len(search_cache) == 2
+    assert (search_cache.hits, search_cache.misses) == (1, 2)
+
+
+def test_searches_caches_cached_search_response_copies(dummy_request, search_cache, threadlocals):
+    from snovault.elasticsearch.searches.caches import cached_search_response
+
+    @cached_search_response
+    def dummy_view(context, request):
+        return {'@graph': [{'accession': 'SNOFL000LSQ'}], 'facets': []}
+
+    dummy_view(None, dummy_request)['@graph'][0]['accession'] = 'changed'
+    result = dummy_view(None, dummy_request)
+    result['facets'].append({'field': 'type'})
+    assert dummy_view(None, dummy_request) == {
+        '@graph': [{'accession': 'SNOFL000LSQ'}], 'facets': []
+    }
+    assert search_cache.hits == 2
+
+
+def test_searches_caches_streamed_responses_not_cached(dummy_request, search_cache):
+    from pyramid.response import Response
+    from snovault.elasticsearch.searches.caches import cached_search_response
+
+    @cached_search_response
+    def dummy_view(context, request):
+        return Response()
+
+    dummy_view(None, dummy_request)
+    dummy_view(None, dummy_request)
+    assert len(search_cache) == 0
@@ -1829,7 +1829,55 @@ def test_searches_mixins_hits_to_graph_mixin_scan(
     BasicSearchQueryFactoryWithFacets._limit_is_all.return_value = True
     scan = basic_query_response_with_facets._scan()
     assert isinstance(scan, GeneratorType)
-    assert scan.__name__ == 'scan'
+    assert scan.__name__ == '_search_after'
+
+
+def test_searches_mixins_hits_to_graph_mixin_search_after(
+        basic_query_response_with_facets,
+        raw_response,
+        mocker
+):
+    from snovault.elasticsearch.searches.queries import BasicSearchQueryFactoryWithFacets
+    mocker.patch.object(BasicSearchQueryFactoryWithFacets, '_get_search_after_page_size')
+    BasicSearchQueryFactoryWithFacets._get_search_after_page_size.return_value = 2
+    page = [
+        dict(hit, sort=['2019-01-0{}'.format(i), hit['_id']])
+        for i, hit in enumerate(raw_response['hits']['hits'])
+    ]
+    es = mocker.Mock()
+    es.search.side_effect = [{'hits': {'hits': page}}, {'hits': {'hits': page[:1]}}]
+    search = basic_query_response_with_facets.results._search
+    search._using = es
+    r = list(basic_query_response_with_facets._search_after())
+    assert len(r) == 3
+    assert r[0].to_dict() == page[0]['_source']
+    assert es.search.call_count == 2
+    first, second = [kwargs for args, kwargs in es.search.call_args_list]
+    assert first['preference'] == second['preference']
+    body = second['body']
+    assert 'aggs' not in body
+    assert body['size'] == 2
+    assert body['sort'] == ['_score', {'uuid': {'order': 'asc'}}]
+    assert body['search_after'] == page[-1]['sort']
+
+
+def test_searches_mixins_hits_to_graph_mixin_scan_sources(
+        basic_query_response_with_facets,
+        raw_response,
+        mocker
+):
+    from snovault.elasticsearch.searches.queries import BasicSearchQueryFactoryWithFacets
+    from snovault.elasticsearch.searches.responses import BasicQueryResponseWithFacets
+    mocker.patch.object(BasicSearchQueryFactoryWithFacets, '_limit_is_all')
+    mocker.patch.object(BasicSearchQueryFactoryWithFacets, '_get_limit_value_as_int')
+    mocker.patch.object(BasicQueryResponseWithFacets, '_search_after_hits')
+    BasicSearchQueryFactoryWithFacets._limit_is_all.return_value = False
+    BasicSearchQueryFactoryWithFacets._get_limit_value_as_int.return_value = 1
+    BasicQueryResponseWithFacets._search_after_hits.return_value = (
+        x for x in raw_response['hits']['hits']
+    )
+    r = list(basic_query_response_with_facets._scan_sources())
+    assert r == [raw_response['hits']['hits'][0]['_source']]
 
 
 def test_searches_mixins_hits_to_graph_mixin_get_results(
@@ -1849,7 +1897,7 @@ def test_searches_mixins_hits_to_graph_mixin_get_results(
     from types import GeneratorType
     res = basic_query_response_with_facets._get_results()
     assert isinstance(res, GeneratorType)
-    assert res.__name__ == 'scan'
+    assert res.__name__ == '_search_after'
     BasicSearchQueryFactoryWithFacets._limit_is_all.return_value = False
     res = basic_query_response_with_facets._get_results()
     assert isinstance(res, GeneratorType)
@@ -1876,6 +1924,15 @@ def test_searches_mixins_hits_to_graph_mixin_unlayer(basic_query_response_with_f
             }
         }
     }
+    assert list(r) == ['@type', 'accession', 'audit']
+    hit_dict = {
+        'embedded': {
+            '@type': 'Experiment',
+            'accession': 'ENCFF123ABC',
+        }
+    }
+    r = basic_query_response_with_facets._unlayer(hit_dict)
+    assert list(r) == ['@type', 'accession']
 
 
 def test_searches_mixins_hits_to_graph_mixin_to_graph(
@@ -1893,25 +1950,31 @@ def test_searches_mixins_hits_to_graph_mixin_to_graph_scan_with_limit(
         mocker
 ):
     from snovault.elasticsearch.searches.queries import BasicSearchQueryFactoryWithFacets
-    from elasticsearch_dsl.search import Search
+    from snovault.elasticsearch.searches.responses import BasicQueryResponseWithFacets
     mocker.patch.object(BasicSearchQueryFactoryWithFacets, '_should_scan_over_results')
     mocker.patch.object(BasicSearchQueryFactoryWithFacets, '_limit_is_all')
     mocker.patch.object(BasicSearchQueryFactoryWithFacets, '_get_limit_value_as_int')
-    mocker.patch.object(Search, 'scan')
+    mocker.patch.object(BasicQueryResponseWithFacets, '_search_after_hits')
     BasicSearchQueryFactoryWithFacets._should_scan_over_results.return_value = False
-    Search.scan.return_value = (x for x in basic_query_response_with_facets.results)
+    BasicQueryResponseWithFacets._search_after_hits.return_value = (
+        x for x in raw_response['hits']['hits']
+    )
     r = list(basic_query_response_with_facets.to_graph())
     assert len(r) == 2
     BasicSearchQueryFactoryWithFacets._should_scan_over_results.return_value = True
     BasicSearchQueryFactoryWithFacets._limit_is_all.return_value = False
     BasicSearchQueryFactoryWithFacets._get_limit_value_as_int.return_value = 1
-    Search.scan.return_value = (x for x in basic_query_response_with_facets.results)
+    BasicQueryResponseWithFacets._search_after_hits.return_value = (
+        x for x in raw_response['hits']['hits']
+    )
     r = list(basic_query_response_with_facets.to_graph())
     assert len(r) == 1
     BasicSearchQueryFactoryWithFacets._should_scan_over_results.return_value = True
     BasicSearchQueryFactoryWithFacets._limit_is_all.return_value = True
     BasicSearchQueryFactoryWithFacets._get_limit_value_as_int.return_value = 1
-    Search.scan.return_value = (x for x in basic_query_response_with_facets.results)
+    BasicQueryResponseWithFacets._search_after_hits.return_value = (
+        x for x in raw_response['hits']['hits']
+    )
     r = list(basic_query_response_with_facets.to_graph())
     assert len(r) == 2
 
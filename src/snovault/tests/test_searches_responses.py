@@ -321,7 +321,7 @@ def test_searches_responses_streamed_response__iter__():
     from snovault.elasticsearch.searches.responses import FieldedResponse
     from snovault.elasticsearch.searches.responses import StreamedResponse
     fr = FieldedResponse()
-    sr = StreamedResponse(fr)
+    sr = StreamedResponse(fr, chunk_size=1)
     fr.response = {}
     assert list(sr) == [b'{', b'}']
     fr.response = {'a': 1}
@@ -364,6 +364,18 @@ def test_searches_responses_streamed_response__iter__():
     ]
 
 
+def test_searches_responses_streamed_response__iter__chunks():
+    from snovault.elasticsearch.searches.responses import FieldedResponse
+    from snovault.elasticsearch.searches.responses import StreamedResponse
+    fr = FieldedResponse()
+    sr = StreamedResponse(fr)
+    fr.response = {'a': 1, 'b': (x for x in [1, 2, 3])}
+    assert list(sr) == [b'{"a":1,"b":[1,2,3]}']
+    sr = StreamedResponse(fr, chunk_size=5)
+    fr.response = {'a': 1, 'b': (x for x in [1, 2, 3])}
+    assert list(sr) == [b'{"a":', b'1,"b"', b':[1,2', b',3]}']
+
+
 def test_searches_responses_streamed_response_make_streamed_response():
     from snovault.elasticsearch.searches.responses import FieldedResponse
     from snovault.elasticsearch.searches.responses import StreamedResponse
@@ -0,0 +1,69 @@
+def test_stage_timings_nests_stages_and_counts_queries():
+    from snovault.stats import StageTimings
+    stats = {'db_count': 2, 'db_time': 100}
+    timings = StageTimings(stats)
+    with timings.stage('embed', '@@index-data'):
+        for _ in range(2):
+            with timings.stage('calculated', 'title'):
+                stats['db_count'] += 1
+                stats['db_time'] += 500000
+    stages = timings.as_dict()
+    index_data = stages['embed @@index-data']
+    assert index_data['count'] == 1
+    assert index_data['db_count'] == 2
+    assert index_data['db_time'] == 1.0
+    title = index_data['stages']['calculated title']
+    assert title['count'] == 2
+    assert title['db_count'] == 2
+    assert title['stages'] == {}
+
+
+def test_stage_timer_without_timings():
+    from snovault.stats import stage_timer
+    with stage_timer('audit', 'checker'):
+        pass
+
+
+def test_merge_stage_timings():
+    from snovault.stats import StageTimings, merge_stage_timings
+    total = {}
+    for _ in range(3):
+        timings = StageTimings({})
+        with timings.stage('embed', '@@object'):
+            with timings.stage('calculated', 'title'):
+                pass
+        merge_stage_timings(total, timings.as_dict())
+    assert total['embed @@object']['count'] == 3
+    assert total['embed @@object']['stages']['calculated title']['count'] == 3
+
+
+def test_instrumented_pool_records_checkouts():
+    from sqlalchemy import create_engine
+    from snovault.stats import (
+        POOL_STATS,
+        InstrumentedQueuePool,
+        instrument_pool,
+        pool_stats_view,
+    )
+    engine = create_engine('sqlite://', poolclass=InstrumentedQueuePool, pool_size=1)
+    stats = instrument_pool(engine, 'test')
+    try:
+        for _ in range(2):
+            with engine.connect() as connection:
+                connection.execute('SELECT 1')
+        connection = engine.connect()
+        connection.invalidate()
+        connection.close()
+        engine.dispose()
+        with engine.connect() as connection:
+            connection.execute('SELECT 1')
+        totals = pool_stats_view(None)['pools']['test']
+        assert totals['checkout_count'] == 4
+        assert totals['connect_count'] == 2
+        assert totals['invalidate_count'] == 1
+        assert totals['hold_time'] >= totals['hold_time_max'] > 0
+        assert totals['pool'] == 'InstrumentedQueuePool'
+        assert totals['checked_out'] == 0
+        assert engine.pool.stats is stats
+    finally:
+        del POOL_STATS['test']
@@ -223,6 +223,191 @@ def test_keys(session):
         session.flush()
 
 
+def test_embed_dependencies(session, DBSession):
+    import uuid
+    from snovault.storage import (
+        EmbedDependency,
+        RDBStorage,
+    )
+    storage = RDBStorage(DBSession)
+    lab, award, user, other = (str(uuid.uuid4()) for _ in range(4))
+    snowball = str(uuid.uuid4())
+    snowflake = str(uuid.uuid4())
+    storage.update_embed_dependencies([
+        (snowball, [lab, award], [lab, user]),
+        (snowflake, [lab, snowball], [snowball]),
+    ])
+    assert session.query(EmbedDependency).count() == 7
+    assert set(storage.get_embed_dependents([lab], [])) == {snowball, snowflake}
+    assert set(storage.get_embed_dependents([award], [])) == {snowball}
+    assert set(storage.get_embed_dependents([user], [])) == set()
+    assert set(storage.get_embed_dependents([], [user])) == {snowball}
+    assert set(storage.get_embed_dependents([other], [other])) == set()
+    # Rerendering replaces the previous dependencies
+    storage.update_embed_dependencies([(snowball, [award], [])])
+    assert set(storage.get_embed_dependents([lab], [lab])) == {snowflake}
+    assert session.query(EmbedDependency).count() == 4
+    storage.update_embed_dependencies([])
+    assert session.query(EmbedDependency).count() == 4
+
+
+def test_get_rev_links(session, DBSession):
+    from snovault.storage import (
+        Link,
+        RDBStorage,
+        Resource,
+    )
+    storage = RDBStorage(DBSession)
+    lab = Resource('lab', {'': {}})
+    award = Resource('award', {'': {}})
+    sources = [
+        Resource('snowball', {'': {}}),
+        Resource('snowball', {'': {}}),
+        Resource('snowflake', {'': {}}),
+    ]
+    session.add_all([lab, award] + sources)
+    session.flush()
+    for source in sources:
+        session.add(Link(source_rid=source.rid, rel='lab', target_rid=lab.rid))
+    session.add(Link(source_rid=sources[0].rid, rel='award', target_rid=lab.rid))
+    session.add(Link(source_rid=sources[2].rid, rel='lab', target_rid=award.rid))
+    session.flush()
+    assert set(storage.get_rev_links(lab, 'lab')) == {source.rid for source in sources}
+    assert set(storage.get_rev_links(lab, 'lab', 'snowball')) == {
+        sources[0].rid, sources[1].rid,
+    }
+    assert storage.get_rev_links(lab, 'lab', 'user') == []
+    assert storage.get_rev_links(lab, 'award') == [sources[0].rid]
+    rev_links = storage.get_rev_links_many([lab, award], 'lab', 'snowflake')
+    assert rev_links == {
+        lab.rid: [sources[2].rid],
+        award.rid: [sources[2].rid],
+    }
+
+
+def test_get_many(session, DBSession):
+    import uuid
+    from snovault.storage import (
+        RDBStorage,
+        Resource,
+    )
+    storage = RDBStorage(DBSession)
+    storage.batchsize = 2
+    resources = [Resource('snowball', {'': {'num': num}}) for num in range(3)]
+    session.add_all(resources)
+    session.flush()
+    rids = [str(resource.rid) for resource in resources]
+    models = storage.get_many(rids + [rids[0], str(uuid.uuid4())])
+    assert set(models) == set(rids)
+    assert [models[rid].properties['num'] for rid in rids] == [0, 1, 2]
+    assert storage.get_many([]) == {}
+
+
+def test_iter_uuid_bytes(session, DBSession):
+    import uuid
+    from snovault.storage import (
+        RDBStorage,
+        Resource,
+    )
+    storage = RDBStorage(DBSession)
+    storage.batchsize = 2
+    resources = [Resource('snowball', {'': {}}) for _ in range(3)]
+    resources.append(Resource('snowflake', {'': {}}))
+    session.add_all(resources)
+    session.flush()
+    snowballs = {uuid.UUID(bytes=rid) for rid in storage.iter_uuid_bytes('snowball')}
+    assert snowballs == {resource.rid for resource in resources[:3]}
+    rids = [uuid.UUID(bytes=rid) for rid in storage.iter_uuid_bytes()]
+    assert sorted(rids) == sorted(storage)
+
+
+def test_current_properties(session, DBSession, monkeypatch):
+    from snovault.storage import (
+        CurrentProperties,
+        Key,
+        RDBStorage,
+        Resource,
+    )
+    monkeypatch.setattr(Resource, 'maintain_current_properties', True)
+    storage = RDBStorage(DBSession, read_current_properties=True)
+    resource = Resource('test_item', {'': {'a': 1}, 'extra': {'b': 2}})
+    session.add(resource)
+    session.add(Key(rid=resource.rid, name='test_item:a', value='1'))
+    session.flush()
+    resource[''] = {'a': 3}
+    session.flush()
+    rid = str(resource.rid)
+    tid = resource.tid
+    assert session.query(CurrentProperties).filter_by(rid=resource.rid).count() == 2
+
+    session.expunge_all()
+    model = storage.get_by_uuid(rid)
+    assert model._current_properties() is not None
+    assert model.properties == {'a': 3}
+    assert dict(model.items()) == {'': {'a': 3}, 'extra': {'b': 2}}
+    assert model.tid == tid
+    session.expunge_all()
+    assert storage.get_many([rid])[rid].properties == {'a': 3}
+    session.expunge_all()
+    assert storage.get_by_unique_key('test_item:a', '1').properties == {'a': 3}
+
+    # Resources without rows, not yet migrated, read their propsheets
+    session.query(CurrentProperties).delete()
+    session.expunge_all()
+    model = storage.get_by_uuid(rid)
+    assert model._current_properties() is None
+    assert model.properties == {'a': 3}
+
+    storage.delete_by_uuid(rid)
+    assert storage.get_by_uuid(rid) is None
+
+
+def test_storage_includeme_modes(DBSession, monkeypatch):
+    from pyramid.config import Configurator
+    from snovault import storage
+    from snovault.interfaces import DBSESSION, STORAGE
+    from snovault.storage import Resource, TransactionRecord
+    monkeypatch.setattr(Resource, 'maintain_current_properties', False)
+    monkeypatch.setattr(TransactionRecord, 'compact_uuids', False)
+    monkeypatch.setattr(storage, '_DBSESSION', None)
+    config = Configurator(settings={
+        'storage.current_properties': 'read',
+        'storage.transaction_uuids': 'array',
+    })
+    config.registry[DBSESSION] = DBSession
+    storage.includeme(config)
+    assert config.registry[STORAGE].read_current_properties is True
+    assert Resource.maintain_current_properties is True
+    assert TransactionRecord.compact_uuids is True
+
+
+def test_rdb_blob_storage_iter_compressed_blob(session, DBSession):
+    from sqlalchemy import text
+    from snovault.storage import RDBBlobStorage
+    # As stored before the column was set to EXTERNAL
+    session.execute(text('ALTER TABLE blobs ALTER COLUMN data SET STORAGE EXTENDED;'))
+    data = b'snowflake' * 100000
+    blob_storage = RDBBlobStorage(DBSession)
+    download_meta = {}
+    blob_storage.store_blob(data, download_meta)
+    session.flush()
+    select_compressed = text(
+        'SELECT pg_column_size(data) < octet_length(data) FROM blobs WHERE blob_id = :blob_id'
+    )
+    assert session.execute(select_compressed, download_meta).scalar()
+    chunks = list(blob_storage.iter_blob(download_meta, 10, 250010, chunk_size=100000))
+    assert [len(chunk) for chunk in chunks] == [100000, 100000, 50000]
+    assert b''.join(chunks) == data[10:250010]
+
+    from snovault.commands.migrate_blob_storage import _rewrite_compressed
+    from snovault.commands.migrate_blob_storage import _set_storage_external
+    session.execute(_set_storage_external)
+    result = session.execute(_rewrite_compressed, {'blob_ids': [download_meta['blob_id']]})
+    assert result.rowcount == 1
+    assert not session.execute(select_compressed, download_meta).scalar()
+    assert b''.join(blob_storage.iter_blob(download_meta, 10, 250010)) == data[10:250010]
+
+
 def test_S3BlobStorage_boto3(mocker):
     from snovault.storage import S3BlobStorage
     mocker.patch('boto3.Session.resource')
@@ -273,3 +458,42 @@ def test_S3BlobStorage_boto3_get_blob_url_for_s3_file(mocker):
     storage.read_conn.generate_presigned_url.assert_called_once_with(
         Params={'Key': '123', 'Bucket': 'test'}, ExpiresIn=129600, ClientMethod='get_object'
     )
+
+
+def test_iter_transaction_uuids(session, DBSession, monkeypatch):
+    import transaction
+    import uuid
+    from snovault.storage import (
+        RDBStorage,
+        Resource,
+        TransactionRecord,
+    )
+    storage = RDBStorage(DBSession)
+    storage.batchsize = 2
+    a, b, c = sorted(str(uuid.uuid4()) for _ in range(3))
+
+    def write(updated, renamed):
+        txn = transaction.get()
+        txn.setExtendedInfo('updated', updated)
+        txn.setExtendedInfo('renamed', renamed)
+        session.add(Resource('test_item', {'': {}}))
+        transaction.commit()
+
+    write([a, b], [b])
+    monkeypatch.setattr(TransactionRecord, 'compact_uuids', True)
+    write([b, c], [])
+    records = session.query(TransactionRecord).order_by(TransactionRecord.order).all()
+    assert 'updated' in records[0].data and records[0].updated is None
+    assert 'updated' not in records[1].data and records[1].updated == [b, c]
+
+    xmin = min(record.xid for record in records)
+    count, max_xid, first_timestamp = storage.get_transaction_summary(xmin)
+    assert count == 2
+    assert max_xid == max(record.xid for record in records)
+    assert first_timestamp == records[0].timestamp
+    assert sorted(storage.iter_transaction_uuids(xmin)) == [
+        (a, True, False),
+        (b, True, True),
+        (c, True, False),
+    ]
+    assert list(storage.iter_transaction_uuids(max_xid + 1)) == []
@@ -64,3 +64,106 @@ def test_types_utils_take_one_or_return_none():
     assert take_one_or_return_none(['just one']) == 'just one'
     assert take_one_or_return_none(['one', 'and', 'two']) is None
     assert take_one_or_return_none('just one') is None
+
+
+def test_lazy_copy_does_not_change_source():
+    import json
+    from snovault.util import lazy_copy, quick_deepcopy
+    source = {'a': [{'b': [1]}, {'c': {'d': 2}}], 'e': {'f': [3]}, 'g': 4}
+    expected = quick_deepcopy(source)
+    result = lazy_copy(source)
+    result['a'][0]['b'].append(5)
+    result['a'].insert(0, {'h': []})
+    result['a'][2]['c']['d'] = 6
+    result.setdefault('e')['f'][0] = 7
+    copied = lazy_copy(result)
+    copied['a'][0]['h'].append(8)
+    dict(copied)['e']['f'].append(9)
+    assert source == expected
+    assert json.loads(json.dumps(result)) == {
+        'a': [{'h': []}, {'b': [1, 5]}, {'c': {'d': 6}}],
+        'e': {'f': [7]},
+        'g': 4,
+    }
+    assert copied['a'][0] == {'h': [8]}
+    assert copied['e'] == {'f': [7, 9]}
+
+
+def test_lazy_copy_copies_on_access():
+    import pickle
+    from snovault.util import lazy_copy
+    source = {'a': [{'b': 1}], 'c': 'd'}
+    result = lazy_copy(source)
+    assert isinstance(result, dict)
+    assert dict.__getitem__(result, 'a') is source['a']
+    assert result['a'] is not source['a']
+    assert result['a'][0] is not source['a'][0]
+    assert result['a'] is result['a']
+    assert type(pickle.loads(pickle.dumps(result))) is dict
+
+
+def test_embed_plan():
+    from snovault.util import embed_plan
+    assert embed_plan(['a.b', 'a.c.d', 'e', ('a', 'b', 'f')]) == {
+        'a': {'b': {'f': {}}, 'c': {'d': {}}},
+        'e': {},
+    }
+
+
+def test_expand_paths_fetches_each_level_in_one_batch(mocker):
+    import uuid
+    from snovault.interfaces import CONNECTION
+    from snovault.util import (
+        expand_path,
+        expand_paths,
+        quick_deepcopy,
+    )
+    uuids = [str(uuid.uuid4()) for _ in range(6)]
+    objects = {
+        '/items/%s/' % uuids[0]: {'parts': ['/items/%s/' % uuids[2], '/items/%s/' % uuids[3]]},
+        '/items/%s/' % uuids[1]: {'parts': ['/items/%s/' % uuids[4]]},
+        '/items/%s/' % uuids[2]: {'part': '/items/%s/' % uuids[5]},
+        '/items/%s/' % uuids[3]: {'part': '/items/%s/' % uuids[5]},
+        '/items/%s/' % uuids[4]: {},
+        '/items/%s/' % uuids[5]: {'name': 'leaf'},
+    }
+    connection = mocker.Mock(embed_cache={})
+    request = mocker.Mock(registry={CONNECTION: connection})
+    request.embed.side_effect = lambda path, view: quick_deepcopy(objects[path])
+    paths = ['children.parts.part', 'children.parts', 'children']
+
+    def make_obj():
+        return {'children': ['/items/%s/' % uuids[0], '/items/%s/' % uuids[1]]}
+
+    expected = make_obj()
+    for path in paths:
+        expand_path(request, expected, path)
+    connection.get_many.reset_mock()
+    result = make_obj()
+    expand_paths(request, result, paths)
+    assert result == expected
+    assert result['children'][0]['parts'][1]['part'] == {'name': 'leaf'}
+    assert [sorted(call[0][0]) for call in connection.get_many.call_args_list] == [
+        sorted(uuids[:2]),
+        sorted(uuids[2:5]),
+        [uuids[5]],
+    ]
+
+
+def test_uuid_array():
+    import json
+    import uuid
+    from snovault.util import UuidArray
+    uuids = [uuid.uuid4() for _ in range(3)]
+    array = UuidArray([uuids[0].bytes, uuids[1]])
+    array.append(str(uuids[2]))
+    assert len(array) == 3
+    assert list(array) == [str(value) for value in uuids]
+    assert array[-1] == str(uuids[2])
+    assert array[1:] == [str(value) for value in uuids[1:]]
+    assert array.__json__() == list(array)
+    assert not UuidArray()
+    with pytest.raises(IndexError):
+        array[3]
+    with pytest.raises(ValueError):
+        array.append(b'short')
@@ -1,6 +1,11 @@
 from past.builtins import basestring
+from posixpath import join
 from pyramid.threadlocal import manager as threadlocal_manager
-from snovault.interfaces import ROOT
+from snovault.interfaces import (
+    CONNECTION,
+    ROOT,
+)
+from uuid import UUID
 
 
 def includeme(config):
@@ -47,6 +52,7 @@ def expand_path(request, obj, path):
     if value is None:
         return
     if isinstance(value, list):
+        prefetch_paths(request, value)
         for index, member in enumerate(value):
             if not isinstance(member, dict):
                 member = value[index] = request.embed(member, '@@object')
@@ -57,6 +63,66 @@ def expand_path(request, obj, path):
         expand_path(request, value, remaining)
 
 
+def embed_plan(paths):
+    '''Merge dotted embed paths into a tree of property names'''
+    plan = {}
+    for path in paths:
+        if isinstance(path, basestring):
+            path = path.split('.')
+        node = plan
+        for name in path:
+            node = node.setdefault(name, {})
+    return plan
+
+
+def expand_paths(request, obj, paths):
+    '''
+    Expand embed paths breadth first, like expand_path for each path
+
+    The links at each depth are prefetched in one batch before any of them
+    is embedded, so uncached items cost a round trip per level rather than
+    one per link.
+    '''
+    level = [(obj, embed_plan(paths))]
+    while level:
+        slots = []
+        for parent, plan in level:
+            for name, remaining in plan.items():
+                value = parent.get(name, None)
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    slots.extend((value, index, remaining) for index in range(len(value)))
+                else:
+                    slots.append((parent, name, remaining))
+        prefetch_paths(request, [container[key] for container, key, _ in slots])
+        level = []
+        for container, key, remaining in slots:
+            member = container[key]
+            if not isinstance(member, dict):
+                member = container[key] = request.embed(member, '@@object')
+            if remaining:
+                level.append((member, remaining))
+
+
+def prefetch_paths(request, paths, view='@@object'):
+    '''Load the items behind uncached embeds of uuid paths in one batch'''
+    connection = request.registry[CONNECTION]
+    uuids = {}  # Ordered set, items linked from several parents load once
+    for path in paths:
+        if not isinstance(path, basestring):
+            continue
+        if join(path, view) in connection.embed_cache:
+            continue
+        name = path.rstrip('/').rsplit('/', 1)[-1]
+        try:
+            uuids[str(UUID(name))] = None
+        except ValueError:
+            continue
+    if uuids:
+        connection.get_many(list(uuids))
+
+
 def _get_calculated_properties_from_paths(request, paths):
     root = request.registry[ROOT]
     calculated_fields = set()
@@ -104,6 +170,237 @@ def quick_deepcopy(obj):
     return obj
 
 
+def lazy_copy(obj):
+    """Copy an object consisting of dicts, lists, and primitives on demand.
+
+    Only the top level container is copied here.  Nested dicts and lists
+    are still shared with `obj` and are copied the first time they are
+    read through the returned container, so a caller only pays for the
+    parts it touches.  Mutating the result never changes `obj`.
+
+    Reads that bypass python level methods (e.g. the json encoder walking
+    a list) see the shared containers but cannot modify them.
+    """
+    if isinstance(obj, dict):
+        return LazyCopyDict(obj)
+    if isinstance(obj, list):
+        return LazyCopyList(obj)
+    return obj
+
+
+class LazyCopyDict(dict):
+    """dict returned by `lazy_copy`, see there.
+
+    A value is still shared while it is the same container as in the
+    source.  `_source` is dropped once nothing is shared.
+    """
+    __slots__ = ('_source',)
+
+    def __init__(self, source):
+        if type(source) is not dict:
+            # Raw copy so a lazy source is not copied through its accessors
+            source = dict.copy(source)
+        dict.__init__(self, source)
+        self._source = source
+
+    def _unshare(self, key, value):
+        if (
+            isinstance(value, (dict, list))
+            and self._source is not None
+            and self._source.get(key) is value
+        ):
+            value = lazy_copy(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _unshare_all(self):
+        if self._source is not None:
+            for key, value in list(dict.items(self)):
+                self._unshare(key, value)
+            self._source = None
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if self._source is None:
+            return value
+        return self._unshare(key, value)
+
+    def __iter__(self):
+        # Overriding __iter__ keeps dict(obj) and {**obj} on __getitem__
+        return dict.__iter__(self)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        self._unshare_all()
+        return dict.items(self)
+
+    def values(self):
+        self._unshare_all()
+        return dict.values(self)
+
+    def copy(self):
+        return LazyCopyDict(self)
+
+    def pop(self, key, *args):
+        if key in self:
+            self[key]  # pylint: disable=pointless-statement
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        self._unshare_all()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def clear(self):
+        self._source = None
+        dict.clear(self)
+
+
+class LazyCopyList(list):
+    """list returned by `lazy_copy`, see there.
+
+    Items only move once nothing is shared, so a member is still shared
+    while it is the same container as at its index in the source.
+    """
+    __slots__ = ('_source',)
+
+    def __init__(self, source):
+        if type(source) is not list:
+            source = list.copy(source)
+        list.__init__(self, source)
+        self._source = source
+
+    def _unshare(self, index, value):
+        if (
+            isinstance(value, (dict, list))
+            and self._source is not None
+            and index < len(self._source)
+            and self._source[index] is value
+        ):
+            value = lazy_copy(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def _unshare_all(self):
+        if self._source is not None:
+            for index, value in enumerate(list.copy(self)):
+                self._unshare(index, value)
+            self._source = None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._unshare_all()
+            return list.__getitem__(self, index)
+        value = list.__getitem__(self, index)
+        if self._source is None:
+            return value
+        if index < 0:
+            index += len(self)
+        return self._unshare(index, value)
+
+    def __iter__(self):
+        self._unshare_all()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._unshare_all()
+        return list.__reversed__(self)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def copy(self):
+        return LazyCopyList(self)
+
+    def clear(self):
+        self._source = None
+        list.clear(self)
+
+    def _unshared(method):  # pylint: disable=no-self-argument
+        def wrapper(self, *args, **kwargs):
+            self._unshare_all()
+            return method(self, *args, **kwargs)  # pylint: disable=not-callable
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    # Methods that move items around or hand out raw members
+    __add__ = _unshared(list.__add__)
+    __delitem__ = _unshared(list.__delitem__)
+    __imul__ = _unshared(list.__imul__)
+    __mul__ = _unshared(list.__mul__)
+    __rmul__ = _unshared(list.__rmul__)
+    __setitem__ = _unshared(list.__setitem__)
+    insert = _unshared(list.insert)
+    pop = _unshared(list.pop)
+    remove = _unshared(list.remove)
+    reverse = _unshared(list.reverse)
+    sort = _unshared(list.sort)
+    del _unshared
+
+
+class UuidArray(object):
+    """Compact sequence of uuids, stored as 16 bytes each.
+
+    Millions of uuids held as str or UUID objects cost well over 100 bytes
+    apiece.  Uuids may be added as 16 byte strings, UUIDs or str, and are
+    read back as str.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, uuids=()):
+        self._data = bytearray()
+        self.extend(uuids)
+
+    @staticmethod
+    def _to_bytes(uuid):
+        if isinstance(uuid, (bytes, bytearray, memoryview)):
+            if len(uuid) != 16:
+                raise ValueError(uuid)
+            return uuid
+        if not isinstance(uuid, UUID):
+            uuid = UUID(uuid)
+        return uuid.bytes
+
+    def append(self, uuid):
+        self._data += self._to_bytes(uuid)
+
+    def extend(self, uuids):
+        for uuid in uuids:
+            self._data += self._to_bytes(uuid)
+
+    def __len__(self):
+        return len(self._data) // 16
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return str(UUID(bytes=bytes(self._data[index * 16:index * 16 + 16])))
+
+    def __iter__(self):
+        data = self._data
+        for beg in range(0, len(data), 16):
+            yield str(UUID(bytes=bytes(data[beg:beg + 16])))
+
+    def __json__(self, request=None):
+        return list(self)
+
+
 def mutated_schema(schema, mutator):
     """Apply a change to all levels of a schema.
 
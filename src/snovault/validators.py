@@ -1,5 +1,8 @@
 from uuid import UUID
-from .schema_utils import validate_request
+from .schema_utils import (
+    validate,
+    validate_request,
+)
 from .validation import ValidationFailure
 
 
@@ -38,6 +41,23 @@ def validate_item_content_post(context, request):
     validate_request(context.type_info.schema, request, data)
 
 
+def validate_item_content_bulk_post(context, request):
+    data = request.json
+    items = data.get('@graph') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        msg = 'expected a list of items'
+        raise ValidationFailure('body', ['@graph'], msg)
+    schema = context.type_info.schema
+    validated_items = []
+    for index, item in enumerate(items):
+        validated, errors = validate(schema, item)
+        for error in errors:
+            request.errors.add('body', ['@graph', index] + list(error.path), error.message)
+        validated_items.append(validated)
+    if not request.errors:
+        request.validated['@graph'] = validated_items
+
+
 def validate_item_content_put(context, request):
     data = request.json
     schema = context.type_info.schema
@@ -55,13 +55,13 @@ def internal_app(configfile, app_name=None, username=''):
     return TestApp(app, environ)
 
 
-def run(testapp, filename, docsdir, method, item_type, test=False):
+def run(testapp, filename, docsdir, method, item_type, test=False, bulk=False):
     name, ext = os.path.splitext(filename)
     if ext in ['', '.xlsx']:
         source = loadxl.read_single_sheet(filename, item_type)
     else:
         source = loadxl.read_single_sheet(filename)
-    pipeline = loadxl.get_pipeline(testapp, docsdir, test, item_type, method=method)
+    pipeline = loadxl.get_pipeline(testapp, docsdir, test, item_type, method=method, bulk=bulk)
     loadxl.process(loadxl.combine(source, pipeline))
 
 
@@ -91,6 +91,8 @@ def main():
     parser.add_argument('--attach', '-a', action='append', default=[],
         help="Directory to search for attachments")
     parser.add_argument('--app-name', help="Pyramid app name in configfile")
+    parser.add_argument('--bulk', action='store_true',
+        help="Create new data in batches with COPY")
     parser.add_argument('inpath',
         help="input zip file/directory of excel/csv/tsv sheets.")
     parser.add_argument('url',
@@ -120,9 +122,9 @@ def main():
     logging.getLogger('wsgi').setLevel(logging.WARNING)
 
     if args.method:
-        run(testapp, args.inpath, args.attach, args.method, args.item_type, args.test_only)
+        run(testapp, args.inpath, args.attach, args.method, args.item_type, args.test_only, args.bulk)
     else:
-        loadxl.load_all(testapp, args.inpath, args.attach, args.test_only)
+        loadxl.load_all(testapp, args.inpath, args.attach, args.test_only, args.bulk)
 
 
 if __name__ == '__main__':
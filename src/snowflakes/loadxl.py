@@ -282,6 +282,57 @@ def make_request(testapp, item_type, method):
     return component
 
 
+class BulkCreated(object):
+    """ Stands in for the response of a row created by a successful batch
+    """
+    status = '201 Created'
+    status_int = 201
+
+    def __init__(self, location):
+        self.location = location
+
+
+def make_bulk_request(testapp, item_type, batch_size=1000):
+    """ POST rows to the collection's @@bulk view in batches
+
+    Rows of a created batch get a BulkCreated response each.  A batch fails
+    as a whole when any of its rows fails, e.g. a row linking to another in
+    the same batch or conflicting with an existing item, so failed batches
+    are posted row by row and each row gets its own response.
+    """
+    url = '/' + item_type + '/@@bulk'
+
+    def post(batch):
+        value = {'@graph': [row['_value'] for row in batch]}
+        res = testapp.post_json(url, value, status='*')
+        if res.status_int == 201:
+            for row, uuid in zip(batch, res.json['@graph']):
+                row['_response'] = BulkCreated('/%s/' % uuid)
+        else:
+            for row in batch:
+                row['_response'] = testapp.post_json(row['_url'], row['_value'], status='*')
+        return batch
+
+    def component(rows):
+        batch = []
+        for row in rows:
+            if row.get('_skip') or row.get('_errors') or not row.get('_url'):
+                continue
+
+            row['_value'] = {
+                k: v for k, v in row.items() if not k.startswith('_') and not k.startswith('@')
+            }
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield from post(batch)
+                batch = []
+
+        if batch:
+            yield from post(batch)
+
+    return component
+
+
 ##############################################################################
 # Logging
 
@@ -433,7 +484,7 @@ def process(rows):
         pass
 
 
-def get_pipeline(testapp, docsdir, test_only, item_type, phase=None, method=None):
+def get_pipeline(testapp, docsdir, test_only, item_type, phase=None, method=None, bulk=False):
     pipeline = [
         skip_rows_with_all_key_value(test='skip'),
         skip_rows_with_all_key_value(_test='skip'),
@@ -454,7 +505,8 @@ def get_pipeline(testapp, docsdir, test_only, item_type, phase=None, method=None
     pipeline.extend([
         request_url(item_type, method),
         remove_keys('uuid') if method in ('PUT', 'PATCH') else noop,
-        make_request(testapp, item_type, method),
+        make_bulk_request(testapp, item_type) if bulk and method == 'POST'
+        else make_request(testapp, item_type, method),
         pipeline_logger(item_type, phase),
     ])
     return pipeline
@@ -483,14 +535,14 @@ PHASE2_PIPELINES = {
 }
 
 
-def load_all(testapp, filename, docsdir, test=False):
+def load_all(testapp, filename, docsdir, test=False, bulk=False):
     for item_type in ORDER:
         try:
             source = read_single_sheet(filename, item_type)
         except ValueError:
             logger.error('Opening %s %s failed.', filename, item_type)
             continue
-        pipeline = get_pipeline(testapp, docsdir, test, item_type, phase=1)
+        pipeline = get_pipeline(testapp, docsdir, test, item_type, phase=1, bulk=bulk)
         process(combine(source, pipeline))
 
     for item_type in ORDER:
@@ -1,5 +1,6 @@
 from pyramid.view import view_config
 
+from snovault.elasticsearch.searches.caches import cached_search_response
 from snovault.elasticsearch.searches.interfaces import AUDIT_TITLE
 from snovault.elasticsearch.searches.interfaces import MATRIX_TITLE
 from snovault.elasticsearch.searches.interfaces import REPORT_TITLE
@@ -56,6 +57,7 @@ DEFAULT_ITEM_TYPES = [
 
 
 @view_config(route_name='search', request_method='GET', permission='search')
+@cached_search_response
 def search(context, request):
     # Note the order of rendering matters for some fields, e.g. AllResponseField and
     # NotificationResponseField depend on results from BasicSearchWithFacetsResponseField.
@@ -136,6 +138,7 @@ def search_generator(request):
 
 
 @view_config(route_name='report', request_method='GET', permission='search')
+@cached_search_response
 def report(context, request):
     fr = FieldedResponse(
         _meta={
@@ -180,6 +183,7 @@ def matrixv2_raw(context, request):
 
 
 @view_config(route_name='matrix', request_method='GET', permission='search')
+@cached_search_response
 def matrix(context, request):
     fr = FieldedResponse(
         _meta={
@@ -208,6 +212,7 @@ def matrix(context, request):
 
 
 @view_config(route_name='missing_matrix', request_method='GET', permission='search')
+@cached_search_response
 def missing_matrix(context, request):
     fr = FieldedResponse(
         _meta={
@@ -237,6 +242,7 @@ def missing_matrix(context, request):
 
 
 @view_config(route_name='summary', request_method='GET', permission='search')
+@cached_search_response
 def summary(context, request):
     fr = FieldedResponse(
         _meta={
@@ -266,6 +272,7 @@ def summary(context, request):
 
 
 @view_config(route_name='audit', request_method='GET', permission='search')
+@cached_search_response
 def audit(context, request):
     fr = FieldedResponse(
         _meta={
@@ -21,7 +21,7 @@ from snovault import (
 )
 from snovault.calculated import calculate_properties
 from snovault.resource_views import item_view_object
-from snovault.util import expand_path
+from snovault.util import expand_paths
 from snovault.crud_views import collection_add
 from snovault.schema_utils import validate_request
 from snovault.storage import User as AuthUser
@@ -121,8 +121,7 @@ def user_page_view(context, request):
     else:
         item_path = request.resource_path(context)
         properties = request.embed(item_path, '@@object')
-    for path in context.embedded:
-        expand_path(request, properties, path)
+    expand_paths(request, properties, context.embedded)
     calculated = calculate_properties(context, request, properties, category='page')
     properties.update(calculated)
     return properties